@@ -94,7 +94,7 @@ class UserLoginForm(forms.Form):
         if email and password:
             try:
                 user = CustomUser.objects.get(email=email)
-                user = authenticate(username=user.username, password=password)
+                user = authenticate(username=user.email, password=password)
                 if not user:
                     raise forms.ValidationError('Неверный email или пароль.')
             except CustomUser.DoesNotExist:
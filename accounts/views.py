@@ -29,7 +29,7 @@ def login_view(request):
             
             try:
                 user = CustomUser.objects.get(email=email)
-                user = authenticate(request, username=user.username, password=password)
+                user = authenticate(request, username=user.email, password=password)
                 
                 if user:
                     login(request, user)
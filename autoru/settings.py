@@ -60,6 +60,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'main.middleware.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'autoru.urls'
@@ -149,6 +150,67 @@ if static_dir.exists():
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Медиафайлы именуются по хэшу содержимого и раскладываются по вложенным каталогам
+DEFAULT_FILE_STORAGE = 'cars.storage.ContentAddressedStorage'
+
+# Загрузка фото по частям: части дописываются во временный каталог вне MEDIA_ROOT
+CHUNKED_UPLOAD_DIR = Path(config('CHUNKED_UPLOAD_DIR', default=str(BASE_DIR / 'uploads_tmp')))
+CHUNKED_UPLOAD_CHUNK_SIZE = 1024 * 1024  # Меньше DATA_UPLOAD_MAX_MEMORY_SIZE
+CHUNKED_UPLOAD_MAX_SIZE = 20 * 1024 * 1024
+
+# Активное объявление без изменений дольше этого срока снимается с публикации
+LISTING_EXPIRE_AFTER_DAYS = config('LISTING_EXPIRE_AFTER_DAYS', default=60, cast=int)
+
+# Проданные и неактивные объявления переносятся в архив через столько дней без изменений
+ARCHIVE_AFTER_DAYS = config('ARCHIVE_AFTER_DAYS', default=90, cast=int)
+
+
+# Общий для всех воркеров gunicorn кэш: Redis в проекте нет, поэтому файловый
+CACHES = {
+    'default': {
+        'BACKEND': 'main.cache.AtomicFileBasedCache',
+        'LOCATION': config('CACHE_DIR', default=str(BASE_DIR / 'data' / 'cache')),
+        'OPTIONS': {'MAX_ENTRIES': 20000},
+    }
+}
+
+# Кэш результатов поиска: сколько секунд выдача считается свежей
+SEARCH_CACHE_TTL = config('SEARCH_CACHE_TTL', default=120, cast=int)
+
+# Просмотр карточки засчитывается одному посетителю не чаще раза за столько секунд
+CAR_VIEW_THROTTLE = config('CAR_VIEW_THROTTLE', default=1800, cast=int)
+
+# За nginx REMOTE_ADDR — адрес прокси, а адрес клиента приходит в X-Real-IP.
+# Включать, только если до приложения нельзя достучаться в обход nginx
+TRUST_X_REAL_IP = config('TRUST_X_REAL_IP', default=False, cast=bool)
+
+# Карта сайта пишется файлами, nginx отдаёт их как статику
+SITE_URL = config('SITE_URL', default='http://localhost')
+SITEMAP_URL = '/sitemaps/'
+SITEMAP_DIR = Path(config('SITEMAP_DIR', default=str(BASE_DIR / 'sitemaps')))
+
+# Посадочные страницы марок и моделей, отрисованные в файлы для nginx
+LANDING_DIR = Path(config('LANDING_DIR', default=str(BASE_DIR / 'landing')))
+
+# Резервные копии БД: онлайн backup API по BACKUP_PAGES страниц за шаг с паузой,
+# см. main/backup.py и manage.py backup_database / restore_database
+BACKUP_DIR = Path(config('BACKUP_DIR', default=str(BASE_DIR / 'backups')))
+BACKUP_INTERVAL = config('BACKUP_INTERVAL', default=6 * 3600, cast=int)
+BACKUP_KEEP = config('BACKUP_KEEP', default=8, cast=int)
+BACKUP_PAGES = config('BACKUP_PAGES', default=256, cast=int)
+BACKUP_SLEEP = 0.02  # Пауза между шагами, с
+BACKUP_MAX_RESTARTS = 5  # Потом копия снимается одним шагом
+
+# Профилирование запросов: заголовок X-Profile (manage.py profile_token),
+# ?_profile для сотрудников или случайная доля запросов
+PROFILING_ENABLED = config('PROFILING_ENABLED', default=True, cast=bool)
+PROFILING_SAMPLE_RATE = config('PROFILING_SAMPLE_RATE', default=0.0, cast=float)
+PROFILING_SLOW_MS = config('PROFILING_SLOW_MS', default=500, cast=int)
+PROFILING_INTERVAL = 0.005  # Период снятия стеков, с
+PROFILING_TOKEN_MAX_AGE = 3600
+PROFILING_KEEP_DAYS = 7
+PROFILING_DIR = Path(config('PROFILING_DIR', default=str(BASE_DIR / 'data' / 'profiles')))
+
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
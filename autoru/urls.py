@@ -7,6 +7,7 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('accounts/', include('accounts.urls')),
     path('', include('accounts.urls')),
+    path('', include('cars.urls')),
 ]
 
 if settings.DEBUG:
@@ -1,18 +1,25 @@
 # cars/admin.py
 from django.contrib import admin
-from .models import CarBrand, CarModel, Car, CarImage, CarFeature, CarFeatureRelation
+from django.utils import timezone
+from .models import (
+    ArchivedCar, ArchivedCarImage, CarBrand, CarModel, Car, CarImage, CarFeature,
+    CarFeatureRelation, CarPriceHistory, CatalogRevision, DuplicateCandidate, ListingStatusChange, Locality,
+    LandingPage, RankingParameters, SearchQueryStat, SitemapShard,
+)
+from .archive import restore
 
 @admin.register(CarBrand)
 class CarBrandAdmin(admin.ModelAdmin):
-    list_display = ('name', 'created_at')
-    search_fields = ('name',)
+    list_display = ('name', 'code', 'is_active', 'created_at')
+    list_filter = ('is_active',)
+    search_fields = ('name', 'code')
     ordering = ('name',)
 
 @admin.register(CarModel)
 class CarModelAdmin(admin.ModelAdmin):
-    list_display = ('name', 'brand', 'created_at')
-    list_filter = ('brand',)
-    search_fields = ('name', 'brand__name')
+    list_display = ('name', 'brand', 'code', 'is_active', 'created_at')
+    list_filter = ('is_active', 'brand')
+    search_fields = ('name', 'code', 'brand__name')
     ordering = ('brand__name', 'name')
 
 class CarImageInline(admin.TabularInline):
@@ -20,13 +27,27 @@ class CarImageInline(admin.TabularInline):
     extra = 1
     max_num = 10
 
+class CarPriceHistoryInline(admin.TabularInline):
+    model = CarPriceHistory
+    fields = ('price', 'changed_at')
+    readonly_fields = ('price', 'changed_at')
+    ordering = ('-changed_at',)
+    extra = 0
+    can_delete = False
+    
+    def has_add_permission(self, request, obj=None):
+        return False
+
 @admin.register(Car)
 class CarAdmin(admin.ModelAdmin):
     list_display = ('__str__', 'owner', 'price', 'status', 'views_count', 'created_at')
+    readonly_fields = ('last_price_drop_at',)
+    # Выпадающий список всех пользователей читал бы таблицу целиком
+    raw_id_fields = ('owner',)
     list_filter = ('status', 'brand', 'body_type', 'fuel_type', 'condition', 'created_at')
     search_fields = ('brand__name', 'model__name', 'owner__email', 'description')
     ordering = ('-created_at',)
-    inlines = [CarImageInline]
+    inlines = [CarImageInline, CarPriceHistoryInline]
     
     fieldsets = (
         ('Основная информация', {
@@ -43,7 +64,7 @@ class CarAdmin(admin.ModelAdmin):
             'fields': ('vin', 'license_plate', 'description', 'location', 'contact_phone')
         }),
         ('Статистика', {
-            'fields': ('views_count',),
+            'fields': ('views_count', 'last_price_drop_at'),
             'classes': ('collapse',)
         }),
     )
@@ -53,10 +74,110 @@ class CarImageAdmin(admin.ModelAdmin):
     list_display = ('car', 'is_main', 'created_at')
     list_filter = ('is_main', 'created_at')
     search_fields = ('car__brand__name', 'car__model__name')
+    # Порядок модели (-is_main, created_at) имеет смысл внутри объявления, а для
+    # общего списка потребовал бы сортировки всей таблицы
+    ordering = ('-pk',)
+    raw_id_fields = ('car',)
 
 @admin.register(CarFeature)
 class CarFeatureAdmin(admin.ModelAdmin):
-    list_display = ('name', 'category')
-    list_filter = ('category',)
-    search_fields = ('name',)
-    ordering = ('category', 'name')
\ No newline at end of file
+    list_display = ('name', 'category', 'code', 'is_active', 'bit')
+    list_filter = ('is_active', 'category')
+    search_fields = ('name', 'code')
+    ordering = ('category', 'name')
+
+@admin.register(CatalogRevision)
+class CatalogRevisionAdmin(admin.ModelAdmin):
+    list_display = ('version', 'applied_at', 'checksum')
+    readonly_fields = ('version', 'checksum', 'stats', 'applied_at')
+
+@admin.register(Locality)
+class LocalityAdmin(admin.ModelAdmin):
+    list_display = ('name', 'region', 'latitude', 'longitude', 'population')
+    search_fields = ('name', 'region')
+    ordering = ('-population',)
+
+@admin.register(DuplicateCandidate)
+class DuplicateCandidateAdmin(admin.ModelAdmin):
+    list_display = ('car', 'duplicate_of', 'reason', 'score', 'detected_at')
+    list_filter = ('reason', 'detected_at')
+    raw_id_fields = ('car', 'duplicate_of')
+
+class ArchivedCarImageInline(admin.TabularInline):
+    model = ArchivedCarImage
+    extra = 0
+    readonly_fields = ('image', 'is_main', 'created_at')
+    can_delete = False
+
+@admin.register(ArchivedCar)
+class ArchivedCarAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'id', 'owner', 'price', 'status', 'archived_at')
+    list_filter = ('status', 'archived_at')
+    search_fields = ('id', 'brand__name', 'model__name', 'owner__email')
+    readonly_fields = ('id', 'owner', 'brand', 'model', 'year', 'price', 'status', 'data',
+                       'feature_ids', 'views_summary', 'created_at', 'updated_at', 'archived_at')
+    inlines = [ArchivedCarImageInline]
+    actions = ['restore_listings']
+
+    def has_add_permission(self, request):
+        return False
+
+    @admin.action(description='Восстановить из архива')
+    def restore_listings(self, request, queryset):
+        restored = 0
+        for archived in queryset.prefetch_related('images'):
+            restore(archived)
+            restored += 1
+        self.message_user(request, f'Восстановлено объявлений: {restored}')
+
+@admin.register(ListingStatusChange)
+class ListingStatusChangeAdmin(admin.ModelAdmin):
+    list_display = ('car_id', 'old_status', 'new_status', 'reason', 'changed_at')
+    list_filter = ('reason', 'new_status', 'changed_at')
+    search_fields = ('car_id',)
+
+@admin.register(SearchQueryStat)
+class SearchQueryStatAdmin(admin.ModelAdmin):
+    list_display = ('query', 'count', 'last_seen')
+    search_fields = ('query',)
+
+@admin.register(RankingParameters)
+class RankingParametersAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'base_weight', 'update_weight', 'view_weight', 'epoch', 'updated_at')
+    readonly_fields = ('epoch', 'rebase_epoch', 'updated_at')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(SitemapShard)
+class SitemapShardAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'urls', 'lastmod', 'generated_at')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(LandingPage)
+class LandingPageAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'kind', 'dirty', 'marked_at', 'rendered_at')
+    list_filter = ('kind', 'dirty')
+    search_fields = ('path',)
+    actions = ['mark_dirty']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    @admin.action(description='Перерисовать выбранные страницы')
+    def mark_dirty(self, request, queryset):
+        updated = queryset.update(dirty=True, marked_at=timezone.now())
+        self.message_user(request, f'Помечено страниц: {updated}')
@@ -0,0 +1,173 @@
+# cars/api.py
+import re
+
+from django.shortcuts import get_object_or_404
+from rest_framework import status
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from . import compare, dashboard, search_cache, typeahead
+from .forms import CarSearchForm
+from .models import Car, CarPriceHistory, ImageUpload
+from .serializers import CarListValuesSerializer, ImageUploadSerializer
+from .uploads import (
+    ChecksumMismatch, ChunkOutOfOrder, ChunkedUploadError,
+    abort_upload, append_chunk, finish_upload, start_upload,
+)
+
+# Только ASCII-цифры и не длиннее, чем помещается в INTEGER SQLite: id и размер
+# страницы — как есть, номер страницы — с запасом на умножение на её размер
+_NUMBER_RE = re.compile(r'[0-9]{1,18}')
+_PAGE_RE = re.compile(r'[0-9]{1,9}')
+
+
+def _error_response(exc, upload=None):
+    if isinstance(exc, ChunkOutOfOrder):
+        code = status.HTTP_409_CONFLICT
+    elif isinstance(exc, ChecksumMismatch):
+        code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    else:
+        code = status.HTTP_400_BAD_REQUEST
+    data = {'detail': str(exc)}
+    if upload is not None:
+        data['upload'] = ImageUploadSerializer(upload).data
+    return Response(data, status=code)
+
+
+class ImageUploadCreateView(APIView):
+    """Начать загрузку фото по частям"""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, car_id):
+        car = get_object_or_404(Car, pk=car_id, owner=request.user)
+        serializer = ImageUploadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            upload = start_upload(car, request.user, **serializer.validated_data)
+        except ChunkedUploadError as exc:
+            return _error_response(exc)
+        return Response(ImageUploadSerializer(upload).data, status=status.HTTP_201_CREATED)
+
+
+class ImageUploadView(APIView):
+    """Состояние и отмена загрузки"""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, upload_id):
+        upload = get_object_or_404(ImageUpload, pk=upload_id, owner=request.user)
+        return Response(ImageUploadSerializer(upload).data)
+
+    def delete(self, request, upload_id):
+        upload = get_object_or_404(ImageUpload, pk=upload_id, owner=request.user)
+        abort_upload(upload)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class ImageUploadChunkView(APIView):
+    """Приём одной части: тело запроса — байты части, заголовок X-Chunk-Sha256"""
+    permission_classes = [IsAuthenticated]
+
+    def put(self, request, upload_id, index):
+        upload = get_object_or_404(ImageUpload, pk=upload_id, owner=request.user)
+        try:
+            append_chunk(upload, index, request.body, request.headers.get('X-Chunk-Sha256', ''))
+        except ChunkedUploadError as exc:
+            return _error_response(exc, upload)
+        return Response(ImageUploadSerializer(upload).data)
+
+
+class ImageUploadCompleteView(APIView):
+    """Завершить загрузку и создать фото автомобиля"""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, upload_id):
+        upload = get_object_or_404(
+            ImageUpload.objects.select_related('car'), pk=upload_id, owner=request.user
+        )
+        try:
+            image = finish_upload(upload)
+        except ChunkedUploadError as exc:
+            return _error_response(exc, upload)
+        return Response(
+            {'id': image.pk, 'image': image.image.url, 'is_main': image.is_main},
+            status=status.HTTP_201_CREATED,
+        )
+
+
+class CarSearchView(APIView):
+    """Поиск активных объявлений по параметрам CarSearchForm"""
+    permission_classes = [AllowAny]
+    max_page_size = 100
+
+    def get(self, request):
+        form = CarSearchForm(request.query_params)
+        if not form.is_valid():
+            return Response(form.errors, status=status.HTTP_400_BAD_REQUEST)
+        page = request.query_params.get('page', '1')
+        page_size = request.query_params.get('page_size', str(PageNumberPagination.page_size))
+        if not _PAGE_RE.fullmatch(page) or not _NUMBER_RE.fullmatch(page_size):
+            return Response({'detail': 'Некорректный номер страницы'}, status=status.HTTP_400_BAD_REQUEST)
+        page = max(int(page), 1)
+        page_size = min(max(int(page_size), 1), self.max_page_size)
+        ids, total = search_cache.search(form, (page - 1) * page_size, page_size)
+        if total and form.cleaned_data.get('search'):
+            typeahead.query_log.record(form.cleaned_data['search'], typeahead.visitor_key(request))
+        return Response({
+            'count': total,
+            'page': page,
+            'page_size': page_size,
+            'results': CarListValuesSerializer.for_ids(ids).data,
+        })
+
+
+class CarPriceHistoryView(APIView):
+    """График цены активного объявления одним запросом по индексу (car, changed_at)"""
+    permission_classes = [AllowAny]
+
+    def get(self, request, pk):
+        points = list(
+            CarPriceHistory.objects.filter(car_id=pk, car__status='active')
+            .order_by('changed_at', 'pk').values_list('changed_at', 'price')
+        )
+        if not points:
+            return Response({'detail': 'Объявление не найдено'}, status=status.HTTP_404_NOT_FOUND)
+        return Response({
+            'id': pk,
+            'points': [{'changed_at': changed_at, 'price': str(price)} for changed_at, price in points],
+        })
+
+
+class DashboardView(APIView):
+    """Объявления текущего пользователя со статистикой: ?after=<id>&limit=&status="""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        after = request.query_params.get('after') or '0'
+        limit = request.query_params.get('limit') or str(dashboard.PAGE_SIZE)
+        if not _NUMBER_RE.fullmatch(after) or not _NUMBER_RE.fullmatch(limit):
+            return Response({'detail': 'Некорректные параметры страницы'}, status=status.HTTP_400_BAD_REQUEST)
+        after, limit = int(after), int(limit)
+        limit = min(max(limit, 1), dashboard.MAX_PAGE_SIZE)
+        listing_status = request.query_params.get('status') or None
+        if listing_status and listing_status not in dict(Car.STATUS_CHOICES):
+            return Response({'detail': 'Некорректный статус'}, status=status.HTTP_400_BAD_REQUEST)
+        results, next_after = dashboard.listings(request.user, after, limit, listing_status)
+        return Response({
+            'summary': dashboard.summary(request.user) if not after else None,
+            'results': results,
+            'next_after': next_after,
+        })
+
+
+class CompareView(APIView):
+    """Сравнение объявлений: ?ids=1,2,3"""
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        try:
+            ids = compare.parse_ids(request.query_params.get('ids'))
+        except compare.CompareError as exc:
+            return Response({'detail': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(compare.compare(ids))
@@ -0,0 +1,211 @@
+# cars/archive.py
+"""Архив проданных и неактивных объявлений.
+
+Объявление, которое долго не менялось в статусе ``sold`` или ``inactive``,
+переносится в ArchivedCar с тем же id: поля сериализуются в JSON, фото
+переходят в ArchivedCarImage (файлы остаются на месте), опции сохраняются
+списком id, а строки CarView сворачиваются в сводку. После этого строка Car
+удаляется, и таблица объявлений с её индексами содержит только живые
+объявления.
+
+Чтение из файлов, подсчёт просмотров и сборка строк выполняются до
+транзакции; внутри неё остаются пакетные вставки в архив и удаления.
+"""
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from main.jobs import enqueue
+
+from . import compare, landing, ranking, search_cache
+from .features import mask_for
+from .models import (
+    ArchivedCar, ArchivedCarImage, Car, CarFeature, CarFeatureRelation, CarImage, CarPriceHistory,
+    CarView, Locality,
+)
+
+ARCHIVED_STATUSES = ('sold', 'inactive')
+
+# Поля Car, которые хранятся в ArchivedCar отдельными столбцами
+_COLUMNS = {'id', 'owner', 'brand', 'model', 'year', 'price', 'status', 'created_at', 'updated_at'}
+
+
+def _data_fields():
+    return [f for f in Car._meta.concrete_fields if f.name not in _COLUMNS]
+
+
+def archivable(older_than_days=None):
+    days = settings.ARCHIVE_AFTER_DAYS if older_than_days is None else older_than_days
+    cutoff = timezone.now() - timedelta(days=days)
+    return Car.objects.filter(status__in=ARCHIVED_STATUSES, updated_at__lt=cutoff)
+
+
+def _views_summary(ids):
+    rows = (
+        CarView.objects.filter(car_id__in=ids)
+        .values('car_id')
+        .annotate(total=Count('pk'), users=Count('user', distinct=True), last=Max('viewed_at'))
+    )
+    return {
+        row['car_id']: {
+            'total': row['total'],
+            'unique_users': row['users'],
+            'last_viewed_at': row['last'].isoformat() if row['last'] else None,
+        }
+        for row in rows
+    }
+
+
+def archive_batch(ids):
+    """Перенести объявления с указанными id в архив; вернуть число перенесённых"""
+    cars = list(Car.objects.filter(pk__in=ids, status__in=ARCHIVED_STATUSES))
+    if not cars:
+        return 0
+    ids = [car.pk for car in cars]
+    fields = _data_fields()
+    features = {}
+    for car_id, feature_id in CarFeatureRelation.objects.filter(car_id__in=ids).values_list('car_id', 'feature_id'):
+        features.setdefault(car_id, []).append(feature_id)
+    views = _views_summary(ids)
+    archived = [
+        ArchivedCar(
+            id=car.pk,
+            owner_id=car.owner_id,
+            brand_id=car.brand_id,
+            model_id=car.model_id,
+            year=car.year,
+            price=car.price,
+            status=car.status,
+            data={f.attname: f.value_from_object(car) for f in fields},
+            feature_ids=sorted(features.get(car.pk, [])),
+            views_summary=views.get(car.pk, {'total': 0, 'unique_users': 0, 'last_viewed_at': None}),
+            created_at=car.created_at,
+            updated_at=car.updated_at,
+        )
+        for car in cars
+    ]
+    images = [
+        ArchivedCarImage(car_id=car_id, image=image, is_main=is_main, created_at=created_at)
+        for car_id, image, is_main, created_at in
+        CarImage.objects.filter(car_id__in=ids).values_list('car_id', 'image', 'is_main', 'created_at')
+    ]
+
+    with transaction.atomic():
+        # Объявление могли изменить после чтения — переносим только нетронутые
+        current = dict(
+            Car.objects.filter(pk__in=ids, status__in=ARCHIVED_STATUSES)
+            .values_list('pk', 'updated_at')
+        )
+        archived = [a for a in archived if current.get(a.pk) == a.updated_at]
+        kept = {a.pk for a in archived}
+        if not kept:
+            return 0
+        ArchivedCar.objects.bulk_create(archived)
+        ArchivedCarImage.objects.bulk_create([i for i in images if i.car_id in kept])
+        # Фото и опции удаляются без сигналов: файлы теперь принадлежат архиву,
+        # а маску опций удалённой строки пересчитывать незачем
+        for model in (CarImage, CarFeatureRelation):
+            rows = model.objects.filter(car_id__in=kept)
+            rows._raw_delete(rows.db)
+        Car.objects.filter(pk__in=kept).delete()
+    return len(kept)
+
+
+def archive_listings(older_than_days=None, batch_size=500, limit=None):
+    """Архивировать устаревшие объявления пачками по id"""
+    archived = 0
+    last_pk = 0
+    queryset = archivable(older_than_days)
+    while limit is None or archived < limit:
+        size = batch_size if limit is None else min(batch_size, limit - archived)
+        ids = list(queryset.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:size])
+        if not ids:
+            break
+        last_pk = ids[-1]
+        archived += archive_batch(ids)
+    return archived
+
+
+def as_car(archived):
+    """Несохраняемый экземпляр Car для чтения архивного объявления"""
+    car = Car(
+        id=archived.pk,
+        owner_id=archived.owner_id,
+        brand_id=archived.brand_id,
+        model_id=archived.model_id,
+        year=archived.year,
+        price=archived.price,
+        status=archived.status,
+        created_at=archived.created_at,
+        updated_at=archived.updated_at,
+    )
+    for field in _data_fields():
+        value = archived.data.get(field.attname)
+        setattr(car, field.attname, None if value is None else field.to_python(value))
+    car.is_archived = True
+    return car
+
+
+def get_listing(pk, user=None):
+    """Объявление по id: живое, а для владельца и персонала — и из архива.
+
+    Возвращает (car, archived) или (None, None).
+    """
+    car = Car.objects.select_related('brand', 'model', 'owner').filter(pk=pk).first()
+    if car is not None:
+        return car, None
+    if user is None or not user.is_authenticated:
+        return None, None
+    archived = ArchivedCar.objects.select_related('brand', 'model', 'owner').filter(pk=pk)
+    if not user.is_staff:
+        archived = archived.filter(owner=user)
+    archived = archived.first()
+    if archived is None:
+        return None, None
+    return as_car(archived), archived
+
+
+def restore(archived):
+    """Вернуть объявление из архива с прежним id"""
+    car = as_car(archived)
+    del car.is_archived
+    bits = dict(CarFeature.objects.filter(pk__in=archived.feature_ids).values_list('pk', 'bit'))
+    car.feature_mask = mask_for(bit for bit in bits.values() if bit is not None)
+    car.features_changed_at = timezone.now() if bits else None
+    # Сохранённая оценка могла считаться от старой точки отсчёта
+    car.rank_score = ranking.score(car.created_at, car.updated_at, car.views_count)
+    car.rank_epoch = ranking.current_epoch()
+    sources = list(archived.images.all())
+    images = [CarImage(car_id=car.pk, image=image.image.name, is_main=image.is_main) for image in sources]
+    if car.locality_id and not Locality.objects.filter(pk=car.locality_id).exists():
+        car.locality_id = None
+    with transaction.atomic():
+        Car.objects.bulk_create([car])
+        # bulk_create проставляет auto_now_add, возвращаем исходную дату публикации
+        Car.objects.filter(pk=car.pk).update(created_at=archived.created_at)
+        # История цен удалялась вместе со строкой, начинаем её заново
+        CarPriceHistory.objects.create(car_id=car.pk, price=car.price)
+        CarFeatureRelation.objects.bulk_create([
+            CarFeatureRelation(car_id=car.pk, feature_id=pk) for pk in bits
+        ])
+        created = CarImage.objects.bulk_create(images)
+        # Сохраняем исходную дату загрузки фото вместо auto_now_add
+        for image, source in zip(created, sources):
+            image.created_at = source.created_at
+        if created:
+            CarImage.objects.bulk_update(created, ['created_at'])
+        archived.delete()
+        # bulk_create не шлёт post_save, кэши выдачи и сравнения сбрасываем сами
+        scopes = [car.brand_id], [car.model_id]
+        transaction.on_commit(partial(search_cache.invalidate, *scopes))
+        transaction.on_commit(partial(landing.mark, *scopes))
+        transaction.on_commit(partial(compare.invalidate, car.pk))
+        # Отпечатки для поиска дублей удалялись вместе со строкой
+        transaction.on_commit(partial(
+            enqueue, 'cars.check_listing', car.pk, unique_key=f'cars.check_listing:{car.pk}'
+        ))
+    return car
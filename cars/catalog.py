@@ -0,0 +1,231 @@
+# cars/catalog.py
+"""Синхронизация справочника марок, моделей и опций с версионированным файлом.
+
+Формат файла::
+
+    {
+        "version": "2025.1",
+        "brands": [
+            {"code": "toyota", "name": "Toyota",
+             "models": [{"code": "camry", "name": "Camry"}]}
+        ],
+        "features": [
+            {"code": "abs", "name": "ABS", "category": "Безопасность"}
+        ]
+    }
+
+Записи сопоставляются по коду, поэтому смена названия при том же коде
+считается переименованием. Запись, код которой в БД не найден, привязывается
+по названию к свободной строке — в том числе неактивной или созданной до
+появления справочника без кода. Записи из БД, которых нет в файле,
+деактивируются.
+"""
+import hashlib
+import json
+from pathlib import Path
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.utils import timezone
+
+from .models import CarBrand, CarModel, CarFeature, CatalogRevision
+
+DEFAULT_CATALOG_PATH = Path(__file__).resolve().parent / 'data' / 'catalog.json'
+
+
+def load_catalog(path=DEFAULT_CATALOG_PATH):
+    """Прочитать файл справочника, вернуть (данные, контрольная сумма)"""
+    raw = Path(path).read_bytes()
+    return json.loads(raw), hashlib.sha256(raw).hexdigest()
+
+
+def sync_catalog(catalog, checksum='', using=DEFAULT_DB_ALIAS, dry_run=False):
+    """Применить справочник к БД одной транзакцией.
+
+    Возвращает словарь со счётчиками изменений. Повторный запуск с тем же
+    файлом ничего не пишет.
+    """
+    stats = {}
+    with transaction.atomic(using=using):
+        brand_ids = _sync_brands(catalog.get('brands', []), stats, using, dry_run)
+        _sync_models(catalog.get('brands', []), brand_ids, stats, using, dry_run)
+        _sync_features(catalog.get('features', []), stats, using, dry_run)
+        changed = any(stats.values())
+        if changed and not dry_run:
+            CatalogRevision.objects.using(using).create(
+                version=str(catalog.get('version', '')),
+                checksum=checksum,
+                stats=stats,
+            )
+    return stats
+
+
+def _diff(entries, existing, fields):
+    """Сопоставить записи справочника строкам БД.
+
+    ``existing`` — список словарей из ``values()`` с ключами id, code, name,
+    is_active и ``fields``. Сначала строки ищутся по коду, оставшиеся записи —
+    по названию среди ещё не занятых строк, включая неактивные: так смена кода
+    при прежнем названии и повторно добавленная запись не упираются в
+    уникальность названия. Возвращает (новые записи, [(id, запись)] для
+    изменённых строк, число привязанных по названию, id деактивируемых).
+    """
+    by_code = {row['code']: row for row in existing if row['code']}
+    claimed, matched, pending = set(), [], []
+    for entry in entries:
+        row = by_code.get(entry['code'])
+        if row is None:
+            pending.append(entry)
+        else:
+            claimed.add(row['id'])
+            matched.append((row, entry))
+    by_name = {row['name']: row for row in existing if row['id'] not in claimed}
+    created, adopted = [], 0
+    for entry in pending:
+        row = by_name.pop(entry['name'], None)
+        if row is None:
+            created.append(entry)
+            continue
+        claimed.add(row['id'])
+        matched.append((row, entry))
+        adopted += 1
+    updated = [
+        (row['id'], entry) for row, entry in matched
+        if not row['is_active'] or any(row[f] != entry[f] for f in ['code', 'name'] + fields)
+    ]
+    renamed = {
+        row['id'] for row, entry in matched
+        if row['code'] != entry['code'] or row['name'] != entry['name']
+    }
+    deactivated = [
+        row['id'] for row in existing
+        if row['is_active'] and row['code'] and row['id'] not in claimed
+    ]
+    return created, updated, renamed, adopted, deactivated
+
+
+def _apply(model, created, updated, renamed, adopted, deactivated,
+           update_fields, build, stats, prefix, using, dry_run):
+    stats[f'{prefix}_created'] = len(created)
+    stats[f'{prefix}_updated'] = len(updated)
+    stats[f'{prefix}_adopted'] = adopted
+    stats[f'{prefix}_deactivated'] = len(deactivated)
+    if dry_run:
+        return
+    if deactivated:
+        model.objects.using(using).filter(pk__in=deactivated).update(is_active=False)
+    if renamed:
+        # Сначала освобождаем коды и названия: при обмене названий или кодов
+        # между строками любое прямое обновление упрётся в уникальность
+        _update(model, [{'code': None, 'name': f'~catalog-{pk}', 'id': pk} for pk in renamed], using)
+    if updated:
+        _update(model, [
+            dict({field: entry[field] for field in ['code', 'name'] + update_fields}, is_active=True, id=pk)
+            for pk, entry in updated
+        ], using)
+    if created:
+        _insert(model, [build(entry) for entry in created], using)
+
+
+def _update(model, rows, using):
+    """UPDATE ... WHERE id = %s одним executemany"""
+    connection = connections[using]
+    qn = connection.ops.quote_name
+    columns = [c for c in rows[0] if c != 'id']
+    sql = 'UPDATE {table} SET {updates} WHERE {pk} = %s'.format(
+        table=qn(model._meta.db_table),
+        updates=', '.join(f'{qn(c)} = %s' for c in columns),
+        pk=qn('id'),
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, [tuple(row[c] for c in columns) + (row['id'],) for row in rows])
+
+
+def _insert(model, rows, using):
+    """INSERT одним executemany.
+
+    bulk_create готовит каждое значение через поля модели, на десятках тысяч
+    строк это основная часть времени загрузки.
+    """
+    connection = connections[using]
+    qn = connection.ops.quote_name
+    columns = list(rows[0])
+    if 'created_at' in {f.name for f in model._meta.concrete_fields}:
+        columns.append('created_at')
+        now = connection.ops.adapt_datetimefield_value(timezone.now())
+        params = [tuple(row.values()) + (now,) for row in rows]
+    else:
+        params = [tuple(row.values()) for row in rows]
+    sql = 'INSERT INTO {table} ({columns}) VALUES ({values})'.format(
+        table=qn(model._meta.db_table),
+        columns=', '.join(qn(c) for c in columns),
+        values=', '.join(['%s'] * len(columns)),
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, params)
+
+
+def _sync_brands(brands, stats, using, dry_run):
+    existing = list(
+        CarBrand.objects.using(using).values('id', 'code', 'name', 'is_active')
+    )
+    diff = _diff(brands, existing, [])
+    _apply(
+        CarBrand, *diff, [],
+        lambda entry: {'code': entry['code'], 'name': entry['name'], 'is_active': True},
+        stats, 'brands', using, dry_run,
+    )
+    return dict(CarBrand.objects.using(using).filter(code__isnull=False).values_list('code', 'id'))
+
+
+def _sync_models(brands, brand_ids, stats, using, dry_run):
+    entries = []
+    for brand in brands:
+        brand_id = brand_ids.get(brand['code'])
+        for model in brand.get('models', []):
+            entries.append({
+                # В dry-run у новых марок ещё нет id, для диффа достаточно кода
+                'brand_id': brand_id or brand['code'],
+                'code': model['code'],
+                'name': model['name'],
+            })
+    existing = CarModel.objects.using(using).values(
+        'id', 'brand_id', 'code', 'name', 'is_active'
+    )
+    rows_by_brand = {}
+    for row in existing:
+        rows_by_brand.setdefault(row['brand_id'], []).append(row)
+    entries_by_brand = {}
+    for entry in entries:
+        entries_by_brand.setdefault(entry['brand_id'], []).append(entry)
+
+    created, updated, renamed, adopted, deactivated = [], [], set(), 0, []
+    for brand_id in set(rows_by_brand) | set(entries_by_brand):
+        diff = _diff(entries_by_brand.get(brand_id, []), rows_by_brand.get(brand_id, []), [])
+        created += diff[0]
+        updated += diff[1]
+        renamed |= diff[2]
+        adopted += diff[3]
+        deactivated += diff[4]
+    _apply(
+        CarModel, created, updated, renamed, adopted, deactivated, [],
+        lambda entry: {
+            'brand_id': entry['brand_id'], 'code': entry['code'],
+            'name': entry['name'], 'is_active': True,
+        },
+        stats, 'models', using, dry_run,
+    )
+
+
+def _sync_features(features, stats, using, dry_run):
+    existing = list(
+        CarFeature.objects.using(using).values('id', 'code', 'name', 'category', 'is_active')
+    )
+    diff = _diff(features, existing, ['category'])
+    _apply(
+        CarFeature, *diff, ['category'],
+        lambda entry: {
+            'code': entry['code'], 'name': entry['name'],
+            'category': entry['category'], 'is_active': True,
+        },
+        stats, 'features', using, dry_run,
+    )
@@ -0,0 +1,178 @@
+# cars/compare.py
+"""Сравнение нескольких объявлений рядом.
+
+Любое число объявлений загружается тремя запросами: объявления с маркой и
+моделью, их фото и их опции. Таблица характеристик и матрица опций
+(объединение, общие и уникальные) собираются в памяти.
+
+Результат кэшируется по отсортированному набору id, поэтому «1,2,3» и
+«3,1,2» читают одну запись, а столбцы переставляются под порядок запроса.
+В ключ входят версии объявлений из кэша: правка объявления, его фото или
+опций записывает в версию текущее время (cache.set, а не неатомарный incr
+файлового кэша), и все сравнения с ним перестают читаться.
+"""
+import hashlib
+import re
+import time
+
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.urls import reverse
+
+from .models import Car, CarFeatureRelation, CarImage
+
+MAX_COMPARE = 10
+CACHE_TTL = 600
+
+SPEC_FIELDS = [
+    ('year', 'Год выпуска'),
+    ('price', 'Цена'),
+    ('mileage', 'Пробег, км'),
+    ('condition', 'Состояние'),
+    ('body_type', 'Кузов'),
+    ('fuel_type', 'Топливо'),
+    ('engine_volume', 'Объём двигателя, л'),
+    ('engine_power', 'Мощность, л.с.'),
+    ('transmission', 'Коробка передач'),
+    ('drive_type', 'Привод'),
+    ('color', 'Цвет'),
+    ('location', 'Город'),
+]
+
+_VERSION_KEY = 'compare:car:%s'
+# Только ASCII-цифры и не длиннее, чем помещается в INTEGER SQLite
+ID_RE = re.compile(r'[0-9]{1,18}')
+
+
+class CompareError(ValueError):
+    """Некорректный список объявлений для сравнения"""
+
+
+def parse_ids(value):
+    """«3,1,2» → [3, 1, 2] без повторов, в порядке запроса"""
+    ids = []
+    for part in (value or '').split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if not ID_RE.fullmatch(part):
+            raise CompareError(f'Некорректный id: {part[:20]}')
+        pk = int(part)
+        if pk not in ids:
+            ids.append(pk)
+    if not ids:
+        raise CompareError('Не выбрано ни одного объявления')
+    if len(ids) > MAX_COMPARE:
+        raise CompareError(f'Можно сравнить не больше {MAX_COMPARE} объявлений')
+    return ids
+
+
+def _display(field, value):
+    if field.choices:
+        return dict(field.flatchoices).get(value, value)
+    if value is None or isinstance(value, (int, str)):
+        return value
+    return str(value)
+
+
+def build(ids):
+    """Таблица сравнения для объявлений в порядке возрастания id"""
+    cars = list(
+        Car.objects.filter(pk__in=ids, status='active')
+        .select_related('brand', 'model').order_by('pk')
+    )
+    found = [car.pk for car in cars]
+    covers = {}
+    for car_id, image in (
+        CarImage.objects.filter(car_id__in=found)
+        .order_by('car_id', '-is_main', 'created_at').values_list('car_id', 'image')
+    ):
+        covers.setdefault(car_id, image)
+    owned = {pk: set() for pk in found}
+    features = {}
+    for car_id, feature_id, name, category in (
+        CarFeatureRelation.objects.filter(car_id__in=found)
+        .values_list('car_id', 'feature_id', 'feature__name', 'feature__category')
+    ):
+        owned[car_id].add(feature_id)
+        features[feature_id] = (category, name)
+
+    specs = []
+    for name, label in SPEC_FIELDS:
+        field = Car._meta.get_field(name)
+        values = [_display(field, getattr(car, name)) for car in cars]
+        specs.append({'field': name, 'label': label, 'values': values, 'differs': len(set(values)) > 1})
+
+    matrix = []
+    for feature_id, (category, name) in sorted(features.items(), key=lambda item: (item[1], item[0])):
+        has = [feature_id in owned[car.pk] for car in cars]
+        matrix.append({
+            'id': feature_id, 'name': name, 'category': category, 'has': has,
+            'common': all(has), 'differs': not all(has),
+        })
+    common = [row['id'] for row in matrix if row['common']]
+    unique = {
+        str(car.pk): sorted(owned[car.pk] - set().union(*(owned[pk] for pk in found if pk != car.pk)))
+        for car in cars
+    }
+    return {
+        'ids': found,
+        'missing': sorted(set(ids) - set(found)),
+        'cars': [
+            {
+                'id': car.pk,
+                'title': f'{car.brand.name} {car.model.name}, {car.year}',
+                'brand': car.brand.name,
+                'model': car.model.name,
+                'url': reverse('cars:car_detail', kwargs={'pk': car.pk}),
+                'main_image': default_storage.url(covers[car.pk]) if car.pk in covers else None,
+            }
+            for car in cars
+        ],
+        'specs': specs,
+        'features': matrix,
+        'common_features': common,
+        'unique_features': unique,
+    }
+
+
+def arrange(data, ids):
+    """Переставить столбцы под порядок ``ids`` из запроса"""
+    position = {pk: i for i, pk in enumerate(data['ids'])}
+    order = [position[pk] for pk in ids if pk in position]
+    return dict(
+        data,
+        ids=[data['ids'][i] for i in order],
+        cars=[data['cars'][i] for i in order],
+        specs=[dict(row, values=[row['values'][i] for i in order]) for row in data['specs']],
+        features=[dict(row, has=[row['has'][i] for i in order]) for row in data['features']],
+    )
+
+
+def _versions(ids):
+    keys = [_VERSION_KEY % pk for pk in ids]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            cache.add(key, time.time_ns(), None)
+            found[key] = cache.get(key)
+    return [found[key] for key in keys]
+
+
+def cache_key(ids):
+    ids = sorted(ids)
+    versions = ','.join(f'{pk}:{version}' for pk, version in zip(ids, _versions(ids)))
+    return 'compare:' + hashlib.sha1(versions.encode()).hexdigest()
+
+
+def compare(ids):
+    key = cache_key(ids)
+    data = cache.get(key)
+    if data is None:
+        data = build(sorted(ids))
+        cache.set(key, data, CACHE_TTL)
+    return arrange(data, ids)
+
+
+def invalidate(car_id):
+    cache.set(_VERSION_KEY % car_id, time.time_ns(), None)
@@ -0,0 +1,96 @@
+# cars/dashboard.py
+"""Кабинет продавца: объявления владельца со статистикой по каждому.
+
+Страница собирается одним запросом: счётчики фото, опций, записей CarView
+и уникальных посетителей считаются коррелированными подзапросами по
+индексам внешних ключей, а не JOIN'ами, которые перемножили бы строки.
+Сводка по всем объявлениям владельца — ещё один агрегатный запрос. Число
+обращений к БД не зависит ни от размера страницы, ни от числа объявлений.
+
+Страницы идут по ключу: ``after`` — id последнего объявления предыдущей
+страницы, выборка ``owner_id = ? AND id < ?`` читает индекс владельца с
+нужного места, а не пропускает OFFSET строк.
+"""
+from django.core.files.storage import default_storage
+from django.db.models import Count, IntegerField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.urls import reverse
+
+from .models import Car, CarFeatureRelation, CarImage, CarView
+
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def _count(model, expression=None):
+    """Число строк ``model`` у объявления подзапросом; 0 вместо NULL"""
+    rows = (
+        model.objects.filter(car=OuterRef('pk')).order_by().values('car')
+        .annotate(n=Count(expression, distinct=True) if expression else Count('pk'))
+        .values('n')
+    )
+    return Coalesce(Subquery(rows, output_field=IntegerField()), Value(0))
+
+
+def summary(owner):
+    """Итоги по всем объявлениям владельца одним запросом"""
+    totals = Car.objects.filter(owner=owner).aggregate(
+        total=Count('pk'),
+        views=Coalesce(Sum('views_count'), 0),
+        **{status: Count('pk', filter=Q(status=status)) for status, _ in Car.STATUS_CHOICES},
+    )
+    return {
+        'total': totals.pop('total'),
+        'views': totals.pop('views'),
+        'by_status': totals,
+    }
+
+
+def listings(owner, after=None, limit=PAGE_SIZE, status=None):
+    """Страница объявлений владельца от новых к старым и id для следующей страницы"""
+    queryset = Car.objects.filter(owner=owner)
+    if status:
+        queryset = queryset.filter(status=status)
+    if after:
+        queryset = queryset.filter(pk__lt=after)
+    main_image = CarImage.objects.filter(car=OuterRef('pk')).order_by('-is_main', 'created_at').values('image')[:1]
+    rows = list(
+        queryset.order_by('-pk')
+        .annotate(
+            image_count=_count(CarImage),
+            feature_count=_count(CarFeatureRelation),
+            view_records=_count(CarView),
+            unique_visitors=_count(CarView, 'ip_address'),
+            main_image=Subquery(main_image),
+        )
+        .values_list(
+            'pk', 'brand__name', 'model__name', 'year', 'price', 'status', 'views_count',
+            'unique_visitors', 'view_records', 'image_count', 'feature_count', 'main_image',
+            'last_price_drop_at', 'created_at', 'updated_at',
+        )[:limit + 1]
+    )
+    statuses = dict(Car.STATUS_CHOICES)
+    url = default_storage.url
+    results = [
+        {
+            'id': pk,
+            'title': f'{brand} {model} {year}',
+            'url': reverse('cars:car_detail', kwargs={'pk': pk}),
+            'price': str(price),
+            'status': status,
+            'status_display': statuses.get(status, status),
+            'views': views,
+            'unique_visitors': unique_visitors,
+            'view_records': view_records,
+            'images': images,
+            'features': features,
+            'main_image': url(image) if image else None,
+            'last_price_drop_at': price_drop_at,
+            'created_at': created_at,
+            'updated_at': updated_at,
+        }
+        for (pk, brand, model, year, price, status, views, unique_visitors, view_records, images,
+             features, image, price_drop_at, created_at, updated_at) in rows[:limit]
+    ]
+    next_after = results[-1]['id'] if len(rows) > limit else None
+    return results, next_after
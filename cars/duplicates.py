@@ -0,0 +1,246 @@
+# cars/duplicates.py
+"""Поиск повторно размещённых объявлений.
+
+Кандидаты ищутся без попарного сравнения:
+
+* VIN и гос. номер — точное совпадение нормализованных значений по индексу;
+* описание — MinHash по шинглам из слов, разбитый на полосы LSH: объявления
+  с хотя бы одной совпавшей полосой проверяются оценкой сходства Жаккара;
+* главное фото — разностный хэш (dHash) из 64 бит, разбитый на 4 полосы
+  по 16 бит. При расстоянии Хэмминга до IMAGE_MAX_DISTANCE = 6 хотя бы в
+  одной полосе отличается не больше 6 // 4 = 1 бита, поэтому каждая полоса
+  ищется вместе со своими соседями на расстоянии 1: 17 значений на полосу
+  по тому же индексу вместо перебора всех объявлений.
+"""
+import hashlib
+import re
+import struct
+from functools import reduce
+from itertools import combinations
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Q
+
+from .models import Car, DuplicateCandidate, ListingFingerprint, ListingSignatureBand
+
+NUM_PERMUTATIONS = 64
+TEXT_BANDS = 16
+TEXT_ROWS = NUM_PERMUTATIONS // TEXT_BANDS
+TEXT_THRESHOLD = 0.8
+SHINGLE_SIZE = 3
+
+IMAGE_BANDS = 4
+IMAGE_BAND_BITS = 64 // IMAGE_BANDS
+IMAGE_MAX_DISTANCE = 6
+# Сколько бит может отличаться в лучшей из полос при IMAGE_MAX_DISTANCE
+IMAGE_BAND_FLIPS = IMAGE_MAX_DISTANCE // IMAGE_BANDS
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+_WORD_RE = re.compile(r'\w+')
+
+# Кириллические буквы, совпадающие по начертанию с латинскими в гос. номерах
+_PLATE_TRANSLATION = str.maketrans('АВЕКМНОРСТУХ', 'ABEKMHOPCTYX')
+
+
+def _permutations():
+    """Детерминированные коэффициенты хэш-функций (a, b) для MinHash"""
+    params = []
+    for i in range(NUM_PERMUTATIONS):
+        digest = hashlib.blake2b(f'minhash-{i}'.encode(), digest_size=16).digest()
+        a, b = struct.unpack('<QQ', digest)
+        params.append((a % (_MERSENNE_PRIME - 1) + 1, b % _MERSENNE_PRIME))
+    return params
+
+
+_PERMUTATIONS = _permutations()
+
+
+def normalize_vin(vin):
+    return re.sub(r'[^A-Z0-9]', '', (vin or '').upper())
+
+
+def normalize_plate(plate):
+    return re.sub(r'[^A-Z0-9]', '', (plate or '').upper().translate(_PLATE_TRANSLATION))
+
+
+def _hash64(data):
+    return struct.unpack('<q', hashlib.blake2b(data, digest_size=8).digest())[0]
+
+
+def shingles(text):
+    words = _WORD_RE.findall(text.lower().replace('ё', 'е'))
+    if len(words) < SHINGLE_SIZE:
+        return {' '.join(words)} if words else set()
+    return {' '.join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def minhash(text):
+    """Сигнатура MinHash описания или None для пустого текста"""
+    hashes = [_hash64(s.encode()) & _MAX_HASH for s in shingles(text)]
+    if not hashes:
+        return None
+    return [
+        min((a * h + b) % _MERSENNE_PRIME & _MAX_HASH for h in hashes)
+        for a, b in _PERMUTATIONS
+    ]
+
+
+def pack_minhash(signature):
+    return struct.pack(f'<{NUM_PERMUTATIONS}I', *signature) if signature else b''
+
+
+def unpack_minhash(data):
+    return list(struct.unpack(f'<{NUM_PERMUTATIONS}I', bytes(data))) if data else None
+
+
+def text_bands(signature):
+    packed = pack_minhash(signature)
+    width = TEXT_ROWS * 4
+    return [_hash64(packed[band * width:(band + 1) * width]) for band in range(TEXT_BANDS)]
+
+
+def similarity(left, right):
+    return sum(1 for x, y in zip(left, right) if x == y) / NUM_PERMUTATIONS
+
+
+def image_dhash(file):
+    """64-битный разностный хэш изображения (знаковый, для BigIntegerField)"""
+    from PIL import Image
+
+    with Image.open(file) as img:
+        pixels = list(img.convert('L').resize((9, 8), Image.LANCZOS).getdata())
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            value = (value << 1) | (left > right)
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+def image_bands(value):
+    unsigned = value & ((1 << 64) - 1)
+    mask = (1 << IMAGE_BAND_BITS) - 1
+    return [(unsigned >> (band * IMAGE_BAND_BITS)) & mask for band in range(IMAGE_BANDS)]
+
+
+def band_neighbours(value, flips=IMAGE_BAND_FLIPS):
+    """Значение полосы и все значения, отличающиеся от него не больше чем в ``flips`` битах"""
+    values = [value]
+    for count in range(1, flips + 1):
+        for bits in combinations(range(IMAGE_BAND_BITS), count):
+            values.append(reduce(lambda v, bit: v ^ (1 << bit), bits, value))
+    return values
+
+
+def hamming(left, right):
+    return bin((left ^ right) & ((1 << 64) - 1)).count('1')
+
+
+def update_fingerprint(car):
+    """Пересчитать отпечатки объявления и его полосы LSH"""
+    signature = minhash(car.description)
+    cover = car.get_main_image()
+    fingerprint = ListingFingerprint.objects.filter(car=car).first()
+    image_hash = None
+    if cover is not None:
+        if fingerprint and fingerprint.image_id == cover.pk:
+            image_hash = fingerprint.image_hash
+        else:
+            try:
+                with cover.image.open('rb') as f:
+                    image_hash = image_dhash(f)
+            except (OSError, ValueError):
+                image_hash = None
+
+    bands = []
+    if signature:
+        bands += [
+            ListingSignatureBand(car=car, kind=ListingSignatureBand.KIND_TEXT, band=i, value=v)
+            for i, v in enumerate(text_bands(signature))
+        ]
+    if image_hash is not None:
+        bands += [
+            ListingSignatureBand(car=car, kind=ListingSignatureBand.KIND_IMAGE, band=i, value=v)
+            for i, v in enumerate(image_bands(image_hash))
+        ]
+    with transaction.atomic():
+        ListingFingerprint.objects.update_or_create(
+            car=car,
+            defaults={
+                'minhash': pack_minhash(signature),
+                'image_hash': image_hash,
+                'image_id': cover.pk if cover is not None else None,
+            },
+        )
+        ListingSignatureBand.objects.filter(car=car).delete()
+        ListingSignatureBand.objects.bulk_create(bands)
+    return signature, image_hash
+
+
+def _band_candidates(car, kind, values):
+    """``values`` — значение или список допустимых значений для каждой полосы"""
+    # kind в каждой ветке OR: иначе SQLite ищет по индексу только kind и читает все полосы
+    condition = reduce(or_, (
+        Q(kind=kind, band=i, value__in=v) if isinstance(v, list) else Q(kind=kind, band=i, value=v)
+        for i, v in enumerate(values)
+    ))
+    return set(
+        ListingSignatureBand.objects
+        .filter(condition)
+        .exclude(car=car)
+        .values_list('car_id', flat=True)
+        .distinct()
+    )
+
+
+def find_duplicates(car, signature=None, image_hash=None):
+    """Вернуть список (id объявления, причина, сходство)"""
+    found = []
+    if car.vin_normalized:
+        found += [
+            (pk, 'vin', 1.0) for pk in
+            Car.objects.filter(vin_normalized=car.vin_normalized)
+            .exclude(pk=car.pk).values_list('pk', flat=True)
+        ]
+    if car.plate_normalized:
+        found += [
+            (pk, 'plate', 1.0) for pk in
+            Car.objects.filter(plate_normalized=car.plate_normalized)
+            .exclude(pk=car.pk).values_list('pk', flat=True)
+        ]
+    if signature:
+        candidates = _band_candidates(car, ListingSignatureBand.KIND_TEXT, text_bands(signature))
+        for pk, data in ListingFingerprint.objects.filter(car_id__in=candidates).values_list('car_id', 'minhash'):
+            score = similarity(signature, unpack_minhash(data))
+            if score >= TEXT_THRESHOLD:
+                found.append((pk, 'text', score))
+    if image_hash is not None:
+        candidates = _band_candidates(
+            car, ListingSignatureBand.KIND_IMAGE, [band_neighbours(v) for v in image_bands(image_hash)]
+        )
+        for pk, other in ListingFingerprint.objects.filter(car_id__in=candidates).values_list('car_id', 'image_hash'):
+            distance = hamming(image_hash, other)
+            if distance <= IMAGE_MAX_DISTANCE:
+                found.append((pk, 'image', 1 - distance / 64))
+    return found
+
+
+def check_listing(car):
+    """Обновить отпечатки объявления и записать найденные дубли"""
+    if isinstance(car, int):
+        car = Car.objects.filter(pk=car).first()
+        if car is None:
+            return []
+    signature, image_hash = update_fingerprint(car)
+    found = find_duplicates(car, signature, image_hash)
+    DuplicateCandidate.objects.bulk_create(
+        [
+            DuplicateCandidate(car=car, duplicate_of_id=pk, reason=reason, score=score)
+            for pk, reason, score in found
+        ],
+        ignore_conflicts=True,
+    )
+    return found
@@ -0,0 +1,303 @@
+# cars/features.py
+"""Фильтр «есть все выбранные опции» без соединений с CarFeatureRelation.
+
+Самым популярным опциям назначается бит ``CarFeature.bit`` (не больше 63,
+чтобы маска оставалась положительным 64-битным целым). ``Car.feature_mask``
+поддерживается сигналами на CarFeatureRelation, и условие «есть опции A, B, C»
+сводится к ``feature_mask & mask = mask``. Для опций без бита остаётся
+подзапрос EXISTS. Новая опция получает свободный бит сразу при создании,
+ежедневный ``assign_bits`` перераздаёт биты по популярности.
+
+Дополнительно в памяти процесса держится индекс списков объявлений по
+горячим опциям в формате, похожем на roaring bitmap: идентификаторы делятся
+на контейнеры по старшим 16 битам, контейнер — отсортированный массив или
+битовая карта. Если пересечение маленькое, поиск сужается до ``pk__in``,
+куда добавляются и объявления, получившие опцию после построения индекса
+(``Car.features_changed_at``): их индекс ещё не знает. Индекс перестраивается в фоновом потоке раз в
+INDEX_TTL секунд, до готовности нового ответы идут из старого.
+"""
+import threading
+import time
+from array import array
+from bisect import bisect_left
+
+from django.db import connections, transaction
+from django.db.models import Count, Exists, F, OuterRef
+from django.utils import timezone
+
+from .models import Car, CarFeature, CarFeatureRelation
+
+MASK_BITS = 63
+ARRAY_CONTAINER_LIMIT = 4096
+INDEX_TTL = 600
+INDEX_CANDIDATE_LIMIT = 500
+
+
+def mask_for(bits):
+    mask = 0
+    for bit in bits:
+        mask |= 1 << bit
+    return mask
+
+
+def feature_bit(feature_id):
+    return CarFeature.objects.filter(pk=feature_id).values_list('bit', flat=True).first()
+
+
+def set_feature(car_id, bit):
+    # features_changed_at — чтобы объявление попало в выдачу до перестройки индекса опций
+    Car.objects.filter(pk=car_id).update(
+        feature_mask=F('feature_mask').bitor(1 << bit), features_changed_at=timezone.now()
+    )
+
+
+def clear_feature(car_id, bit):
+    Car.objects.filter(pk=car_id).update(feature_mask=F('feature_mask').bitand(~(1 << bit)))
+
+
+def compute_masks(car_ids=None):
+    """Маски по таблице связей: {car_id: mask}"""
+    relations = CarFeatureRelation.objects.filter(feature__bit__isnull=False)
+    if car_ids is not None:
+        relations = relations.filter(car_id__in=car_ids)
+    masks = {}
+    for car_id, bit in relations.values_list('car_id', 'feature__bit'):
+        masks[car_id] = masks.get(car_id, 0) | (1 << bit)
+    return masks
+
+
+def rebuild_masks(batch_size=1000):
+    """Пересчитать маски всех объявлений пачками по id"""
+    last_pk = 0
+    updated = 0
+    while True:
+        ids = list(
+            Car.objects.filter(pk__gt=last_pk).order_by('pk')
+            .values_list('pk', flat=True)[:batch_size]
+        )
+        if not ids:
+            return updated
+        last_pk = ids[-1]
+        masks = compute_masks(ids)
+        with transaction.atomic():
+            cars = [Car(pk=pk, feature_mask=masks.get(pk, 0)) for pk in ids]
+            Car.objects.bulk_update(cars, ['feature_mask'])
+        updated += len(ids)
+
+
+def assign_bits():
+    """Назначить биты самым используемым опциям и пересчитать маски"""
+    ranked = list(
+        CarFeature.objects.filter(is_active=True)
+        .annotate(usage=Count('carfeaturerelation'))
+        .order_by('-usage', 'pk')
+        .values_list('pk', flat=True)[:MASK_BITS]
+    )
+    with transaction.atomic():
+        CarFeature.objects.exclude(bit__isnull=True).update(bit=None)
+        CarFeature.objects.bulk_update(
+            [CarFeature(pk=pk, bit=bit) for bit, pk in enumerate(ranked)], ['bit']
+        )
+        rebuild_masks()
+    _index.clear()
+    return len(ranked)
+
+
+def assign_free_bits():
+    """Раздать свободные биты активным опциям без бита и дописать их в маски.
+
+    Вызывается в транзакции, которая уже писала: в SQLite она держит блокировку
+    записи, и параллельный процесс не займёт тот же бит между чтением и записью.
+    """
+    used = set(CarFeature.objects.filter(bit__isnull=False).values_list('bit', flat=True))
+    free = [bit for bit in range(MASK_BITS) if bit not in used]
+    if not free:
+        return 0
+    waiting = list(
+        CarFeature.objects.filter(is_active=True, bit__isnull=True)
+        .annotate(usage=Count('carfeaturerelation'))
+        .order_by('-usage', 'pk')
+        .values_list('pk', flat=True)[:len(free)]
+    )
+    with transaction.atomic():
+        for bit, pk in zip(free, waiting):
+            CarFeature.objects.filter(pk=pk).update(bit=bit)
+            Car.objects.filter(
+                pk__in=CarFeatureRelation.objects.filter(feature_id=pk).values('car_id')
+            ).update(feature_mask=F('feature_mask').bitor(1 << bit))
+    return len(waiting)
+
+
+def filter_by_features(queryset, features):
+    """Оставить объявления, у которых есть все опции из ``features``"""
+    features = list(features)
+    if not features:
+        return queryset
+    hot = [f for f in features if f.bit is not None]
+    cold = [f for f in features if f.bit is None]
+    if hot:
+        mask = mask_for(f.bit for f in hot)
+        queryset = queryset.alias(
+            _feature_match=F('feature_mask').bitand(mask)
+        ).filter(_feature_match=mask)
+        found = _index.candidates([f.pk for f in hot])
+        if found is not None:
+            candidates, built_at = found
+            # Получившие опцию после построения индекса
+            recent = list(
+                Car.objects.filter(features_changed_at__gte=built_at)
+                .order_by().values_list('pk', flat=True)[:INDEX_CANDIDATE_LIMIT]
+            )
+            if len(candidates) + len(recent) <= INDEX_CANDIDATE_LIMIT:
+                queryset = queryset.filter(pk__in=candidates + recent)
+    for feature in cold:
+        queryset = queryset.filter(Exists(
+            CarFeatureRelation.objects.filter(car=OuterRef('pk'), feature=feature)
+        ))
+    return queryset
+
+
+class PostingList:
+    """Отсортированное множество id, разбитое на контейнеры по старшим 16 битам"""
+
+    def __init__(self, containers=None):
+        # {старшие биты: array('H') или int-битовая карта}
+        self.containers = containers or {}
+
+    @classmethod
+    def from_sorted(cls, ids):
+        grouped = {}
+        for value in ids:
+            grouped.setdefault(value >> 16, array('H')).append(value & 0xFFFF)
+        return cls({key: cls._optimize(values) for key, values in grouped.items()})
+
+    @staticmethod
+    def _optimize(values):
+        if len(values) <= ARRAY_CONTAINER_LIMIT:
+            return values
+        bitmap = 0
+        for low in values:
+            bitmap |= 1 << low
+        return bitmap
+
+    @staticmethod
+    def _to_array(container):
+        if isinstance(container, array):
+            return container
+        bits = bin(container)[:1:-1]
+        return array('H', (low for low, bit in enumerate(bits) if bit == '1'))
+
+    @classmethod
+    def _intersect(cls, left, right):
+        if isinstance(left, int) and isinstance(right, int):
+            bitmap = left & right
+            return bitmap if bitmap else None
+        if isinstance(left, int):
+            left, right = right, left
+        if isinstance(right, int):
+            result = array('H', (low for low in left if right >> low & 1))
+        else:
+            result = array('H')
+            for low in left:
+                i = bisect_left(right, low)
+                if i < len(right) and right[i] == low:
+                    result.append(low)
+        return result if result else None
+
+    def __and__(self, other):
+        containers = {}
+        for key in self.containers.keys() & other.containers.keys():
+            merged = self._intersect(self.containers[key], other.containers[key])
+            if merged is not None:
+                containers[key] = merged
+        return PostingList(containers)
+
+    def __len__(self):
+        return sum(
+            bin(c).count('1') if isinstance(c, int) else len(c)
+            for c in self.containers.values()
+        )
+
+    def __iter__(self):
+        for key in sorted(self.containers):
+            high = key << 16
+            for low in self._to_array(self.containers[key]):
+                yield high | low
+
+
+class FeaturePostingIndex:
+    """Списки объявлений по горячим опциям"""
+
+    def __init__(self):
+        # (списки по id опции, время начала построения, monotonic-время готовности)
+        self.state = None
+        self.lock = threading.Lock()
+        self.building = False
+
+    def clear(self):
+        self.state = None
+
+    def build(self):
+        built_at = timezone.now()
+        postings = {
+            pk: PostingList()
+            for pk in CarFeature.objects.filter(bit__isnull=False).values_list('pk', flat=True)
+        }
+        rows = (
+            CarFeatureRelation.objects
+            .filter(feature__bit__isnull=False)
+            .order_by('feature_id', 'car_id')
+            .values_list('feature_id', 'car_id')
+        )
+        current, ids = None, []
+        for feature_id, car_id in rows.iterator(chunk_size=10000):
+            if feature_id != current:
+                if ids:
+                    postings[current] = PostingList.from_sorted(ids)
+                current, ids = feature_id, []
+            ids.append(car_id)
+        if ids:
+            postings[current] = PostingList.from_sorted(ids)
+        self.state = (postings, built_at, time.monotonic())
+
+    def _rebuild_in_background(self):
+        def run():
+            try:
+                self.build()
+            finally:
+                connections.close_all()
+                self.building = False
+        with self.lock:
+            if self.building:
+                return
+            self.building = True
+        threading.Thread(target=run, daemon=True).start()
+
+    def candidates(self, feature_ids):
+        """(id объявлений со всеми опциями, время построения), если их немного, иначе None.
+
+        Объявления, получившие опцию после построения, в индекс не попали — их
+        вызывающий добавляет сам по ``features_changed_at``.
+        """
+        if self.state is None:
+            with self.lock:
+                if self.state is None:
+                    self.build()
+        postings, built_at, ready_at = self.state
+        if time.monotonic() - ready_at > INDEX_TTL:
+            self._rebuild_in_background()
+        if any(pk not in postings for pk in feature_ids):
+            # Бит назначен после построения индекса
+            return None
+        lists = sorted((postings[pk] for pk in feature_ids), key=len)
+        result = lists[0]
+        for posting in lists[1:]:
+            if not result.containers:
+                break
+            result = result & posting
+        if len(result) > INDEX_CANDIDATE_LIMIT:
+            return None
+        return list(result), built_at
+
+
+_index = FeaturePostingIndex()
@@ -1,13 +1,19 @@
 # cars/forms.py
+from datetime import timedelta
+
 from django import forms
+from django.db.models import Q
+from django.utils import timezone
 from django.forms import inlineformset_factory
-from .models import Car, CarImage, CarBrand, CarModel, CarFeature
+from .features import filter_by_features
+from .geo import filter_by_radius
+from .models import Car, CarImage, CarBrand, CarModel, CarFeature, Locality
 
 class CarForm(forms.ModelForm):
     """Форма для добавления/редактирования автомобиля"""
     
     features = forms.ModelMultipleChoiceField(
-        queryset=CarFeature.objects.all(),
+        queryset=CarFeature.objects.filter(is_active=True),
         widget=forms.CheckboxSelectMultiple,
         required=False,
         label='Дополнительные опции'
@@ -46,15 +52,24 @@ class CarForm(forms.ModelForm):
     
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        # Снятые со справочника марки и модели доступны только уже привязанным объявлениям
+        active = Q(is_active=True)
+        if self.instance.pk:
+            self.fields['brand'].queryset = CarBrand.objects.filter(
+                active | Q(pk=self.instance.brand_id)
+            )
+            active |= Q(pk=self.instance.model_id)
+        else:
+            self.fields['brand'].queryset = CarBrand.objects.filter(active)
         # Если выбрана марка, фильтруем модели
         if 'brand' in self.data:
             try:
                 brand_id = int(self.data.get('brand'))
-                self.fields['model'].queryset = CarModel.objects.filter(brand_id=brand_id)
+                self.fields['model'].queryset = CarModel.objects.filter(active, brand_id=brand_id)
             except (ValueError, TypeError):
                 pass
         elif self.instance.pk:
-            self.fields['model'].queryset = self.instance.brand.models.all()
+            self.fields['model'].queryset = self.instance.brand.models.filter(active)
         else:
             self.fields['model'].queryset = CarModel.objects.none()
 
@@ -67,8 +82,7 @@ class CarImageForm(forms.ModelForm):
         widgets = {
             'image': forms.FileInput(attrs={
                 'class': 'form-control', 
-                'accept': 'image/*',
-                'multiple': True
+                'accept': 'image/*'
             }),
             'is_main': forms.CheckboxInput(attrs={'class': 'form-check-input'}),
         }
@@ -96,7 +110,7 @@ class CarSearchForm(forms.Form):
     )
     
     brand = forms.ModelChoiceField(
-        queryset=CarBrand.objects.all(),
+        queryset=CarBrand.objects.filter(is_active=True),
         required=False,
         empty_label="Все марки",
         widget=forms.Select(attrs={'class': 'form-control', 'id': 'search_brand'}),
@@ -179,11 +193,141 @@ class CarSearchForm(forms.Form):
         label='Состояние'
     )
     
+    RADIUS_CHOICES = [
+        ('', 'Только в этом городе'),
+        (10, '+10 км'),
+        (25, '+25 км'),
+        (50, '+50 км'),
+        (100, '+100 км'),
+        (200, '+200 км'),
+        (500, '+500 км'),
+    ]
+    
+    locality = forms.ModelChoiceField(
+        queryset=Locality.objects.all(),
+        required=False,
+        empty_label="Все города",
+        widget=forms.Select(attrs={'class': 'form-control'}),
+        label='Город'
+    )
+    
+    radius = forms.TypedChoiceField(
+        choices=RADIUS_CHOICES,
+        coerce=int,
+        empty_value=None,
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-control'}),
+        label='Радиус'
+    )
+    
+    features = forms.ModelMultipleChoiceField(
+        queryset=CarFeature.objects.filter(is_active=True),
+        required=False,
+        widget=forms.CheckboxSelectMultiple,
+        label='Обязательные опции'
+    )
+    
+    PRICE_DROPPED_CHOICES = [
+        ('', 'Не важно'),
+        (1, 'За сутки'),
+        (3, 'За 3 дня'),
+        (7, 'За неделю'),
+        (30, 'За месяц'),
+    ]
+    
+    price_dropped_days = forms.TypedChoiceField(
+        choices=PRICE_DROPPED_CHOICES,
+        coerce=int,
+        empty_value=None,
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-control'}),
+        label='Цена снижена'
+    )
+    
+    ORDERING_CHOICES = [
+        ('', 'Сначала новые'),
+        ('popular', 'По популярности'),
+        ('price', 'Сначала дешёвые'),
+        ('-price', 'Сначала дорогие'),
+        ('price_drop', 'Недавно подешевевшие'),
+    ]
+    
+    ordering = forms.ChoiceField(
+        choices=ORDERING_CHOICES,
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-control'}),
+        label='Сортировка'
+    )
+    
+    # Координаты пользователя для поиска «рядом со мной»
+    latitude = forms.FloatField(
+        required=False,
+        min_value=-90,
+        max_value=90,
+        widget=forms.HiddenInput()
+    )
+    
+    longitude = forms.FloatField(
+        required=False,
+        min_value=-180,
+        max_value=180,
+        widget=forms.HiddenInput()
+    )
+    
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         if 'brand' in self.data:
             try:
                 brand_id = int(self.data.get('brand'))
-                self.fields['model'].queryset = CarModel.objects.filter(brand_id=brand_id)
+                self.fields['model'].queryset = CarModel.objects.filter(brand_id=brand_id, is_active=True)
             except (ValueError, TypeError):
-                pass
\ No newline at end of file
+                pass
+    
+    def filter_queryset(self, queryset, data=None):
+        """Применить условия поиска к выборке автомобилей.
+
+        ``data`` подменяет cleaned_data, например расширенными диапазонами
+        для кэша поиска.
+        """
+        data = self.cleaned_data if data is None else data
+        if data.get('search'):
+            queryset = queryset.filter(
+                Q(brand__name__icontains=data['search']) |
+                Q(model__name__icontains=data['search'])
+            )
+        if data.get('brand'):
+            queryset = queryset.filter(brand=data['brand'])
+        if data.get('model'):
+            queryset = queryset.filter(model=data['model'])
+        if data.get('year_from'):
+            queryset = queryset.filter(year__gte=data['year_from'])
+        if data.get('year_to'):
+            queryset = queryset.filter(year__lte=data['year_to'])
+        if data.get('price_from') is not None:
+            queryset = queryset.filter(price__gte=data['price_from'])
+        if data.get('price_to') is not None:
+            queryset = queryset.filter(price__lte=data['price_to'])
+        for field in ('body_type', 'fuel_type', 'transmission', 'condition'):
+            if data.get(field):
+                queryset = queryset.filter(**{field: data[field]})
+        if data.get('price_dropped_days'):
+            since = timezone.now() - timedelta(days=data['price_dropped_days'])
+            queryset = queryset.filter(last_price_drop_at__gte=since)
+        if data.get('features'):
+            queryset = filter_by_features(queryset, data['features'])
+        return self.filter_location(queryset, data)
+    
+    def filter_location(self, queryset, data=None):
+        data = self.cleaned_data if data is None else data
+        locality = data.get('locality')
+        if data.get('latitude') is not None and data.get('longitude') is not None:
+            center = (data['latitude'], data['longitude'])
+        elif locality:
+            center = (locality.latitude, locality.longitude)
+        else:
+            return queryset
+        if data.get('radius'):
+            return filter_by_radius(queryset, *center, data['radius'])
+        if locality:
+            return queryset.filter(locality=locality)
+        return queryset
\ No newline at end of file
@@ -0,0 +1,103 @@
+# cars/geo.py
+"""Поиск объявлений в радиусе от точки.
+
+Сначала по индексу (latitude, longitude) выбираются населённые пункты внутри
+ограничивающего прямоугольника, затем для них считается точное расстояние
+по формуле гаверсинусов. Объявления фильтруются по индексу ``locality_id``.
+"""
+import csv
+import math
+import re
+from pathlib import Path
+
+from .models import Locality
+
+EARTH_RADIUS_KM = 6371.0
+DEFAULT_GAZETTEER_PATH = Path(__file__).resolve().parent / 'data' / 'gazetteer.csv'
+
+_PREFIX_RE = re.compile(r'^(г\.?|город|пгт\.?|пос\.?|с\.|д\.)\s+')
+_SPACES_RE = re.compile(r'\s+')
+
+
+def normalize_locality_name(name):
+    name = _SPACES_RE.sub(' ', name.strip().lower().replace('ё', 'е'))
+    return _PREFIX_RE.sub('', name)
+
+
+def resolve_locality(text):
+    """Найти населённый пункт по свободному тексту вида «г. Москва, ул. ...»"""
+    candidates = [normalize_locality_name(part) for part in text.split(',')]
+    candidates = [c for c in candidates if c]
+    if not candidates:
+        return None
+    # При совпадении названий остаётся самый крупный населённый пункт
+    matches = {
+        name: pk for pk, name in
+        Locality.objects.filter(name_normalized__in=candidates)
+        .order_by('population')
+        .values_list('pk', 'name_normalized')
+    }
+    for candidate in candidates:
+        if candidate in matches:
+            return matches[candidate]
+    return None
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = (math.sin((lat2 - lat1) / 2) ** 2
+         + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bounding_box(latitude, longitude, radius_km):
+    """Прямоугольник (min_lat, max_lat, min_lon, max_lon), содержащий круг"""
+    dlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    cos_lat = math.cos(math.radians(latitude))
+    if cos_lat < 1e-6 or radius_km / (EARTH_RADIUS_KM * cos_lat) >= math.pi:
+        dlon = 180.0
+    else:
+        dlon = math.degrees(radius_km / (EARTH_RADIUS_KM * cos_lat))
+    return (
+        max(-90.0, latitude - dlat), min(90.0, latitude + dlat),
+        longitude - dlon, longitude + dlon,
+    )
+
+
+def localities_within(latitude, longitude, radius_km):
+    """id населённых пунктов не дальше ``radius_km`` от точки"""
+    min_lat, max_lat, min_lon, max_lon = bounding_box(latitude, longitude, radius_km)
+    rows = Locality.objects.filter(latitude__range=(min_lat, max_lat))
+    if min_lon >= -180 and max_lon <= 180:
+        rows = rows.filter(longitude__range=(min_lon, max_lon))
+    return [
+        pk for pk, lat, lon in rows.values_list('pk', 'latitude', 'longitude')
+        if haversine_km(latitude, longitude, lat, lon) <= radius_km
+    ]
+
+
+def filter_by_radius(queryset, latitude, longitude, radius_km):
+    return queryset.filter(locality_id__in=localities_within(latitude, longitude, radius_km))
+
+
+def load_gazetteer(path=DEFAULT_GAZETTEER_PATH):
+    """Загрузить справочник населённых пунктов из CSV, вернуть число строк"""
+    with open(path, encoding='utf-8') as f:
+        rows = [
+            Locality(
+                name=row['name'],
+                name_normalized=normalize_locality_name(row['name']),
+                region=row['region'],
+                latitude=float(row['latitude']),
+                longitude=float(row['longitude']),
+                population=int(row['population'] or 0),
+            )
+            for row in csv.DictReader(f)
+        ]
+    Locality.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=['name', 'region'],
+        update_fields=['name_normalized', 'latitude', 'longitude', 'population'],
+    )
+    return len(rows)
@@ -0,0 +1,170 @@
+# cars/landing.py
+"""Посадочные страницы марок и моделей, отрисованные заранее в файлы.
+
+Страница лежит в LANDING_DIR по тому же пути, что и её адрес
+(``catalog/toyota/camry/index.html``), и nginx отдаёт её через try_files,
+не доходя до gunicorn. Django получает запрос только при промахе: тогда
+страница рисуется, записывается в файл и следующие запросы снова идут
+мимо Python.
+
+Изменения объявлений, продление, снятие по сроку и правки справочника
+помечают затронутые страницы в таблице LandingPage (dirty-set) upsert'ом.
+Задача раз в минуту перерисовывает помеченные страницы и снимает отметку
+условным UPDATE по marked_at, поэтому пометка, пришедшая во время
+отрисовки, не теряется.
+"""
+import os
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Avg, Count, Max, Min
+from django.template.loader import render_to_string
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import Car, CarBrand, CarModel, LandingPage
+from .serializers import CarListValuesSerializer
+
+TOP_LISTINGS = 12
+
+
+def _upsert(rows):
+    """Пометить страницы (kind, object_id) устаревшими"""
+    if not rows:
+        return
+    qn = connection.ops.quote_name
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+    sql = (
+        'INSERT INTO {table} ({kind}, {object_id}, {path}, {dirty}, {marked_at}) VALUES (%s, %s, %s, %s, %s) '
+        'ON CONFLICT ({kind}, {object_id}) DO UPDATE SET {dirty} = excluded.{dirty}, '
+        '{marked_at} = excluded.{marked_at}'
+    ).format(
+        table=qn(LandingPage._meta.db_table), kind=qn('kind'), object_id=qn('object_id'),
+        path=qn('path'), dirty=qn('dirty'), marked_at=qn('marked_at'),
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, [(kind, pk, '', True, now) for kind, pk in rows])
+
+
+def mark(brand_ids=(), model_ids=()):
+    _upsert(
+        [('brand', pk) for pk in set(brand_ids) if pk] +
+        [('model', pk) for pk in set(model_ids) if pk]
+    )
+
+
+def mark_ids(car_ids):
+    rows = list(Car.objects.filter(pk__in=car_ids).values_list('brand_id', 'model_id'))
+    if rows:
+        mark(*zip(*rows))
+
+
+def mark_all():
+    _upsert(
+        [('brand', pk) for pk in CarBrand.objects.values_list('pk', flat=True)] +
+        [('model', pk) for pk in CarModel.objects.values_list('pk', flat=True)]
+    )
+
+
+def _resolve(kind, object_id):
+    """(марка, модель или None, адрес) либо None, если страницы быть не должно"""
+    if kind == 'brand':
+        brand = CarBrand.objects.filter(pk=object_id, is_active=True).first()
+        if brand is None or not brand.code:
+            return None
+        return brand, None, reverse('cars:landing_brand', kwargs={'brand': brand.code})
+    model = (
+        CarModel.objects.select_related('brand')
+        .filter(pk=object_id, is_active=True, brand__is_active=True).first()
+    )
+    if model is None or not model.code or not model.brand.code:
+        return None
+    return model.brand, model, reverse('cars:landing_model', kwargs={'brand': model.brand.code, 'model': model.code})
+
+
+def context(brand, model=None):
+    listings = Car.objects.filter(status='active', brand=brand)
+    if model is not None:
+        listings = listings.filter(model=model)
+    stats = listings.aggregate(
+        count=Count('pk'), price_min=Min('price'), price_avg=Avg('price'), price_max=Max('price'),
+        year_min=Min('year'), year_max=Max('year'),
+    )
+    body_labels = dict(Car.BODY_TYPE_CHOICES)
+    body_types = [
+        (body_labels.get(row['body_type'], row['body_type']), row['n'])
+        for row in listings.values('body_type').annotate(n=Count('pk')).order_by('-n')
+    ]
+    top_ids = list(listings.order_by('-rank_score', '-pk').values_list('pk', flat=True)[:TOP_LISTINGS])
+    top = CarListValuesSerializer.for_ids(top_ids).data
+    for row in top:
+        row['url'] = reverse('cars:car_detail', kwargs={'pk': row['id']})
+    models = []
+    if model is None:
+        counts = dict(listings.values('model_id').annotate(n=Count('pk')).values_list('model_id', 'n'))
+        for pk, name, code in brand.models.filter(is_active=True).exclude(code=None) \
+                .values_list('pk', 'name', 'code'):
+            if code:
+                url = reverse('cars:landing_model', kwargs={'brand': brand.code, 'model': code})
+                models.append({'name': name, 'url': url, 'count': counts.get(pk, 0)})
+        models.sort(key=lambda row: (-row['count'], row['name']))
+    return {
+        'brand': brand,
+        'model': model,
+        'stats': stats,
+        'body_types': body_types,
+        'top': top,
+        'models': models,
+        'rendered_at': timezone.now(),
+    }
+
+
+def file_path(path):
+    return Path(settings.LANDING_DIR) / path.strip('/') / 'index.html'
+
+
+def _write(target, html):
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp = target.with_name(f'.{target.name}.{os.getpid()}.tmp')
+    tmp.write_text(html, encoding='utf-8')
+    os.replace(tmp, target)
+
+
+def _remove(path):
+    if path:
+        file_path(path).unlink(missing_ok=True)
+
+
+def render_page(kind, object_id, page=None):
+    """Отрисовать страницу в файл; вернуть HTML или None, если страницы нет"""
+    if page is None:
+        page, _ = LandingPage.objects.get_or_create(
+            kind=kind, object_id=object_id, defaults={'dirty': False, 'marked_at': timezone.now()},
+        )
+    resolved = _resolve(kind, object_id)
+    if resolved is None:
+        _remove(page.path)
+        html, path = None, ''
+    else:
+        brand, model, path = resolved
+        html = render_to_string('cars/landing.html', context(brand, model))
+        _write(file_path(path), html)
+        if page.path and page.path != path:
+            _remove(page.path)
+    LandingPage.objects.filter(pk=page.pk).update(path=path, rendered_at=timezone.now())
+    # Пометка, пришедшая во время отрисовки, оставит страницу в dirty-set
+    LandingPage.objects.filter(pk=page.pk, marked_at=page.marked_at).update(dirty=False)
+    return html
+
+
+def render_dirty(limit=None):
+    """Перерисовать помеченные страницы; вернуть их число"""
+    pages = LandingPage.objects.filter(dirty=True).order_by('marked_at')
+    if limit:
+        pages = pages[:limit]
+    rendered = 0
+    for page in list(pages):
+        render_page(page.kind, page.object_id, page)
+        rendered += 1
+    return rendered
@@ -0,0 +1,95 @@
+# cars/lifecycle.py
+"""Снятие с публикации устаревших объявлений.
+
+Активное объявление, которое не обновлялось LISTING_EXPIRE_AFTER_DAYS дней,
+переводится в ``inactive``. Кандидаты выбираются по индексу
+(status, updated_at) вне транзакции, а каждая пачка переключается отдельной
+короткой транзакцией: SQLite держит блокировку записи до её конца, и между
+пачками запросы сайта успевают записать своё. Обновление идёт через
+QuerySet.update, поэтому ``updated_at`` не меняется и срок архивации
+отсчитывается от последней правки владельца.
+"""
+import statistics
+import time
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import landing, search_cache
+from .models import Car, ListingStatusChange
+
+
+def expiry_cutoff(older_than_days=None):
+    days = settings.LISTING_EXPIRE_AFTER_DAYS if older_than_days is None else older_than_days
+    return timezone.now() - timedelta(days=days)
+
+
+def stale(cutoff):
+    return Car.objects.filter(status='active', updated_at__lt=cutoff)
+
+
+def expire_batch(ids, cutoff):
+    """Снять с публикации объявления из ``ids``, которые всё ещё устарели"""
+    with transaction.atomic():
+        Car.objects.filter(pk__in=ids, status='active', updated_at__lt=cutoff).update(status='inactive')
+        # Продлённые за это время объявления получили свежий updated_at и не попадут сюда
+        expired = list(
+            Car.objects.filter(pk__in=ids, status='inactive', updated_at__lt=cutoff)
+            .values_list('pk', flat=True)
+        )
+        ListingStatusChange.objects.bulk_create([
+            ListingStatusChange(car_id=pk, old_status='active', new_status='inactive', reason='expired')
+            for pk in expired
+        ])
+        landing.mark_ids(expired)
+    return len(expired)
+
+
+def expire_listings(older_than_days=None, batch_size=200, pause=0.05, limit=None):
+    """Снять с публикации устаревшие объявления пачками; вернуть статистику"""
+    cutoff = expiry_cutoff(older_than_days)
+    queryset = stale(cutoff)
+    started = time.perf_counter()
+    locks = []
+    expired = 0
+    while limit is None or expired < limit:
+        size = batch_size if limit is None else min(batch_size, limit - expired)
+        ids = list(queryset.order_by('updated_at').values_list('pk', flat=True)[:size])
+        if not ids:
+            break
+        lock_started = time.perf_counter()
+        done = expire_batch(ids, cutoff)
+        locks.append(time.perf_counter() - lock_started)
+        expired += done
+        if not done:
+            # Все кандидаты пачки продлили — не крутимся на тех же строках
+            break
+        if pause:
+            time.sleep(pause)
+    if expired:
+        search_cache.invalidate_all()
+    elapsed = time.perf_counter() - started
+    return {
+        'expired': expired,
+        'batches': len(locks),
+        'elapsed': elapsed,
+        'per_second': expired / elapsed if elapsed else 0.0,
+        'lock_max_ms': max(locks, default=0) * 1000,
+        'lock_median_ms': statistics.median(locks) * 1000 if locks else 0.0,
+        'lock_total_ms': sum(locks) * 1000,
+    }
+
+
+def renew(car_id, owner=None):
+    """Продлить публикацию: статус ``active`` и свежий updated_at одним UPDATE"""
+    queryset = Car.objects.filter(pk=car_id, status__in=('active', 'inactive'))
+    if owner is not None:
+        queryset = queryset.filter(owner=owner)
+    if queryset.update(status='active', updated_at=timezone.now()) != 1:
+        return False
+    transaction.on_commit(partial(search_cache.invalidate_ids, [car_id]))
+    transaction.on_commit(partial(landing.mark_ids, [car_id]))
+    return True
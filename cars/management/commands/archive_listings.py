@@ -0,0 +1,29 @@
+# cars/management/commands/archive_listings.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from cars.archive import archivable, archive_listings
+
+
+class Command(BaseCommand):
+    help = 'Перенести давно проданные и неактивные объявления в архив'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-days', type=int, default=None,
+                            help='По умолчанию ARCHIVE_AFTER_DAYS')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--limit', type=int, default=None)
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            self.stdout.write(f'{archivable(options["older_than_days"]).count()} listing(s) to archive')
+            return
+        started = time.perf_counter()
+        archived = archive_listings(
+            options['older_than_days'], batch_size=options['batch_size'], limit=options['limit']
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Archived {archived} listing(s) in {time.perf_counter() - started:.2f}s'
+        ))
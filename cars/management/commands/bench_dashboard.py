@@ -0,0 +1,98 @@
+# cars/management/commands/bench_dashboard.py
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from cars import dashboard
+from cars.models import Car, CarView
+from cars.synthetic import generate_cars, owner
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Замерить кабинет продавца на аккаунте дилера с большим числом объявлений'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--listings', type=int, default=1000)
+        parser.add_argument('--views', type=int, default=20, help='Записей CarView на объявление')
+        parser.add_argument('--page-size', type=int, default=dashboard.PAGE_SIZE)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        # Синтетический дилер создаётся в транзакции и откатывается
+        try:
+            with transaction.atomic():
+                self.run(options)
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def run(self, options):
+        dealer = owner('dealer-benchmark')
+        ids = generate_cars(options['listings'], user=dealer, seed=47, images=3, features=5)
+        rng = random.Random(47)
+        CarView.objects.bulk_create([
+            CarView(car_id=pk, ip_address=f'10.0.{rng.randint(0, 3)}.{rng.randint(1, 50)}')
+            for pk in ids for _ in range(options['views'])
+        ], batch_size=5000)
+        page_size = options['page_size']
+
+        def per_listing():
+            # Прежний способ: несколько запросов на каждое объявление
+            rows = []
+            for car in Car.objects.filter(owner=dealer).select_related('brand', 'model').order_by('-pk')[:page_size]:
+                views = CarView.objects.filter(car=car)
+                main = car.get_main_image()
+                rows.append({
+                    'id': car.pk,
+                    'unique_visitors': views.values('ip_address').distinct().count(),
+                    'view_records': views.count(),
+                    'images': car.images.count(),
+                    'features': car.car_features.count(),
+                    'main_image': main.image.url if main else None,
+                })
+            return rows
+
+        def first_page():
+            return dashboard.summary(dealer), dashboard.listings(dealer, limit=page_size)
+
+        def all_pages():
+            rows, after = [], None
+            while True:
+                page, after = dashboard.listings(dealer, after, page_size)
+                rows.extend(page)
+                if after is None:
+                    return rows
+
+        keys = ('id', 'unique_visitors', 'view_records', 'images', 'features', 'main_image')
+        expected = per_listing()
+        got = first_page()[1][0]
+        if [{key: row[key] for key in keys} for row in got] != expected:
+            raise CommandError('Счётчики кабинета расходятся с подсчётом по объявлениям')
+        if len(all_pages()) != len(ids):
+            raise CommandError('Постраничный обход вернул не все объявления')
+
+        for name, func in (
+            (f'per-listing, {page_size} rows', per_listing),
+            (f'dashboard, {page_size} rows', first_page),
+            (f'dashboard, all {len(ids)} rows', all_pages),
+        ):
+            with CaptureQueriesContext(connection) as queries:
+                func()
+            timings = []
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                func()
+                timings.append(time.perf_counter() - started)
+            self.stdout.write(
+                f'{name:>28}: median {statistics.median(timings) * 1000:.2f}ms, '
+                f'{len(queries)} queries'
+            )
+        self.stdout.write(self.style.SUCCESS('Dashboard benchmark finished'))
@@ -0,0 +1,68 @@
+# cars/management/commands/bench_serializers.py
+import json
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from cars.models import Car
+from cars.serializers import CarListSerializer, CarListValuesSerializer
+from cars.synthetic import generate_cars
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Сравнить CarListSerializer и CarListValuesSerializer на странице выдачи'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page-size', type=int, default=100)
+        parser.add_argument('--repeat', type=int, default=200)
+
+    def handle(self, *args, **options):
+        # Синтетические объявления создаются в транзакции и откатываются
+        try:
+            with transaction.atomic():
+                self.run(options)
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def run(self, options):
+        ids = generate_cars(options['page_size'], seed=39)
+        renderer = JSONRenderer()
+
+        def model_serializer():
+            cars = (
+                Car.objects.select_related('brand', 'model')
+                .prefetch_related('images').filter(pk__in=ids).order_by('pk')
+            )
+            return renderer.render(CarListSerializer(cars, many=True).data)
+
+        def values_serializer():
+            return renderer.render(CarListValuesSerializer(Car.objects.filter(pk__in=ids).order_by('pk')).data)
+
+        if json.loads(model_serializer()) != json.loads(values_serializer()):
+            raise CommandError('Выводы сериализаторов различаются')
+
+        results = {}
+        for name, func in (('ModelSerializer', model_serializer), ('values()', values_serializer)):
+            func()
+            timings = []
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                func()
+                timings.append(time.perf_counter() - started)
+            results[name] = statistics.median(timings)
+            self.stdout.write(
+                f'{name:>16}: median {results[name] * 1000:.2f}ms, '
+                f'p95 {sorted(timings)[int(len(timings) * 0.95)] * 1000:.2f}ms '
+                f'per {options["page_size"]} rows (queries + serialization + JSON)'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'values() path is {results["ModelSerializer"] / results["values()"]:.1f}x faster'
+        ))
@@ -0,0 +1,22 @@
+# cars/management/commands/build_sitemaps.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from cars.sitemaps import build
+
+
+class Command(BaseCommand):
+    help = 'Перезаписать изменившиеся части карты сайта и её индекс'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true',
+                            help='Перезаписать все части, а не только изменившиеся')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        stats = build(force=options['full'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {stats["written"]} of {stats["shards"]} shard(s), removed {stats["removed"]}, '
+            f'{stats["urls"]} URL(s) in {time.perf_counter() - started:.2f}s'
+        ))
@@ -0,0 +1,53 @@
+# cars/management/commands/detect_duplicates.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from cars.duplicates import find_duplicates, unpack_minhash, update_fingerprint
+from cars.models import Car, DuplicateCandidate, ListingFingerprint
+
+
+class Command(BaseCommand):
+    help = 'Построить отпечатки всех объявлений и найти среди них дубли'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        # Сначала отпечатки для всех, иначе ранние объявления не увидят поздние дубли
+        fingerprinted = 0
+        for batch in self.batches(options['batch_size']):
+            for car in batch:
+                update_fingerprint(car)
+            fingerprinted += len(batch)
+        self.stdout.write(f'Fingerprinted {fingerprinted} car(s)')
+
+        # Отпечатки второго прохода читаются из БД пачками, а не держатся в памяти для всех
+        found = 0
+        for batch in self.batches(options['batch_size']):
+            fingerprints = {
+                pk: (unpack_minhash(data), image_hash)
+                for pk, data, image_hash in ListingFingerprint.objects.filter(
+                    car_id__in=[car.pk for car in batch]
+                ).values_list('car_id', 'minhash', 'image_hash')
+            }
+            rows = [
+                DuplicateCandidate(car=car, duplicate_of_id=pk, reason=reason, score=score)
+                for car in batch
+                for pk, reason, score in find_duplicates(car, *fingerprints.get(car.pk, (None, None)))
+                if pk < car.pk
+            ]
+            DuplicateCandidate.objects.bulk_create(rows, ignore_conflicts=True)
+            found += len(rows)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'Found {found} duplicate pair(s) in {elapsed:.1f}s'))
+
+    def batches(self, batch_size):
+        last_pk = 0
+        while True:
+            batch = list(Car.objects.filter(pk__gt=last_pk).order_by('pk')[:batch_size])
+            if not batch:
+                return
+            last_pk = batch[-1].pk
+            yield batch
@@ -0,0 +1,37 @@
+# cars/management/commands/expire_listings.py
+from django.core.management.base import BaseCommand
+
+from cars.lifecycle import expire_listings, expiry_cutoff, stale
+
+
+class Command(BaseCommand):
+    help = 'Снять с публикации объявления, которые давно не обновлялись'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-days', type=int, default=None,
+                            help='По умолчанию LISTING_EXPIRE_AFTER_DAYS')
+        parser.add_argument('--batch-size', type=int, default=200)
+        parser.add_argument('--pause', type=float, default=0.05,
+                            help='Пауза между пачками, сек')
+        parser.add_argument('--limit', type=int, default=None)
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            count = stale(expiry_cutoff(options['older_than_days'])).count()
+            self.stdout.write(f'{count} listing(s) to expire')
+            return
+        stats = expire_listings(
+            options['older_than_days'],
+            batch_size=options['batch_size'],
+            pause=options['pause'],
+            limit=options['limit'],
+        )
+        self.stdout.write(
+            f'Expired {stats["expired"]} listing(s) in {stats["batches"]} batch(es), '
+            f'{stats["elapsed"]:.2f}s, {stats["per_second"]:.0f}/s'
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Write lock held: max {stats["lock_max_ms"]:.1f}ms, '
+            f'median {stats["lock_median_ms"]:.1f}ms, total {stats["lock_total_ms"]:.1f}ms'
+        ))
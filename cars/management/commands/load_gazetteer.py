@@ -0,0 +1,34 @@
+# cars/management/commands/load_gazetteer.py
+from django.core.management.base import BaseCommand
+
+from cars.geo import DEFAULT_GAZETTEER_PATH, load_gazetteer, resolve_locality
+from cars.models import Car
+
+
+class Command(BaseCommand):
+    help = 'Загрузить справочник населённых пунктов и привязать к нему объявления'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default=str(DEFAULT_GAZETTEER_PATH))
+        parser.add_argument('--no-backfill', action='store_true',
+                            help='Не привязывать существующие объявления')
+
+    def handle(self, *args, **options):
+        count = load_gazetteer(options['path'])
+        self.stdout.write(f'Loaded {count} localities')
+        if options['no_backfill']:
+            return
+
+        # Разбираем каждую уникальную строку местоположения один раз
+        linked = 0
+        locations = list(
+            Car.objects.filter(locality__isnull=True)
+            .values_list('location', flat=True).distinct()
+        )
+        for location in locations:
+            locality_id = resolve_locality(location)
+            if locality_id:
+                linked += Car.objects.filter(
+                    locality__isnull=True, location=location
+                ).update(locality_id=locality_id)
+        self.stdout.write(f'Linked {linked} car(s)')
@@ -0,0 +1,92 @@
+# cars/management/commands/migrate_media.py
+import posixpath
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from cars.models import ArchivedCarImage, CarBrand, CarImage
+from cars.storage import ContentAddressedStorage, release
+
+# (модель, поле) с файлами, которые переносятся в шардированное хранилище
+MEDIA_FIELDS = [
+    (CarImage, 'image'),
+    (ArchivedCarImage, 'image'),
+    (CarBrand, 'logo'),
+]
+
+
+class Command(BaseCommand):
+    help = 'Перенести существующие медиафайлы в хранилище с именами по хэшу содержимого'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--pause', type=float, default=0.0,
+                            help='Пауза между пачками, сек')
+        parser.add_argument('--keep-old', action='store_true',
+                            help='Не удалять старые файлы после переноса')
+
+    def handle(self, *args, **options):
+        for model, field_name in MEDIA_FIELDS:
+            stats = self.migrate_field(model, field_name, options)
+            self.stdout.write(
+                f'{model._meta.label}.{field_name}: moved {stats["moved"]}, '
+                f'deduplicated {stats["deduplicated"]}, missing {stats["missing"]}'
+            )
+
+    def migrate_field(self, model, field_name, options):
+        storage = model._meta.get_field(field_name).storage
+        if not isinstance(storage, ContentAddressedStorage):
+            storage = ContentAddressedStorage(
+                location=storage.location, base_url=storage.base_url
+            )
+        stats = {'moved': 0, 'deduplicated': 0, 'missing': 0}
+        last_pk = 0
+        while True:
+            rows = list(
+                model._default_manager
+                .filter(pk__gt=last_pk)
+                .exclude(**{field_name: ''})
+                .exclude(**{f'{field_name}__isnull': True})
+                .order_by('pk')
+                .values_list('pk', field_name)[:options['batch_size']]
+            )
+            if not rows:
+                break
+            last_pk = rows[-1][0]
+            self.migrate_batch(model, field_name, storage, rows, stats, options)
+            if options['pause']:
+                time.sleep(options['pause'])
+        return stats
+
+    def migrate_batch(self, model, field_name, storage, rows, stats, options):
+        # Файлы копируются до транзакции, чтобы не держать блокировку записи на I/O
+        moves = []
+        for pk, old_name in rows:
+            if storage.is_hashed(old_name):
+                continue
+            if not storage.exists(old_name):
+                stats['missing'] += 1
+                continue
+            directory = posixpath.dirname(old_name)
+            with storage.open(old_name) as f:
+                new_name = storage.hashed_name(old_name, storage.digest(f))
+                if storage.exists(new_name):
+                    stats['deduplicated'] += 1
+                else:
+                    storage.save(posixpath.join(directory, posixpath.basename(old_name)), f)
+            moves.append((pk, old_name, new_name))
+
+        # Строка переключается, только если за время копирования файл не заменили
+        with transaction.atomic():
+            moved = [
+                (old_name, new_name) for pk, old_name, new_name in moves
+                if model._default_manager
+                .filter(pk=pk, **{field_name: old_name})
+                .update(**{field_name: new_name})
+            ]
+        stats['moved'] += len(moved)
+
+        if not options['keep_old']:
+            for old_name, _ in moved:
+                release(model, field_name, old_name)
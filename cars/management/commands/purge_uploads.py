@@ -0,0 +1,23 @@
+# cars/management/commands/purge_uploads.py
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from cars.models import ImageUpload
+from cars.uploads import abort_upload
+
+
+class Command(BaseCommand):
+    help = 'Удалить брошенные и завершённые загрузки фото по частям'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-hours', type=int, default=24)
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=options['older_than_hours'])
+        purged = 0
+        for upload in ImageUpload.objects.filter(updated_at__lt=cutoff).iterator():
+            abort_upload(upload)
+            purged += 1
+        self.stdout.write(f'Purged {purged} upload(s)')
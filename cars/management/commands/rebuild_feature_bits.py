@@ -0,0 +1,22 @@
+# cars/management/commands/rebuild_feature_bits.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from cars.features import assign_bits, rebuild_masks
+
+
+class Command(BaseCommand):
+    help = 'Назначить биты популярным опциям и пересчитать маски опций объявлений'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--masks-only', action='store_true',
+                            help='Не переназначать биты, только пересчитать маски')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        if options['masks_only']:
+            self.stdout.write(f'Rebuilt masks for {rebuild_masks()} car(s)')
+        else:
+            self.stdout.write(f'Assigned bits to {assign_bits()} feature(s)')
+        self.stdout.write(self.style.SUCCESS(f'Done in {time.perf_counter() - started:.2f}s'))
@@ -0,0 +1,24 @@
+# cars/management/commands/render_landing_pages.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from cars.landing import mark_all, render_dirty
+
+
+class Command(BaseCommand):
+    help = 'Перерисовать посадочные страницы марок и моделей, помеченные как устаревшие'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='Пометить и перерисовать все страницы')
+        parser.add_argument('--limit', type=int, default=None)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        if options['all']:
+            mark_all()
+        rendered = render_dirty(options['limit'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Rendered {rendered} page(s) in {time.perf_counter() - started:.2f}s'
+        ))
@@ -0,0 +1,35 @@
+# cars/management/commands/sync_catalog.py
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from cars.catalog import DEFAULT_CATALOG_PATH, load_catalog, sync_catalog
+
+
+class Command(BaseCommand):
+    help = 'Синхронизировать марки, модели и опции с файлом справочника'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default=str(DEFAULT_CATALOG_PATH),
+                            help='Путь к JSON-файлу справочника')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Только показать изменения')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        catalog, checksum = load_catalog(options['path'])
+        stats = sync_catalog(
+            catalog, checksum, using=options['database'], dry_run=options['dry_run']
+        )
+        elapsed = time.perf_counter() - started
+
+        for key, value in stats.items():
+            if value:
+                self.stdout.write(f'{key}: {value}')
+        if not any(stats.values()):
+            self.stdout.write('Catalog is up to date')
+        self.stdout.write(self.style.SUCCESS(
+            f'Catalog {catalog.get("version", "?")} synced in {elapsed:.3f}s'
+        ))
@@ -0,0 +1,66 @@
+# Generated by Django 4.2.7 on 2026-10-19 17:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogRevision',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.CharField(max_length=50, verbose_name='Версия')),
+                ('checksum', models.CharField(max_length=64, verbose_name='Контрольная сумма')),
+                ('stats', models.JSONField(default=dict, verbose_name='Изменения')),
+                ('applied_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Версия справочника',
+                'verbose_name_plural': 'Версии справочника',
+                'ordering': ['-applied_at'],
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='carmodel',
+            unique_together={('brand', 'name')},
+        ),
+        migrations.AddField(
+            model_name='carbrand',
+            name='code',
+            field=models.SlugField(blank=True, max_length=100, null=True, unique=True, verbose_name='Код в справочнике'),
+        ),
+        migrations.AddField(
+            model_name='carbrand',
+            name='is_active',
+            field=models.BooleanField(default=True, verbose_name='Активна'),
+        ),
+        migrations.AddField(
+            model_name='carfeature',
+            name='code',
+            field=models.SlugField(blank=True, max_length=100, null=True, unique=True, verbose_name='Код в справочнике'),
+        ),
+        migrations.AddField(
+            model_name='carfeature',
+            name='is_active',
+            field=models.BooleanField(default=True, verbose_name='Активна'),
+        ),
+        migrations.AddField(
+            model_name='carmodel',
+            name='code',
+            field=models.SlugField(blank=True, max_length=100, null=True, verbose_name='Код в справочнике'),
+        ),
+        migrations.AddField(
+            model_name='carmodel',
+            name='is_active',
+            field=models.BooleanField(default=True, verbose_name='Активна'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='carmodel',
+            unique_together={('brand', 'code'), ('brand', 'name')},
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 17:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0002_catalog_codes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='carimage',
+            name='image',
+            field=models.ImageField(db_index=True, upload_to='car_images/', verbose_name='Изображение'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.7 on 2026-10-19 17:41
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('cars', '0003_car_image_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageUpload',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('filename', models.CharField(max_length=255, verbose_name='Имя файла')),
+                ('size', models.PositiveBigIntegerField(verbose_name='Размер (байт)')),
+                ('chunk_size', models.PositiveIntegerField(verbose_name='Размер части (байт)')),
+                ('received', models.PositiveBigIntegerField(default=0, verbose_name='Получено (байт)')),
+                ('sha256', models.CharField(blank=True, max_length=64, verbose_name='SHA-256 файла')),
+                ('is_main', models.BooleanField(default=False, verbose_name='Главное фото')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('car', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='uploads', to='cars.car', verbose_name='Автомобиль')),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='image_uploads', to=settings.AUTH_USER_MODEL, verbose_name='Владелец')),
+            ],
+            options={
+                'verbose_name': 'Загрузка фото',
+                'verbose_name_plural': 'Загрузки фото',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
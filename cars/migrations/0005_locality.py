@@ -0,0 +1,38 @@
+# Generated by Django 4.2.7 on 2026-10-19 17:43
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0004_image_upload'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Locality',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, verbose_name='Название')),
+                ('name_normalized', models.CharField(db_index=True, editable=False, max_length=100)),
+                ('region', models.CharField(blank=True, max_length=100, verbose_name='Регион')),
+                ('latitude', models.FloatField(verbose_name='Широта')),
+                ('longitude', models.FloatField(verbose_name='Долгота')),
+                ('population', models.PositiveIntegerField(default=0, verbose_name='Население')),
+            ],
+            options={
+                'verbose_name': 'Населённый пункт',
+                'verbose_name_plural': 'Населённые пункты',
+                'ordering': ['-population', 'name'],
+                'indexes': [models.Index(fields=['latitude', 'longitude'], name='locality_lat_lon_idx')],
+                'unique_together': {('name', 'region')},
+            },
+        ),
+        migrations.AddField(
+            model_name='car',
+            name='locality',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='cars', to='cars.locality', verbose_name='Населённый пункт'),
+        ),
+    ]
@@ -0,0 +1,80 @@
+# Generated by Django 4.2.7 on 2026-10-19 17:45
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_normalized_identifiers(apps, schema_editor):
+    from cars.duplicates import normalize_plate, normalize_vin
+
+    Car = apps.get_model('cars', 'Car')
+    cars = list(Car.objects.exclude(vin='', license_plate='').only('pk', 'vin', 'license_plate'))
+    for car in cars:
+        car.vin_normalized = normalize_vin(car.vin)
+        car.plate_normalized = normalize_plate(car.license_plate)
+    Car.objects.bulk_update(cars, ['vin_normalized', 'plate_normalized'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0005_locality'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ListingFingerprint',
+            fields=[
+                ('car', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='fingerprint', serialize=False, to='cars.car')),
+                ('minhash', models.BinaryField(blank=True, default=b'')),
+                ('image_hash', models.BigIntegerField(blank=True, null=True)),
+                ('image_id', models.BigIntegerField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Отпечаток объявления',
+                'verbose_name_plural': 'Отпечатки объявлений',
+            },
+        ),
+        migrations.AddField(
+            model_name='car',
+            name='plate_normalized',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=20),
+        ),
+        migrations.AddField(
+            model_name='car',
+            name='vin_normalized',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=17),
+        ),
+        migrations.CreateModel(
+            name='ListingSignatureBand',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.PositiveSmallIntegerField(choices=[(1, 'Описание'), (2, 'Фото')])),
+                ('band', models.PositiveSmallIntegerField()),
+                ('value', models.BigIntegerField()),
+                ('car', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='signature_bands', to='cars.car')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['kind', 'band', 'value'], name='signature_band_lookup_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DuplicateCandidate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reason', models.CharField(choices=[('vin', 'Совпадает VIN'), ('plate', 'Совпадает гос. номер'), ('text', 'Похожее описание'), ('image', 'Похожее главное фото')], max_length=10, verbose_name='Причина')),
+                ('score', models.FloatField(default=1.0, verbose_name='Сходство')),
+                ('detected_at', models.DateTimeField(auto_now_add=True)),
+                ('car', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='duplicate_candidates', to='cars.car', verbose_name='Объявление')),
+                ('duplicate_of', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='cars.car', verbose_name='Похоже на')),
+            ],
+            options={
+                'verbose_name': 'Возможный дубль',
+                'verbose_name_plural': 'Возможные дубли',
+                'ordering': ['-detected_at'],
+                'unique_together': {('car', 'duplicate_of', 'reason')},
+            },
+        ),
+        migrations.RunPython(fill_normalized_identifiers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-19 17:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0006_duplicate_detection'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='car',
+            name='feature_mask',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='carfeature',
+            name='bit',
+            field=models.PositiveSmallIntegerField(blank=True, editable=False, null=True, unique=True, verbose_name='Бит в маске опций'),
+        ),
+    ]
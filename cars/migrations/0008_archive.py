@@ -0,0 +1,55 @@
+# Generated by Django 4.2.7 on 2026-10-19 17:52
+
+from django.conf import settings
+import django.core.serializers.json
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('cars', '0007_feature_mask'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedCar',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False, verbose_name='ID объявления')),
+                ('year', models.PositiveIntegerField(verbose_name='Год выпуска')),
+                ('price', models.DecimalField(decimal_places=2, max_digits=12, verbose_name='Цена (руб.)')),
+                ('status', models.CharField(choices=[('active', 'Активно'), ('sold', 'Продано'), ('inactive', 'Неактивно')], max_length=20, verbose_name='Статус')),
+                ('data', models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='Данные объявления')),
+                ('feature_ids', models.JSONField(default=list, verbose_name='Опции')),
+                ('views_summary', models.JSONField(default=dict, verbose_name='Просмотры')),
+                ('created_at', models.DateTimeField(verbose_name='Дата создания')),
+                ('updated_at', models.DateTimeField(verbose_name='Дата обновления')),
+                ('archived_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Дата архивации')),
+                ('brand', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='cars.carbrand', verbose_name='Марка')),
+                ('model', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='cars.carmodel', verbose_name='Модель')),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_cars', to=settings.AUTH_USER_MODEL, verbose_name='Владелец')),
+            ],
+            options={
+                'verbose_name': 'Архивное объявление',
+                'verbose_name_plural': 'Архивные объявления',
+                'ordering': ['-archived_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedCarImage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('image', models.ImageField(db_index=True, upload_to='car_images/', verbose_name='Изображение')),
+                ('is_main', models.BooleanField(default=False, verbose_name='Главное фото')),
+                ('created_at', models.DateTimeField()),
+                ('car', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='images', to='cars.archivedcar', verbose_name='Объявление')),
+            ],
+            options={
+                'verbose_name': 'Фото архивного объявления',
+                'verbose_name_plural': 'Фото архивных объявлений',
+                'ordering': ['-is_main', 'created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-19 17:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0008_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ListingStatusChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('car_id', models.BigIntegerField(db_index=True, verbose_name='ID объявления')),
+                ('old_status', models.CharField(choices=[('active', 'Активно'), ('sold', 'Продано'), ('inactive', 'Неактивно')], max_length=20, verbose_name='Был статус')),
+                ('new_status', models.CharField(choices=[('active', 'Активно'), ('sold', 'Продано'), ('inactive', 'Неактивно')], max_length=20, verbose_name='Стал статус')),
+                ('reason', models.CharField(choices=[('expired', 'Истёк срок публикации')], max_length=20, verbose_name='Причина')),
+                ('changed_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Дата')),
+            ],
+            options={
+                'verbose_name': 'Смена статуса объявления',
+                'verbose_name_plural': 'Смены статусов объявлений',
+                'ordering': ['-changed_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='car',
+            index=models.Index(fields=['status', 'updated_at'], name='car_status_updated_idx'),
+        ),
+    ]
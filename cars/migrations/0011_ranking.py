@@ -0,0 +1,53 @@
+# Generated by Django 4.2.7 on 2026-10-19 18:01
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def fill_rank_score(apps, schema_editor):
+    from cars.ranking import score
+
+    Car = apps.get_model('cars', 'Car')
+    RankingParameters = apps.get_model('cars', 'RankingParameters')
+    params, _ = RankingParameters.objects.get_or_create(pk=1, defaults={'epoch': timezone.now()})
+    now = timezone.now()
+    cars = list(Car.objects.only('pk', 'created_at', 'updated_at', 'views_count'))
+    for car in cars:
+        car.rank_score = score(car.created_at, car.updated_at, car.views_count, params, now)
+    Car.objects.bulk_update(cars, ['rank_score'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0010_search_query_stat'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RankingParameters',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('half_life_hours', models.FloatField(default=72, verbose_name='Период полураспада (ч)')),
+                ('base_weight', models.FloatField(default=20, verbose_name='Вес публикации')),
+                ('update_weight', models.FloatField(default=5, verbose_name='Вес правки')),
+                ('view_weight', models.FloatField(default=1, verbose_name='Вес просмотра')),
+                ('epoch', models.DateTimeField(verbose_name='Точка отсчёта')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Параметры популярности',
+                'verbose_name_plural': 'Параметры популярности',
+            },
+        ),
+        migrations.AddField(
+            model_name='car',
+            name='rank_score',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='car',
+            index=models.Index(fields=['status', 'rank_score'], name='car_status_rank_idx'),
+        ),
+        migrations.RunPython(fill_rank_score, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-19 18:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0011_ranking'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SitemapShard',
+            fields=[
+                ('number', models.PositiveIntegerField(primary_key=True, serialize=False, verbose_name='Номер')),
+                ('urls', models.PositiveIntegerField(default=0, verbose_name='Адресов')),
+                ('pk_sum', models.BigIntegerField(default=0)),
+                ('max_updated_at', models.DateTimeField(blank=True, null=True)),
+                ('lastmod', models.DateTimeField(verbose_name='Изменён')),
+                ('generated_at', models.DateTimeField(verbose_name='Записан')),
+            ],
+            options={
+                'verbose_name': 'Часть карты сайта',
+                'verbose_name_plural': 'Карта сайта',
+                'ordering': ['number'],
+            },
+        ),
+    ]
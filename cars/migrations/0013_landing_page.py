@@ -0,0 +1,35 @@
+# Generated by Django 4.2.7 on 2026-10-19 18:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0012_sitemap_shard'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LandingPage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('brand', 'Марка'), ('model', 'Модель')], max_length=10, verbose_name='Тип')),
+                ('object_id', models.PositiveIntegerField(verbose_name='id марки или модели')),
+                ('path', models.CharField(blank=True, max_length=255, verbose_name='Адрес')),
+                ('dirty', models.BooleanField(default=True, verbose_name='Устарела')),
+                ('marked_at', models.DateTimeField(verbose_name='Помечена')),
+                ('rendered_at', models.DateTimeField(blank=True, null=True, verbose_name='Отрисована')),
+            ],
+            options={
+                'verbose_name': 'Посадочная страница',
+                'verbose_name_plural': 'Посадочные страницы',
+                'ordering': ['path'],
+                'indexes': [models.Index(fields=['dirty', 'marked_at'], name='landing_page_dirty_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='landingpage',
+            constraint=models.UniqueConstraint(fields=('kind', 'object_id'), name='landing_page_object_uniq'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 4.2.7 on 2026-10-19 18:16
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0013_landing_page'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CarPriceHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('price', models.DecimalField(decimal_places=2, max_digits=12, verbose_name='Цена')),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Дата изменения')),
+            ],
+            options={
+                'verbose_name': 'Изменение цены',
+                'verbose_name_plural': 'История цен',
+            },
+        ),
+        migrations.AddField(
+            model_name='car',
+            name='last_price_drop_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Последнее снижение цены'),
+        ),
+        migrations.AddIndex(
+            model_name='car',
+            index=models.Index(fields=['status', 'last_price_drop_at'], name='car_status_price_drop_idx'),
+        ),
+        migrations.AddField(
+            model_name='carpricehistory',
+            name='car',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='price_history', to='cars.car', verbose_name='Автомобиль'),
+        ),
+        migrations.AddIndex(
+            model_name='carpricehistory',
+            index=models.Index(fields=['car', 'changed_at'], name='car_price_history_idx'),
+        ),
+        # Текущая цена существующих объявлений — первая точка их истории
+        migrations.RunSQL(
+            'INSERT INTO cars_carpricehistory (car_id, price, changed_at) '
+            'SELECT id, price, created_at FROM cars_car',
+            migrations.RunSQL.noop,
+        ),
+    ]
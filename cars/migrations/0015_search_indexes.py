@@ -0,0 +1,49 @@
+# Generated by Django 4.2.7 on 2026-10-19 18:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0014_price_history'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='car',
+            index=models.Index(fields=['created_at'], name='car_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='car',
+            index=models.Index(fields=['status', 'created_at'], name='car_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='car',
+            index=models.Index(fields=['status', 'price'], name='car_status_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='car',
+            index=models.Index(condition=models.Q(('status', 'active')), fields=['brand', 'created_at'], name='car_active_brand_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='car',
+            index=models.Index(condition=models.Q(('status', 'active')), fields=['model', 'created_at'], name='car_active_model_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='car',
+            index=models.Index(condition=models.Q(('status', 'active')), fields=['locality', 'created_at'], name='car_active_locality_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='carimage',
+            index=models.Index(fields=['car', '-is_main', 'created_at'], name='car_image_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='carview',
+            index=models.Index(fields=['car', 'ip_address'], name='car_view_visitor_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='carview',
+            index=models.Index(fields=['car', 'viewed_at'], name='car_view_time_idx'),
+        ),
+    ]
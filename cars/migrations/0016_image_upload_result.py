@@ -0,0 +1,19 @@
+# Generated by Django 4.2.7 on 2026-10-19 18:39
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0015_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='imageupload',
+            name='image',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='upload', to='cars.carimage', verbose_name='Созданное фото'),
+        ),
+    ]
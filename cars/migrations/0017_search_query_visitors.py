@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-19 18:47
+
+from django.db import migrations, models
+
+
+def forget_counts(apps, schema_editor):
+    # Прежние счётчики считали запросы, а не посетителей, — им нельзя верить
+    apps.get_model('cars', 'SearchQueryStat').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0016_image_upload_result'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchQueryVisitor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('query', models.CharField(max_length=100, verbose_name='Запрос')),
+                ('visitor', models.CharField(max_length=64, verbose_name='Посетитель (хэш)')),
+                ('seen_at', models.DateTimeField(verbose_name='Когда')),
+            ],
+            options={
+                'verbose_name': 'Посетитель поискового запроса',
+                'verbose_name_plural': 'Посетители поисковых запросов',
+                'indexes': [models.Index(fields=['seen_at'], name='search_query_visitor_seen_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='searchqueryvisitor',
+            constraint=models.UniqueConstraint(fields=('query', 'visitor'), name='search_query_visitor_uniq'),
+        ),
+        migrations.RunPython(forget_counts, migrations.RunPython.noop),
+    ]
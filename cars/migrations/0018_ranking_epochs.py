@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-19 18:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0017_search_query_visitors'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='car',
+            name='rank_epoch',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='rankingparameters',
+            name='rebase_epoch',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Сдвиг точки отсчёта'),
+        ),
+    ]
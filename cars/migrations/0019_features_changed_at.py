@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 19:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0018_ranking_epochs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='car',
+            name='features_changed_at',
+            field=models.DateTimeField(blank=True, db_index=True, editable=False, null=True),
+        ),
+    ]
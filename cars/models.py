@@ -1,7 +1,11 @@
 # cars/models.py
-from django.db import models
+import uuid
+
+from django.db import models, transaction
 from django.urls import reverse
+from django.utils import timezone
 from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 
 class CarBrand(models.Model):
     name = models.CharField(
@@ -15,6 +19,17 @@ class CarBrand(models.Model):
         null=True,
         verbose_name='Логотип'
     )
+    code = models.SlugField(
+        max_length=100,
+        unique=True,
+        null=True,
+        blank=True,
+        verbose_name='Код в справочнике'
+    )
+    is_active = models.BooleanField(
+        default=True,
+        verbose_name='Активна'
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
@@ -36,17 +51,71 @@ class CarModel(models.Model):
         max_length=100,
         verbose_name='Модель'
     )
+    code = models.SlugField(
+        max_length=100,
+        null=True,
+        blank=True,
+        verbose_name='Код в справочнике'
+    )
+    is_active = models.BooleanField(
+        default=True,
+        verbose_name='Активна'
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
         verbose_name = 'Модель автомобиля'
         verbose_name_plural = 'Модели автомобилей'
         ordering = ['name']
-        unique_together = ['brand', 'name']
+        unique_together = [['brand', 'name'], ['brand', 'code']]
     
     def __str__(self):
         return f'{self.brand.name} {self.name}'
 
+class Locality(models.Model):
+    """Населённый пункт из справочника с координатами"""
+    name = models.CharField(
+        max_length=100,
+        verbose_name='Название'
+    )
+    name_normalized = models.CharField(
+        max_length=100,
+        db_index=True,
+        editable=False
+    )
+    region = models.CharField(
+        max_length=100,
+        blank=True,
+        verbose_name='Регион'
+    )
+    latitude = models.FloatField(
+        verbose_name='Широта'
+    )
+    longitude = models.FloatField(
+        verbose_name='Долгота'
+    )
+    population = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Население'
+    )
+    
+    class Meta:
+        verbose_name = 'Населённый пункт'
+        verbose_name_plural = 'Населённые пункты'
+        ordering = ['-population', 'name']
+        unique_together = ['name', 'region']
+        indexes = [
+            models.Index(fields=['latitude', 'longitude'], name='locality_lat_lon_idx'),
+        ]
+    
+    def __str__(self):
+        return self.name
+    
+    def save(self, *args, **kwargs):
+        from .geo import normalize_locality_name
+        self.name_normalized = normalize_locality_name(self.name)
+        super().save(*args, **kwargs)
+
 class Car(models.Model):
     
     BODY_TYPE_CHOICES = [
@@ -176,6 +245,18 @@ class Car(models.Model):
         blank=True,
         verbose_name='Гос. номер'
     )
+    vin_normalized = models.CharField(
+        max_length=17,
+        blank=True,
+        db_index=True,
+        editable=False
+    )
+    plate_normalized = models.CharField(
+        max_length=20,
+        blank=True,
+        db_index=True,
+        editable=False
+    )
     
     description = models.TextField(
         verbose_name='Описание'
@@ -184,6 +265,14 @@ class Car(models.Model):
         max_length=100,
         verbose_name='Местоположение'
     )
+    locality = models.ForeignKey(
+        Locality,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='cars',
+        verbose_name='Населённый пункт'
+    )
     contact_phone = models.CharField(
         max_length=17,
         verbose_name='Контактный телефон'
@@ -209,10 +298,63 @@ class Car(models.Model):
         verbose_name='Количество просмотров'
     )
     
+    # Битовая маска опций с назначенным CarFeature.bit, см. cars/features.py
+    feature_mask = models.BigIntegerField(
+        default=0,
+        editable=False
+    )
+    # Когда объявлению последний раз добавили опцию: индекс опций в памяти
+    # построен раньше и его не знает. updated_at для этого не годится — от него
+    # считаются lastmod карты сайта, снятие с публикации и архивация
+    features_changed_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        editable=False,
+        db_index=True
+    )
+    
+    # Популярность с затуханием по времени, см. cars/ranking.py
+    rank_score = models.FloatField(
+        default=0,
+        editable=False
+    )
+    # Точка отсчёта, от которой посчитан rank_score; пусто — RankingParameters.epoch
+    rank_epoch = models.DateTimeField(
+        null=True,
+        blank=True,
+        editable=False
+    )
+    
+    # Момент последнего снижения цены для ленты «подешевели»; сама история — в CarPriceHistory
+    last_price_drop_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name='Последнее снижение цены'
+    )
+    
     class Meta:
         verbose_name = 'Автомобиль'
         verbose_name_plural = 'Автомобили'
         ordering = ['-created_at']
+        indexes = [
+            # Поиск устаревших объявлений для снятия с публикации и архивации
+            models.Index(fields=['status', 'updated_at'], name='car_status_updated_idx'),
+            # Сортировка выдачи «по популярности»
+            models.Index(fields=['status', 'rank_score'], name='car_status_rank_idx'),
+            # «Цена снижена за последние N дней» — диапазон по индексу
+            models.Index(fields=['status', 'last_price_drop_at'], name='car_status_price_drop_idx'),
+            # Список в админке без фильтров, сортировка по умолчанию
+            models.Index(fields=['created_at'], name='car_created_idx'),
+            # Сортировки выдачи «сначала новые» и по цене, диапазон цены
+            models.Index(fields=['status', 'created_at'], name='car_status_created_idx'),
+            models.Index(fields=['status', 'price'], name='car_status_price_idx'),
+            # Фильтры выдачи по марке, модели и городу; поиск идёт только по активным,
+            # поэтому частичные индексы не хранят проданные и снятые
+            models.Index(fields=['brand', 'created_at'], name='car_active_brand_idx', condition=models.Q(status='active')),
+            models.Index(fields=['model', 'created_at'], name='car_active_model_idx', condition=models.Q(status='active')),
+            models.Index(fields=['locality', 'created_at'], name='car_active_locality_idx', condition=models.Q(status='active')),
+        ]
     
     def __str__(self):
         return f'{self.brand.name} {self.model.name} {self.year}'
@@ -220,10 +362,90 @@ class Car(models.Model):
     def get_absolute_url(self):
         return reverse('cars:car_detail', kwargs={'pk': self.pk})
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Исходные марка, модель и статус: кэш поиска сбрасывает и прежние выдачи
+        loaded = instance.__dict__
+        if {'brand_id', 'model_id', 'status'} <= loaded.keys():
+            instance._search_loaded = (loaded['brand_id'], loaded['model_id'], loaded['status'])
+        # Исходная цена: история пишется только при её изменении
+        if 'price' in loaded:
+            instance._loaded_price = loaded['price']
+        return instance
+    
+    def save(self, *args, owner_edit=False, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        derived = set()
+        # Привязываем текст местоположения к справочнику населённых пунктов
+        if update_fields is None or 'location' in update_fields:
+            from .geo import resolve_locality
+            self.locality_id = resolve_locality(self.location)
+            derived.add('locality')
+        # Нормализованные VIN и номер для поиска дублей по индексу
+        if update_fields is None or 'vin' in update_fields:
+            from .duplicates import normalize_vin
+            self.vin_normalized = normalize_vin(self.vin)
+            derived.add('vin_normalized')
+        if update_fields is None or 'license_plate' in update_fields:
+            from .duplicates import normalize_plate
+            self.plate_normalized = normalize_plate(self.license_plate)
+            derived.add('plate_normalized')
+        # Новое объявление начинает историю цен, изменение цены её продолжает,
+        # снижение ещё и сдвигает last_price_drop_at
+        record_price = False
+        if update_fields is None or 'price' in update_fields:
+            loaded_price = getattr(self, '_loaded_price', None)
+            if self._state.adding:
+                record_price = True
+            elif loaded_price is not None and self.price != loaded_price:
+                record_price = True
+                if self.price < loaded_price:
+                    self.last_price_drop_at = timezone.now()
+                    derived.add('last_price_drop_at')
+        if update_fields is not None and derived:
+            kwargs['update_fields'] = {*update_fields, *derived}
+        # Новое объявление получает стартовый вес, правка владельца (owner_edit из
+        # save_listing) — прибавку; прибавка идёт выражением, чтобы не затереть
+        # параллельные просмотры. Прочие полные сохранения вес не трогают, а точку
+        # отсчёта строки меняет только ranking
+        rank_bumped = False
+        if update_fields is None:
+            from . import ranking
+            if self._state.adding:
+                self.rank_score, self.rank_epoch = ranking.initial_score()
+            else:
+                kept = {'rank_epoch'}
+                if owner_edit:
+                    self.rank_score = ranking.update_increment()
+                    rank_bumped = True
+                else:
+                    kept.add('rank_score')
+                kwargs['update_fields'] = [
+                    f.name for f in self._meta.concrete_fields if not f.primary_key and f.name not in kept
+                ]
+        with transaction.atomic(savepoint=False):
+            super().save(*args, **kwargs)
+            if record_price:
+                CarPriceHistory.objects.create(car_id=self.pk, price=self.price)
+                self._loaded_price = self.price
+        if rank_bumped:
+            # Значение после UPDATE неизвестно, при обращении оно перечитается из БД
+            del self.__dict__['rank_score']
+    
+    def renew(self):
+        """Продлить публикацию одним UPDATE; проданные не продлеваются"""
+        from .lifecycle import renew
+        return renew(self.pk)
+    
     def increment_views(self):
-        """Увеличить счетчик просмотров"""
+        """Увеличить счетчик просмотров и вес популярности одним UPDATE"""
+        from . import ranking
+        Car.objects.filter(pk=self.pk).update(
+            views_count=models.F('views_count') + 1,
+            rank_score=ranking.view_increment(),
+        )
         self.views_count += 1
-        self.save(update_fields=['views_count'])
     
     def get_main_image(self):
         """Получить главное изображение"""
@@ -232,6 +454,83 @@ class Car(models.Model):
             return main_image
         return self.images.first()
 
+class RankingParameters(models.Model):
+    """Параметры популярности объявлений; одна строка, см. cars/ranking.py"""
+    half_life_hours = models.FloatField(
+        default=72,
+        verbose_name='Период полураспада (ч)'
+    )
+    base_weight = models.FloatField(
+        default=20,
+        verbose_name='Вес публикации'
+    )
+    update_weight = models.FloatField(
+        default=5,
+        verbose_name='Вес правки'
+    )
+    view_weight = models.FloatField(
+        default=1,
+        verbose_name='Вес просмотра'
+    )
+    # Точка отсчёта весов; сдвигается при пересчёте rank_score
+    epoch = models.DateTimeField(
+        verbose_name='Точка отсчёта'
+    )
+    # Новая точка отсчёта, пока строки Car переводятся на неё пачками
+    rebase_epoch = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Сдвиг точки отсчёта'
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Параметры популярности'
+        verbose_name_plural = 'Параметры популярности'
+    
+    def __str__(self):
+        return f'Полураспад {self.half_life_hours:g} ч'
+
+class ListingStatusChange(models.Model):
+    """Журнал автоматических смен статуса объявлений"""
+    REASON_CHOICES = [
+        ('expired', 'Истёк срок публикации'),
+    ]
+
+    # Без внешнего ключа: запись переживает архивацию объявления
+    car_id = models.BigIntegerField(
+        db_index=True,
+        verbose_name='ID объявления'
+    )
+    old_status = models.CharField(
+        max_length=20,
+        choices=Car.STATUS_CHOICES,
+        verbose_name='Был статус'
+    )
+    new_status = models.CharField(
+        max_length=20,
+        choices=Car.STATUS_CHOICES,
+        verbose_name='Стал статус'
+    )
+    reason = models.CharField(
+        max_length=20,
+        choices=REASON_CHOICES,
+        verbose_name='Причина'
+    )
+    changed_at = models.DateTimeField(
+        auto_now_add=True,
+        db_index=True,
+        verbose_name='Дата'
+    )
+
+    class Meta:
+        verbose_name = 'Смена статуса объявления'
+        verbose_name_plural = 'Смены статусов объявлений'
+        ordering = ['-changed_at']
+
+    def __str__(self):
+        return f'#{self.car_id}: {self.old_status} → {self.new_status}'
+
 class CarImage(models.Model):
     """Изображения автомобиля"""
     car = models.ForeignKey(
@@ -242,6 +541,7 @@ class CarImage(models.Model):
     )
     image = models.ImageField(
         upload_to='car_images/',
+        db_index=True,
         verbose_name='Изображение'
     )
     is_main = models.BooleanField(
@@ -254,10 +554,308 @@ class CarImage(models.Model):
         verbose_name = 'Изображение автомобиля'
         verbose_name_plural = 'Изображения автомобилей'
         ordering = ['-is_main', 'created_at']
-    
+        indexes = [
+            # Галерея и главное фото объявления читаются по индексу без сортировки
+            models.Index(fields=['car', '-is_main', 'created_at'], name='car_image_order_idx'),
+        ]
+
     def __str__(self):
         return f'Фото {self.car}'
 
+class CarPriceHistory(models.Model):
+    """Цена объявления с момента изменения; строка пишется только при смене цены"""
+    car = models.ForeignKey(
+        Car,
+        on_delete=models.CASCADE,
+        related_name='price_history',
+        verbose_name='Автомобиль'
+    )
+    price = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        verbose_name='Цена'
+    )
+    changed_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='Дата изменения'
+    )
+    
+    class Meta:
+        verbose_name = 'Изменение цены'
+        verbose_name_plural = 'История цен'
+        indexes = [
+            # График цены объявления — один проход по индексу
+            models.Index(fields=['car', 'changed_at'], name='car_price_history_idx'),
+        ]
+    
+    def __str__(self):
+        return f'{self.car_id}: {self.price}'
+
+class ImageUpload(models.Model):
+    """Незавершённая загрузка фото по частям"""
+    
+    id = models.UUIDField(
+        primary_key=True,
+        default=uuid.uuid4,
+        editable=False
+    )
+    car = models.ForeignKey(
+        Car,
+        on_delete=models.CASCADE,
+        related_name='uploads',
+        verbose_name='Автомобиль'
+    )
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='image_uploads',
+        verbose_name='Владелец'
+    )
+    filename = models.CharField(
+        max_length=255,
+        verbose_name='Имя файла'
+    )
+    size = models.PositiveBigIntegerField(
+        verbose_name='Размер (байт)'
+    )
+    chunk_size = models.PositiveIntegerField(
+        verbose_name='Размер части (байт)'
+    )
+    received = models.PositiveBigIntegerField(
+        default=0,
+        verbose_name='Получено (байт)'
+    )
+    sha256 = models.CharField(
+        max_length=64,
+        blank=True,
+        verbose_name='SHA-256 файла'
+    )
+    is_main = models.BooleanField(
+        default=False,
+        verbose_name='Главное фото'
+    )
+    image = models.OneToOneField(
+        CarImage,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='upload',
+        verbose_name='Созданное фото'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Загрузка фото'
+        verbose_name_plural = 'Загрузки фото'
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f'{self.filename} ({self.received}/{self.size})'
+    
+    @property
+    def total_chunks(self):
+        return max(1, -(-self.size // self.chunk_size))
+    
+    @property
+    def next_chunk(self):
+        return self.received // self.chunk_size
+    
+    @property
+    def is_complete(self):
+        return self.received >= self.size
+
+class ListingFingerprint(models.Model):
+    """Отпечатки объявления для поиска дублей"""
+    car = models.OneToOneField(
+        Car,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='fingerprint'
+    )
+    minhash = models.BinaryField(
+        blank=True,
+        default=b''
+    )
+    image_hash = models.BigIntegerField(
+        null=True,
+        blank=True
+    )
+    image_id = models.BigIntegerField(
+        null=True,
+        blank=True
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Отпечаток объявления'
+        verbose_name_plural = 'Отпечатки объявлений'
+
+class ListingSignatureBand(models.Model):
+    """Полосы LSH: объявления с совпавшей полосой — кандидаты в дубли"""
+    
+    KIND_TEXT = 1
+    KIND_IMAGE = 2
+    
+    KIND_CHOICES = [
+        (KIND_TEXT, 'Описание'),
+        (KIND_IMAGE, 'Фото'),
+    ]
+    
+    car = models.ForeignKey(
+        Car,
+        on_delete=models.CASCADE,
+        related_name='signature_bands'
+    )
+    kind = models.PositiveSmallIntegerField(choices=KIND_CHOICES)
+    band = models.PositiveSmallIntegerField()
+    value = models.BigIntegerField()
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['kind', 'band', 'value'], name='signature_band_lookup_idx'),
+        ]
+
+class DuplicateCandidate(models.Model):
+    """Найденный возможный дубль объявления"""
+    
+    REASON_CHOICES = [
+        ('vin', 'Совпадает VIN'),
+        ('plate', 'Совпадает гос. номер'),
+        ('text', 'Похожее описание'),
+        ('image', 'Похожее главное фото'),
+    ]
+    
+    car = models.ForeignKey(
+        Car,
+        on_delete=models.CASCADE,
+        related_name='duplicate_candidates',
+        verbose_name='Объявление'
+    )
+    duplicate_of = models.ForeignKey(
+        Car,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Похоже на'
+    )
+    reason = models.CharField(
+        max_length=10,
+        choices=REASON_CHOICES,
+        verbose_name='Причина'
+    )
+    score = models.FloatField(
+        default=1.0,
+        verbose_name='Сходство'
+    )
+    detected_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = 'Возможный дубль'
+        verbose_name_plural = 'Возможные дубли'
+        ordering = ['-detected_at']
+        unique_together = ['car', 'duplicate_of', 'reason']
+    
+    def __str__(self):
+        return f'{self.car_id} ~ {self.duplicate_of_id} ({self.reason})'
+
+class ArchivedCar(models.Model):
+    """Проданное или неактивное объявление, перенесённое из Car, см. cars/archive.py"""
+    id = models.BigIntegerField(
+        primary_key=True,
+        verbose_name='ID объявления'
+    )
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='archived_cars',
+        verbose_name='Владелец'
+    )
+    brand = models.ForeignKey(
+        CarBrand,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Марка'
+    )
+    model = models.ForeignKey(
+        CarModel,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Модель'
+    )
+    year = models.PositiveIntegerField(
+        verbose_name='Год выпуска'
+    )
+    price = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        verbose_name='Цена (руб.)'
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=Car.STATUS_CHOICES,
+        verbose_name='Статус'
+    )
+    # Остальные поля Car в сериализованном виде
+    data = models.JSONField(
+        default=dict,
+        encoder=DjangoJSONEncoder,
+        verbose_name='Данные объявления'
+    )
+    feature_ids = models.JSONField(
+        default=list,
+        verbose_name='Опции'
+    )
+    # Сводка по CarView: всего, уникальных пользователей, последний просмотр
+    views_summary = models.JSONField(
+        default=dict,
+        verbose_name='Просмотры'
+    )
+    created_at = models.DateTimeField(
+        verbose_name='Дата создания'
+    )
+    updated_at = models.DateTimeField(
+        verbose_name='Дата обновления'
+    )
+    archived_at = models.DateTimeField(
+        auto_now_add=True,
+        db_index=True,
+        verbose_name='Дата архивации'
+    )
+
+    class Meta:
+        verbose_name = 'Архивное объявление'
+        verbose_name_plural = 'Архивные объявления'
+        ordering = ['-archived_at']
+
+    def __str__(self):
+        return f'{self.brand.name} {self.model.name} {self.year} (архив)'
+
+
+class ArchivedCarImage(models.Model):
+    """Фото архивного объявления; файл остаётся в хранилище на своём месте"""
+    car = models.ForeignKey(
+        ArchivedCar,
+        on_delete=models.CASCADE,
+        related_name='images',
+        verbose_name='Объявление'
+    )
+    image = models.ImageField(
+        upload_to='car_images/',
+        db_index=True,
+        verbose_name='Изображение'
+    )
+    is_main = models.BooleanField(
+        default=False,
+        verbose_name='Главное фото'
+    )
+    created_at = models.DateTimeField()
+
+    class Meta:
+        verbose_name = 'Фото архивного объявления'
+        verbose_name_plural = 'Фото архивных объявлений'
+        ordering = ['-is_main', 'created_at']
+
+
 class CarFeature(models.Model):
     """Дополнительные опции автомобиля"""
     name = models.CharField(
@@ -269,6 +867,24 @@ class CarFeature(models.Model):
         max_length=50,
         verbose_name='Категория'
     )
+    code = models.SlugField(
+        max_length=100,
+        unique=True,
+        null=True,
+        blank=True,
+        verbose_name='Код в справочнике'
+    )
+    is_active = models.BooleanField(
+        default=True,
+        verbose_name='Активна'
+    )
+    bit = models.PositiveSmallIntegerField(
+        null=True,
+        blank=True,
+        unique=True,
+        editable=False,
+        verbose_name='Бит в маске опций'
+    )
     
     class Meta:
         verbose_name = 'Опция автомобиля'
@@ -278,6 +894,30 @@ class CarFeature(models.Model):
     def __str__(self):
         return self.name
 
+class CatalogRevision(models.Model):
+    """Применённые версии справочника марок, моделей и опций"""
+    version = models.CharField(
+        max_length=50,
+        verbose_name='Версия'
+    )
+    checksum = models.CharField(
+        max_length=64,
+        verbose_name='Контрольная сумма'
+    )
+    stats = models.JSONField(
+        default=dict,
+        verbose_name='Изменения'
+    )
+    applied_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = 'Версия справочника'
+        verbose_name_plural = 'Версии справочника'
+        ordering = ['-applied_at']
+    
+    def __str__(self):
+        return self.version
+
 class CarFeatureRelation(models.Model):
     """Связь автомобиля с опциями"""
     car = models.ForeignKey(
@@ -295,6 +935,120 @@ class CarFeatureRelation(models.Model):
         verbose_name = 'Опция автомобиля'
         verbose_name_plural = 'Опции автомобилей'
 
+class SearchQueryStat(models.Model):
+    """Частота поисковых запросов для подсказок, см. cars/typeahead.py"""
+    query = models.CharField(
+        max_length=100,
+        unique=True,
+        verbose_name='Запрос'
+    )
+    count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Количество'
+    )
+    last_seen = models.DateTimeField(
+        verbose_name='Последний раз'
+    )
+    
+    class Meta:
+        verbose_name = 'Поисковый запрос'
+        verbose_name_plural = 'Поисковые запросы'
+        ordering = ['-count']
+    
+    def __str__(self):
+        return self.query
+
+class SearchQueryVisitor(models.Model):
+    """Кто искал запрос: подсказка появляется только от разных посетителей"""
+    query = models.CharField(
+        max_length=100,
+        verbose_name='Запрос'
+    )
+    visitor = models.CharField(
+        max_length=64,
+        verbose_name='Посетитель (хэш)'
+    )
+    seen_at = models.DateTimeField(
+        verbose_name='Когда'
+    )
+    
+    class Meta:
+        verbose_name = 'Посетитель поискового запроса'
+        verbose_name_plural = 'Посетители поисковых запросов'
+        constraints = [
+            models.UniqueConstraint(fields=['query', 'visitor'], name='search_query_visitor_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['seen_at'], name='search_query_visitor_seen_idx'),
+        ]
+
+class SitemapShard(models.Model):
+    """Файл карты сайта с объявлениями из диапазона id и его сигнатура"""
+    number = models.PositiveIntegerField(
+        primary_key=True,
+        verbose_name='Номер'
+    )
+    urls = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Адресов'
+    )
+    pk_sum = models.BigIntegerField(default=0)
+    max_updated_at = models.DateTimeField(null=True, blank=True)
+    lastmod = models.DateTimeField(verbose_name='Изменён')
+    generated_at = models.DateTimeField(verbose_name='Записан')
+
+    class Meta:
+        verbose_name = 'Часть карты сайта'
+        verbose_name_plural = 'Карта сайта'
+        ordering = ['number']
+
+    def __str__(self):
+        return f'sitemap-cars-{self.number}'
+
+class LandingPage(models.Model):
+    """Статическая страница марки или модели; dirty — её нужно перерисовать"""
+
+    KIND_CHOICES = [
+        ('brand', 'Марка'),
+        ('model', 'Модель'),
+    ]
+
+    kind = models.CharField(
+        max_length=10,
+        choices=KIND_CHOICES,
+        verbose_name='Тип'
+    )
+    object_id = models.PositiveIntegerField(verbose_name='id марки или модели')
+    path = models.CharField(
+        max_length=255,
+        blank=True,
+        verbose_name='Адрес'
+    )
+    dirty = models.BooleanField(
+        default=True,
+        verbose_name='Устарела'
+    )
+    marked_at = models.DateTimeField(verbose_name='Помечена')
+    rendered_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Отрисована'
+    )
+
+    class Meta:
+        verbose_name = 'Посадочная страница'
+        verbose_name_plural = 'Посадочные страницы'
+        ordering = ['path']
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'object_id'], name='landing_page_object_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['dirty', 'marked_at'], name='landing_page_dirty_idx'),
+        ]
+
+    def __str__(self):
+        return self.path or f'{self.kind} #{self.object_id}'
+
 class CarView(models.Model):
     """Просмотры автомобилей (для аналитики)"""
     car = models.ForeignKey(
@@ -313,4 +1067,9 @@ class CarView(models.Model):
     
     class Meta:
         verbose_name = 'Просмотр автомобиля'
-        verbose_name_plural = 'Просмотры автомобилей'
\ No newline at end of file
+        verbose_name_plural = 'Просмотры автомобилей'
+        indexes = [
+            # Уникальные посетители и последний просмотр считаются по индексу, без таблицы
+            models.Index(fields=['car', 'ip_address'], name='car_view_visitor_idx'),
+            models.Index(fields=['car', 'viewed_at'], name='car_view_time_idx'),
+        ]
\ No newline at end of file
@@ -0,0 +1,195 @@
+# cars/ranking.py
+"""Популярность объявлений для сортировки выдачи.
+
+Используется прямое затухание (forward decay): событие в момент t
+прибавляет к ``Car.rank_score`` вес ``w * 2 ** ((t - epoch) / half_life)``.
+Более поздние события весят экспоненциально больше, поэтому порядок по
+rank_score совпадает с порядком по сумме весов, затухающих к текущему
+моменту, а сами строки со временем переписывать не нужно: просмотр или
+правка — одно UPDATE с F(), сортировка — проход по индексу
+(status, rank_score).
+
+Множитель растёт со временем, поэтому периодическая задача сдвигает
+``epoch`` на целое число периодов полураспада и делит оценки на ту же
+степень двойки. Строки переводятся пачками по диапазону id, каждая пачка в
+своей транзакции, а ``Car.rank_epoch`` помнит, от какой точки посчитана
+оценка строки. Пока идёт сдвиг, ``RankingParameters.rebase_epoch`` хранит
+новую точку: новые оценки считаются уже от неё, прибавка ещё не сдвинутой
+строке умножается на ту же степень двойки, а прерванный сдвиг продолжится
+при следующем запуске. Порядок выдачи на время сдвига неточен: сдвинутые
+строки временно проигрывают остальным. После смены весов или периода
+оценки пересчитываются пачками по данным объявления.
+"""
+import math
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, F, When
+from django.utils import timezone
+
+from .models import Car, RankingParameters
+
+# Сдвигать точку отсчёта, когда множитель превысит 2 ** REBASE_HALF_LIVES
+REBASE_HALF_LIVES = 16
+
+_PARAMS_KEY = 'ranking:params'
+
+
+def parameters():
+    """Параметры из общего кэша: после сдвига точки отсчёта все процессы видят новую"""
+    params = cache.get(_PARAMS_KEY)
+    if params is None:
+        params = RankingParameters.objects.filter(pk=1).first()
+        if params is None:
+            params, _ = RankingParameters.objects.get_or_create(pk=1, defaults={'epoch': timezone.now()})
+        cache.set(_PARAMS_KEY, params, None)
+    return params
+
+
+def forget_parameters():
+    cache.delete(_PARAMS_KEY)
+
+
+def current_epoch(params=None):
+    """Точка отсчёта для новых оценок: во время сдвига — уже новая"""
+    params = params or parameters()
+    return params.rebase_epoch or params.epoch
+
+
+def _half_lives(start, end, params):
+    return (end - start).total_seconds() / (params.half_life_hours * 3600)
+
+
+def growth(moment, params=None):
+    params = params or parameters()
+    return 2.0 ** _half_lives(current_epoch(params), moment, params)
+
+
+def initial_score():
+    """Стартовая оценка нового объявления и точка отсчёта, от которой она посчитана"""
+    params = parameters()
+    return params.base_weight * growth(timezone.now(), params), current_epoch(params)
+
+
+def _increment(weight):
+    params = parameters()
+    value = weight(params) * growth(timezone.now(), params)
+    if params.rebase_epoch is None:
+        return F('rank_score') + value
+    # Строка ещё от старой точки отсчёта: прибавка в её масштабе
+    behind = 2.0 ** _half_lives(params.epoch, params.rebase_epoch, params)
+    return Case(
+        When(rank_epoch=params.rebase_epoch, then=F('rank_score') + value),
+        default=F('rank_score') + value * behind,
+    )
+
+
+def update_increment():
+    """Выражение для rank_score с прибавкой за правку"""
+    return _increment(lambda params: params.update_weight)
+
+
+def view_increment():
+    """Выражение для rank_score с прибавкой за просмотр"""
+    return _increment(lambda params: params.view_weight)
+
+
+def score(created_at, updated_at, views_count, params=None, now=None):
+    """Оценка по данным объявления, когда истории событий нет.
+
+    Просмотры считаются равномерно распределёнными между публикацией и
+    текущим моментом: их средний множитель — интеграл 2 ** x по интервалу.
+    """
+    params = params or parameters()
+    now = now or timezone.now()
+    value = params.base_weight * growth(created_at, params)
+    if updated_at - created_at > timedelta(minutes=1):
+        value += params.update_weight * growth(updated_at, params)
+    if views_count:
+        start, end = growth(created_at, params), growth(now, params)
+        span = (now - created_at).total_seconds() / (params.half_life_hours * 3600)
+        average = (end - start) / (span * math.log(2)) if span > 0 else end
+        value += params.view_weight * views_count * average
+    return value
+
+
+def _batches(ids, batch_size):
+    columns = ('pk', 'created_at', 'updated_at', 'views_count')
+    if ids is not None:
+        ids = sorted(ids)
+        for start in range(0, len(ids), batch_size):
+            yield list(Car.objects.filter(pk__in=ids[start:start + batch_size]).values_list(*columns))
+        return
+    last_pk = 0
+    while True:
+        rows = list(Car.objects.filter(pk__gt=last_pk).order_by('pk').values_list(*columns)[:batch_size])
+        if not rows:
+            return
+        last_pk = rows[-1][0]
+        yield rows
+
+
+def recompute(ids=None, batch_size=1000):
+    """Пересчитать rank_score по данным объявлений пачками по id"""
+    params = parameters()
+    epoch = current_epoch(params)
+    now = timezone.now()
+    updated = 0
+    for rows in _batches(ids, batch_size):
+        cars = [
+            Car(pk=pk, rank_score=score(created_at, updated_at, views, params, now), rank_epoch=epoch)
+            for pk, created_at, updated_at, views in rows
+        ]
+        with transaction.atomic():
+            Car.objects.bulk_update(cars, ['rank_score', 'rank_epoch'])
+        updated += len(cars)
+    return updated
+
+
+def _rescale(params, low, high=None):
+    """Перевести строки с id в (low, high] на новую точку отсчёта"""
+    rows = Car.objects.filter(pk__gt=low).exclude(rank_epoch=params.rebase_epoch)
+    if high is not None:
+        rows = rows.filter(pk__lte=high)
+    updated = 0
+    for epoch in set(rows.order_by().values_list('rank_epoch', flat=True).distinct()):
+        # Обычно строка от текущей точки, но могла остаться и от более ранней
+        shift = _half_lives(epoch or params.epoch, params.rebase_epoch, params)
+        matching = rows.filter(rank_epoch=epoch) if epoch else rows.filter(rank_epoch__isnull=True)
+        updated += matching.update(rank_score=F('rank_score') * 2.0 ** -shift, rank_epoch=params.rebase_epoch)
+    return updated
+
+
+def rebase(force=False, batch_size=1000):
+    """Сдвинуть точку отсчёта вперёд и уменьшить все оценки; вернуть число периодов"""
+    params = RankingParameters.objects.filter(pk=1).first()
+    if params is None:
+        return 0
+    if params.rebase_epoch is None:
+        elapsed = math.floor(_half_lives(params.epoch, timezone.now(), params))
+        if elapsed < (1 if force else REBASE_HALF_LIVES):
+            return 0
+        params.rebase_epoch = params.epoch + timedelta(hours=params.half_life_hours * elapsed)
+        params.save(update_fields=['rebase_epoch', 'updated_at'])
+        forget_parameters()
+    elapsed = round(_half_lives(params.epoch, params.rebase_epoch, params))
+
+    last_pk = 0
+    while True:
+        bound = (
+            Car.objects.filter(pk__gt=last_pk).order_by('pk')
+            .values_list('pk', flat=True)[batch_size - 1:batch_size].first()
+        )
+        if bound is None:
+            break
+        with transaction.atomic():
+            _rescale(params, last_pk, bound)
+        last_pk = bound
+    # Хвост и смена точки отсчёта — одной транзакцией, чтобы новые строки не остались в старом масштабе
+    with transaction.atomic():
+        _rescale(params, last_pk)
+        params.epoch, params.rebase_epoch = params.rebase_epoch, None
+        params.save(update_fields=['epoch', 'rebase_epoch', 'updated_at'])
+    forget_parameters()
+    return elapsed
@@ -0,0 +1,242 @@
+# cars/search_cache.py
+"""Кэш результатов поиска по CarSearchForm.
+
+Ключ строится из канонического вида cleaned_data: ключи отсортированы,
+в строке поиска к нижнему регистру приведены только латинские буквы (icontains
+в SQLite не различает регистр лишь у ASCII), объекты заменены на id,
+десятичные числа нормализованы, а границы цены округлены наружу до двух
+значащих цифр. Поэтому «от 1 234 567» и «от 1 250 000» попадают в одну
+запись, а точные границы применяются в памяти к сохранённым парам
+(id, цена).
+
+Запись устаревает при изменении объявлений: в ключ входит счётчик поколения
+самой узкой области запроса (модель, марка или всё) и общий счётчик эпохи
+для массовых операций. Изменение объявления записывает в счётчики его марки,
+модели и «всё» текущее время в наносекундах — обычный cache.set, без
+неатомарного incr файлового кэша, — и старые записи перестают читаться. Просмотры выдачу
+не сбрасывают, поэтому порядок «по популярности» в кэше отстаёт на время
+жизни записи. Так же окно «цена снижена за N дней» отсчитывается от момента
+заполнения записи.
+
+После SEARCH_CACHE_TTL запись ещё живёт в кэше: пересчитывает её только
+запрос, успевший взять блокировку через cache.add, остальные в это время
+получают старую выдачу. При полном промахе остальные запросы недолго ждут,
+пока первый заполнит запись, а не повторяют тот же запрос к БД.
+"""
+import hashlib
+import json
+import random
+import time
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Car
+
+MAX_CACHED_IDS = 1000
+STALE_TTL = 600
+LOCK_TTL = 30
+FILL_WAIT = 1.0
+FILL_POLL = 0.05
+PRICE_DIGITS = 2
+
+# Сортировки CarSearchForm.ordering; «по популярности» и «недавно подешевевшие»
+# идут по индексам (status, rank_score) и (status, last_price_drop_at)
+ORDERINGS = {
+    '': ('-created_at', '-pk'),
+    'popular': ('-rank_score', '-pk'),
+    'price': ('price', 'pk'),
+    '-price': ('-price', '-pk'),
+    'price_drop': ('-last_price_drop_at', '-pk'),
+}
+
+_EPOCH_KEY = 'search:epoch'
+_ASCII_LOWER = str.maketrans(
+    'ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz'
+)
+_GENERATION_KEY = 'search:gen:%s'
+
+
+def active_listings():
+    return Car.objects.filter(status='active')
+
+
+def _bucket(value, up):
+    """Округлить цену до PRICE_DIGITS значащих цифр вниз или вверх"""
+    if value <= 0:
+        return Decimal(0)
+    step = Decimal(10) ** max(value.adjusted() - PRICE_DIGITS + 1, 0)
+    rounded = (value // step) * step
+    if up and rounded < value:
+        rounded += step
+    return rounded
+
+
+def _decimal(value):
+    return format(value.normalize(), 'f')
+
+
+def canonical(data):
+    """Вернуть (параметры ключа, расширенные данные формы) или (None, None)"""
+    # Поиск от координат пользователя почти не повторяется — не кэшируем
+    if data.get('latitude') is not None or data.get('longitude') is not None:
+        return None, None
+    params = {}
+    widened = dict(data)
+    search = ' '.join((data.get('search') or '').translate(_ASCII_LOWER).split())
+    if search:
+        params['search'] = search
+    for name in ('brand', 'model', 'locality'):
+        if data.get(name):
+            params[name] = data[name].pk
+    for name in ('year_from', 'year_to', 'radius', 'body_type', 'fuel_type', 'transmission',
+                 'condition', 'price_dropped_days', 'ordering'):
+        if data.get(name):
+            params[name] = data[name]
+    if data.get('features'):
+        params['features'] = sorted(feature.pk for feature in data['features'])
+    if data.get('price_from') is not None:
+        widened['price_from'] = _bucket(data['price_from'], up=False)
+        params['price_from'] = _decimal(widened['price_from'])
+    if data.get('price_to') is not None:
+        widened['price_to'] = _bucket(data['price_to'], up=True)
+        params['price_to'] = _decimal(widened['price_to'])
+    return params, widened
+
+
+def _scope(params):
+    if 'model' in params:
+        return f'model:{params["model"]}'
+    if 'brand' in params:
+        return f'brand:{params["brand"]}'
+    return 'all'
+
+
+def _counter(key):
+    """Текущее значение счётчика; новый начинается с метки времени, а не с нуля,
+    чтобы после вытеснения из кэша не ожили записи старого поколения"""
+    value = cache.get(key)
+    if value is None:
+        cache.add(key, time.time_ns(), None)
+        value = cache.get(key)
+    return value
+
+
+def _bump(key):
+    cache.set(key, time.time_ns(), None)
+
+
+def cache_key(params):
+    digest = hashlib.sha1(
+        json.dumps(params, sort_keys=True, separators=(',', ':'), ensure_ascii=False).encode()
+    ).hexdigest()
+    scope = _scope(params)
+    return f'search:{digest}:{_counter(_EPOCH_KEY)}:{_counter(_GENERATION_KEY % scope)}'
+
+
+def ordering(data):
+    return ORDERINGS.get(data.get('ordering') or '', ORDERINGS[''])
+
+
+def _compute(form, widened):
+    queryset = form.filter_queryset(active_listings(), widened).order_by(*ordering(widened))
+    rows = list(queryset.values_list('pk', 'price')[:MAX_CACHED_IDS + 1])
+    truncated = len(rows) > MAX_CACHED_IDS
+    return {
+        'rows': rows[:MAX_CACHED_IDS],
+        'total': queryset.count() if truncated else len(rows),
+        'truncated': truncated,
+        'fresh_until': time.time() + settings.SEARCH_CACHE_TTL * random.uniform(0.9, 1.1),
+    }
+
+
+def _fill(key, form, widened):
+    entry = _compute(form, widened)
+    cache.set(key, entry, settings.SEARCH_CACHE_TTL + STALE_TTL)
+    return entry
+
+
+def _fetch(key, form, widened):
+    entry = cache.get(key)
+    lock = f'{key}:lock'
+    if entry is not None and entry['fresh_until'] > time.time():
+        return entry
+    if cache.add(lock, 1, LOCK_TTL):
+        try:
+            return _fill(key, form, widened)
+        finally:
+            cache.delete(lock)
+    if entry is not None:
+        # Запись пересчитывает другой запрос, отдаём устаревшую
+        return entry
+    deadline = time.monotonic() + FILL_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(FILL_POLL)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry
+    return _fill(key, form, widened)
+
+
+def search(form, offset=0, limit=20):
+    """id активных объявлений для страницы выдачи и общее число найденных"""
+    params, widened = canonical(form.cleaned_data)
+    if params is None or offset + limit > MAX_CACHED_IDS:
+        queryset = form.filter_queryset(active_listings()).order_by(*ordering(form.cleaned_data))
+        return list(queryset.values_list('pk', flat=True)[offset:offset + limit]), queryset.count()
+
+    entry = _fetch(cache_key(params), form, widened)
+    rows, total = entry['rows'], entry['total']
+    low, high = form.cleaned_data.get('price_from'), form.cleaned_data.get('price_to')
+    narrowed = (low is not None and low != widened['price_from']) or \
+               (high is not None and high != widened['price_to'])
+    if narrowed:
+        if entry['truncated']:
+            # В сохранённом списке не все строки диапазона — точный ответ только из БД
+            queryset = form.filter_queryset(active_listings()).order_by(*ordering(form.cleaned_data))
+            return list(queryset.values_list('pk', flat=True)[offset:offset + limit]), queryset.count()
+        rows = [
+            row for row in rows
+            if (low is None or row[1] >= low) and (high is None or row[1] <= high)
+        ]
+        total = len(rows)
+    return [pk for pk, _ in rows[offset:offset + limit]], total
+
+
+def fetch_page(ids):
+    """Объявления страницы выдачи в порядке ``ids``"""
+    cars = (
+        Car.objects.select_related('brand', 'model')
+        .prefetch_related('images')
+        .in_bulk(ids)
+    )
+    return [cars[pk] for pk in ids if pk in cars]
+
+
+def invalidate(brand_ids=(), model_ids=()):
+    _bump(_GENERATION_KEY % 'all')
+    for pk in set(brand_ids):
+        _bump(_GENERATION_KEY % f'brand:{pk}')
+    for pk in set(model_ids):
+        _bump(_GENERATION_KEY % f'model:{pk}')
+
+
+def listing_scopes(car):
+    """Марки и модели выдач, где объявление было или появится; None — не было нигде"""
+    current = (car.brand_id, car.model_id, car.status)
+    loaded = getattr(car, '_search_loaded', None) or current
+    car._search_loaded = current
+    if 'active' not in (current[2], loaded[2]):
+        return None
+    return {current[0], loaded[0]}, {current[1], loaded[1]}
+
+
+def invalidate_ids(car_ids):
+    rows = list(Car.objects.filter(pk__in=car_ids).values_list('brand_id', 'model_id'))
+    if rows:
+        invalidate(*zip(*rows))
+
+
+def invalidate_all():
+    _bump(_EPOCH_KEY)
@@ -0,0 +1,114 @@
+# cars/serializers.py
+from django.core.files.storage import default_storage
+from django.db.models import OuterRef, Subquery
+from rest_framework import serializers
+
+from .models import Car, CarImage, ImageUpload
+
+
+class ImageUploadSerializer(serializers.ModelSerializer):
+    """Состояние загрузки фото по частям"""
+    
+    total_chunks = serializers.IntegerField(read_only=True)
+    next_chunk = serializers.IntegerField(read_only=True)
+    
+    class Meta:
+        model = ImageUpload
+        fields = [
+            'id', 'car', 'filename', 'size', 'sha256', 'is_main',
+            'chunk_size', 'received', 'total_chunks', 'next_chunk', 'image',
+        ]
+        read_only_fields = ['id', 'car', 'chunk_size', 'received', 'image']
+        extra_kwargs = {'size': {'min_value': 1}}
+
+
+class CarListSerializer(serializers.ModelSerializer):
+    """Объявление в выдаче поиска"""
+    
+    brand = serializers.CharField(source='brand.name')
+    model = serializers.CharField(source='model.name')
+    body_type = serializers.CharField(source='get_body_type_display')
+    fuel_type = serializers.CharField(source='get_fuel_type_display')
+    transmission = serializers.CharField(source='get_transmission_display')
+    main_image = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = Car
+        fields = [
+            'id', 'brand', 'model', 'year', 'price', 'is_negotiable', 'mileage',
+            'body_type', 'fuel_type', 'transmission', 'location', 'main_image', 'created_at',
+        ]
+    
+    def get_main_image(self, car):
+        # Фото уже загружены prefetch_related, get_main_image сделал бы запрос
+        images = sorted(car.images.all(), key=lambda image: (not image.is_main, image.created_at))
+        return images[0].image.url if images else None
+
+
+class CarListValuesSerializer:
+    """Тот же вывод, что у CarListSerializer, без экземпляров модели.
+
+    Колонки выбираются через values(), главное фото — подзапросом, подписи
+    вариантов берутся из заранее собранных словарей. Только для чтения.
+    """
+    
+    columns = (
+        'id', 'brand__name', 'model__name', 'year', 'price', 'is_negotiable', 'mileage',
+        'body_type', 'fuel_type', 'transmission', 'location', 'main_image', 'created_at',
+    )
+    labels = {
+        'body_type': dict(Car.BODY_TYPE_CHOICES),
+        'fuel_type': dict(Car.FUEL_TYPE_CHOICES),
+        'transmission': dict(Car.TRANSMISSION_CHOICES),
+    }
+    
+    def __init__(self, queryset, order=None):
+        self.queryset = queryset
+        self.order = order
+    
+    @classmethod
+    def for_ids(cls, ids):
+        """Строки для id в заданном порядке"""
+        return cls(Car.objects.filter(pk__in=ids), order=ids)
+    
+    @property
+    def data(self):
+        main_image = (
+            CarImage.objects.filter(car=OuterRef('pk'))
+            .order_by('-is_main', 'created_at')
+            .values('image')[:1]
+        )
+        rows = self.queryset.annotate(main_image=Subquery(main_image)).values_list(*self.columns)
+        body_types, fuel_types, transmissions = (
+            self.labels['body_type'], self.labels['fuel_type'], self.labels['transmission'],
+        )
+        url = default_storage.url
+        data = [
+            {
+                'id': pk,
+                'brand': brand,
+                'model': model,
+                'year': year,
+                'price': str(price),
+                'is_negotiable': is_negotiable,
+                'mileage': mileage,
+                'body_type': body_types.get(body_type, body_type),
+                'fuel_type': fuel_types.get(fuel_type, fuel_type),
+                'transmission': transmissions.get(transmission, transmission),
+                'location': location,
+                'main_image': url(image) if image else None,
+                'created_at': _isoformat(created_at),
+            }
+            for (pk, brand, model, year, price, is_negotiable, mileage, body_type,
+                 fuel_type, transmission, location, image, created_at) in rows
+        ]
+        if self.order is not None:
+            position = {pk: i for i, pk in enumerate(self.order)}
+            data.sort(key=lambda row: position[row['id']])
+        return data
+
+
+def _isoformat(value):
+    # Как serializers.DateTimeField при USE_TZ и TIME_ZONE = 'UTC'
+    value = value.isoformat()
+    return value[:-6] + 'Z' if value.endswith('+00:00') else value
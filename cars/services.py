@@ -0,0 +1,115 @@
+# cars/services.py
+"""Сохранение объявления вместе с опциями и фото.
+
+Запись в SQLite держит блокировку на всю транзакцию, поэтому всё медленное
+делается до неё: файлы фото записываются в хранилище, маска опций считается
+в памяти. Внутри транзакции остаётся постоянное число запросов на вставку и
+обновление: объявление, пакетная вставка опций, пакетные вставка и
+обновление фото. Пакетная вставка не шлёт post_save, поэтому сброс кэшей
+поиска и сравнения и проверка дублей ставятся один раз через on_commit, а
+маска опций уже записана вместе с объявлением. Удаляемые связи и фото идут
+через QuerySet.delete(), чтобы освободились файлы. Если транзакция
+откатилась, записанные до неё файлы освобождаются.
+"""
+from functools import partial
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import compare, search_cache
+from .features import mask_for
+from .models import CarFeatureRelation, CarImage
+from .signals import enqueue_check
+from .storage import release
+
+
+def _store_image(upload, stored):
+    field = CarImage._meta.get_field('image')
+    name = field.storage.save(field.generate_filename(None, upload.name), upload)
+    stored.append((name, upload))
+    return name
+
+
+def _plan_images(image_formset, stored):
+    """Разобрать формсет на (новые, изменённые, удаляемые, заменённые файлы).
+
+    Новые файлы записываются в хранилище сразу, до транзакции, и
+    добавляются в ``stored`` парами (имя, загруженный файл).
+    """
+    created, changed, deleted, replaced = [], [], [], []
+    for form in image_formset.forms:
+        data = getattr(form, 'cleaned_data', None)
+        if not data:
+            continue
+        image = form.instance
+        if image.pk:
+            if image_formset.can_delete and data.get('DELETE'):
+                deleted.append(image.pk)
+            elif form.has_changed():
+                if 'image' in form.changed_data:
+                    replaced.append(str(form.initial.get('image') or ''))
+                    image.image = _store_image(data['image'], stored)
+                image.is_main = data.get('is_main', False)
+                changed.append(image)
+        elif data.get('image') and not data.get('DELETE'):
+            created.append(CarImage(
+                image=_store_image(data['image'], stored),
+                is_main=data.get('is_main', False),
+            ))
+    return created, changed, deleted, replaced
+
+
+def save_listing(form, image_formset=None, owner=None):
+    """Сохранить CarForm, опции и CarImageFormSet одной короткой транзакцией"""
+    car = form.save(commit=False)
+    if owner is not None:
+        car.owner = owner
+    features = list(form.cleaned_data.get('features') or [])
+    wanted = {feature.pk for feature in features}
+    car.feature_mask = mask_for(f.bit for f in features if f.bit is not None)
+    storage = CarImage._meta.get_field('image').storage
+    stored_files = []
+    try:
+        created_images, changed_images, deleted_images, replaced_files = (
+            _plan_images(image_formset, stored_files) if image_formset is not None else ([], [], [], [])
+        )
+        with transaction.atomic():
+            existing = set()
+            if car.pk:
+                existing = set(
+                    CarFeatureRelation.objects.filter(car=car).values_list('feature_id', flat=True)
+                )
+            if wanted - existing:
+                # Индекс опций в памяти узнает о новых связях только при перестройке
+                car.features_changed_at = timezone.now()
+            car.save(owner_edit=True)
+
+            if wanted - existing:
+                CarFeatureRelation.objects.bulk_create([
+                    CarFeatureRelation(car=car, feature_id=pk) for pk in wanted - existing
+                ])
+            if existing - wanted:
+                CarFeatureRelation.objects.filter(car=car, feature_id__in=existing - wanted).delete()
+
+            for image in created_images:
+                image.car = car
+            if created_images:
+                CarImage.objects.bulk_create(created_images)
+            if changed_images:
+                CarImage.objects.bulk_update(changed_images, ['image', 'is_main'])
+            if deleted_images:
+                CarImage.objects.filter(car=car, pk__in=deleted_images).delete()
+            if wanted != existing or created_images or changed_images or deleted_images:
+                transaction.on_commit(partial(search_cache.invalidate_ids, [car.pk]))
+                transaction.on_commit(partial(compare.invalidate, car.pk))
+                transaction.on_commit(partial(enqueue_check, car.pk))
+            for name in replaced_files:
+                transaction.on_commit(partial(release, CarImage, 'image', name))
+            for name, upload in stored_files:
+                transaction.on_commit(partial(storage.ensure, name, upload))
+    except Exception:
+        # Файлы, на которые так и не сослалась ни одна строка
+        for name, _ in stored_files:
+            release(CarImage, 'image', name)
+        raise
+    return car
@@ -0,0 +1,145 @@
+# cars/signals.py
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from main.jobs import enqueue
+
+from . import compare, landing, ranking, search_cache, typeahead
+
+from .features import assign_free_bits, clear_feature, feature_bit, set_feature
+from .models import (
+    ArchivedCarImage, Car, CarBrand, CarFeature, CarFeatureRelation, CarImage, CarModel, CatalogRevision,
+    RankingParameters,
+)
+from .storage import release
+
+# Поля объявления, от которых зависят отпечатки для поиска дублей
+FINGERPRINT_FIELDS = {'description', 'vin', 'license_plate'}
+
+# Поля, которые не влияют на выдачу поиска
+UNSEARCHED_FIELDS = {'views_count'}
+
+
+def enqueue_check(car_id):
+    """Одна ждущая проверка на объявление, сколько бы сохранений ни было"""
+    enqueue('cars.check_listing', car_id, unique_key=f'cars.check_listing:{car_id}')
+
+
+@receiver(post_save, sender=Car)
+def check_car_duplicates(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not FINGERPRINT_FIELDS & set(update_fields):
+        return
+    transaction.on_commit(partial(enqueue_check, instance.pk))
+
+
+@receiver(post_save, sender=Car)
+@receiver(post_delete, sender=Car)
+def invalidate_search(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and set(update_fields) <= UNSEARCHED_FIELDS:
+        return
+    scopes = search_cache.listing_scopes(instance)
+    if scopes is not None:
+        transaction.on_commit(partial(search_cache.invalidate, *scopes))
+        transaction.on_commit(partial(landing.mark, *scopes))
+    transaction.on_commit(partial(compare.invalidate, instance.pk))
+
+
+@receiver(post_save, sender=CarImage)
+def check_cover_duplicates(sender, instance, **kwargs):
+    transaction.on_commit(partial(enqueue_check, instance.car_id))
+
+
+@receiver(post_save, sender=CarImage)
+@receiver(post_delete, sender=CarImage)
+@receiver(post_save, sender=CarFeatureRelation)
+@receiver(post_delete, sender=CarFeatureRelation)
+def invalidate_compare(sender, instance, **kwargs):
+    transaction.on_commit(partial(compare.invalidate, instance.car_id))
+
+
+@receiver(post_delete, sender=CarImage)
+def release_car_image(sender, instance, using, **kwargs):
+    transaction.on_commit(
+        partial(release, CarImage, 'image', instance.image.name), using=using
+    )
+
+
+@receiver(post_delete, sender=ArchivedCarImage)
+def release_archived_car_image(sender, instance, using, **kwargs):
+    transaction.on_commit(
+        partial(release, ArchivedCarImage, 'image', instance.image.name), using=using
+    )
+
+
+@receiver(post_delete, sender=CarBrand)
+def release_brand_logo(sender, instance, using, **kwargs):
+    transaction.on_commit(
+        partial(release, CarBrand, 'logo', instance.logo.name), using=using
+    )
+
+
+@receiver(post_save, sender=CarFeatureRelation)
+def add_feature_bit(sender, instance, created, **kwargs):
+    bit = feature_bit(instance.feature_id)
+    if created and bit is not None:
+        set_feature(instance.car_id, bit)
+    transaction.on_commit(partial(search_cache.invalidate_ids, [instance.car_id]))
+
+
+@receiver(post_delete, sender=CarFeatureRelation)
+def remove_feature_bit(sender, instance, **kwargs):
+    bit = feature_bit(instance.feature_id)
+    if bit is not None:
+        clear_feature(instance.car_id, bit)
+    transaction.on_commit(partial(search_cache.invalidate_ids, [instance.car_id]))
+
+
+@receiver(post_save, sender=CarFeature)
+def assign_new_feature_bit(sender, instance, created, **kwargs):
+    if created and instance.is_active and instance.bit is None:
+        assign_free_bits()
+
+
+@receiver(post_save, sender=CatalogRevision)
+def assign_catalog_feature_bits(sender, **kwargs):
+    # Синхронизация справочника создаёт опции без сигналов
+    assign_free_bits()
+
+
+@receiver(post_save, sender=CatalogRevision)
+@receiver(post_save, sender=CarBrand)
+@receiver(post_delete, sender=CarBrand)
+@receiver(post_save, sender=CarModel)
+@receiver(post_delete, sender=CarModel)
+def rebuild_typeahead(sender, **kwargs):
+    transaction.on_commit(typeahead.mark_stale)
+
+
+@receiver(post_save, sender=CarBrand)
+@receiver(post_delete, sender=CarBrand)
+def mark_brand_landing(sender, instance, **kwargs):
+    transaction.on_commit(partial(landing.mark, [instance.pk]))
+
+
+@receiver(post_save, sender=CarModel)
+@receiver(post_delete, sender=CarModel)
+def mark_model_landing(sender, instance, **kwargs):
+    # Страница марки перечисляет её модели
+    transaction.on_commit(partial(landing.mark, [instance.brand_id], [instance.pk]))
+
+
+@receiver(post_save, sender=CatalogRevision)
+def mark_all_landing(sender, **kwargs):
+    # Синхронизация справочника меняет марки и модели без сигналов
+    transaction.on_commit(landing.mark_all)
+
+
+@receiver(post_save, sender=RankingParameters)
+def recompute_ranking(sender, instance, update_fields=None, **kwargs):
+    transaction.on_commit(ranking.forget_parameters)
+    # Сдвиг точки отсчёта сохраняет параметры с update_fields и оценки переводит сам
+    if update_fields is None:
+        transaction.on_commit(partial(enqueue, 'cars.recompute_ranking'))
@@ -0,0 +1,148 @@
+# cars/sitemaps.py
+"""Карта сайта по активным объявлениям в виде статических файлов.
+
+Объявления разложены по частям по диапазонам id: часть N содержит id от
+N * SHARD_SIZE + 1 до (N + 1) * SHARD_SIZE, поэтому в ней не больше
+50 000 адресов — предел протокола — и объявление никогда не переезжает в
+другую часть. Файлы пишутся в SITEMAP_DIR сжатыми, индекс sitemap.xml
+ссылается на них, nginx отдаёт всё как статику.
+
+При пересборке одним GROUP BY по индексу (status, updated_at) считается
+сигнатура каждой части: число адресов, сумма id и последний updated_at.
+Перезаписываются только части, чья сигнатура изменилась. Снятие с
+публикации по сроку не трогает updated_at, поэтому такие части узнаются
+по числу и сумме id, а их lastmod — момент пересборки.
+"""
+import gzip
+import os
+from datetime import timezone as dt_timezone
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.db.models import Count, F, IntegerField, Max, Sum
+from django.db.models.functions import Cast
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import Car, SitemapShard
+
+SHARD_SIZE = 50000
+INDEX_NAME = 'sitemap.xml'
+
+_PK_PLACEHOLDER = 987654321
+
+
+def shard_name(number):
+    return f'sitemap-cars-{number:05d}.xml.gz'
+
+
+def _w3c(moment):
+    return moment.astimezone(dt_timezone.utc).strftime('%Y-%m-%dT%H:%M:%S+00:00')
+
+
+def _url_template():
+    # reverse() на каждую из 50 000 строк заметно дороже форматирования строки
+    path = reverse('cars:car_detail', kwargs={'pk': _PK_PLACEHOLDER})
+    return settings.SITE_URL.rstrip('/') + path.replace(str(_PK_PLACEHOLDER), '{pk}')
+
+
+def signatures():
+    """{номер части: (адресов, сумма id, последний updated_at)} по активным объявлениям"""
+    rows = (
+        Car.objects.filter(status='active')
+        .annotate(shard=Cast((F('pk') - 1) / SHARD_SIZE, IntegerField()))
+        .values('shard')
+        .annotate(urls=Count('pk'), pk_sum=Sum('pk'), max_updated_at=Max('updated_at'))
+        .order_by()
+    )
+    return {row['shard']: (row['urls'], row['pk_sum'], row['max_updated_at']) for row in rows}
+
+
+def _write(path, chunks, mtime):
+    """Атомарно заменить файл: nginx не должен отдать недописанный"""
+    tmp = path.with_name(f'.{path.name}.tmp')
+    opener = gzip.open if path.suffix == '.gz' else open
+    with opener(tmp, 'wt', encoding='utf-8') as f:
+        for chunk in chunks:
+            f.write(chunk)
+    os.replace(tmp, path)
+    # Last-Modified у nginx берётся из mtime файла
+    os.utime(path, (mtime.timestamp(), mtime.timestamp()))
+
+
+def write_shard(directory, number, lastmod):
+    template = _url_template()
+    rows = (
+        Car.objects.filter(status='active', pk__gt=number * SHARD_SIZE, pk__lte=(number + 1) * SHARD_SIZE)
+        .order_by('pk').values_list('pk', 'updated_at')
+    )
+
+    def chunks():
+        yield '<?xml version="1.0" encoding="UTF-8"?>\n'
+        yield '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+        for pk, updated_at in rows.iterator(chunk_size=5000):
+            yield (f'<url><loc>{escape(template.format(pk=pk))}</loc>'
+                   f'<lastmod>{_w3c(updated_at)}</lastmod></url>\n')
+        yield '</urlset>\n'
+
+    _write(directory / shard_name(number), chunks(), lastmod)
+
+
+def write_index(directory, shards):
+    base = settings.SITE_URL.rstrip('/') + settings.SITEMAP_URL
+
+    def chunks():
+        yield '<?xml version="1.0" encoding="UTF-8"?>\n'
+        yield '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+        for shard in shards:
+            yield (f'<sitemap><loc>{escape(base + shard_name(shard.number))}</loc>'
+                   f'<lastmod>{_w3c(shard.lastmod)}</lastmod></sitemap>\n')
+        yield '</sitemapindex>\n'
+
+    lastmod = max((shard.lastmod for shard in shards), default=timezone.now())
+    _write(directory / INDEX_NAME, chunks(), lastmod)
+
+
+def build(force=False):
+    """Перезаписать изменившиеся части и индекс; вернуть статистику"""
+    directory = Path(settings.SITEMAP_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    now = timezone.now()
+    current = signatures()
+    stored = {shard.number: shard for shard in SitemapShard.objects.all()}
+    written = []
+    for number, (urls, pk_sum, max_updated_at) in sorted(current.items()):
+        shard = stored.get(number)
+        signature = (urls, pk_sum, max_updated_at)
+        if not force and shard is not None and \
+                (shard.urls, shard.pk_sum, shard.max_updated_at) == signature and \
+                (directory / shard_name(number)).exists():
+            continue
+        if shard is None or shard.max_updated_at is None or max_updated_at > shard.max_updated_at:
+            lastmod = max_updated_at
+        else:
+            # Состав изменился без новых правок — объявление сняли или удалили
+            lastmod = now
+        shard = shard or SitemapShard(number=number)
+        shard.urls, shard.pk_sum, shard.max_updated_at = signature
+        shard.lastmod, shard.generated_at = lastmod, now
+        write_shard(directory, number, lastmod)
+        shard.save()
+        stored[number] = shard
+        written.append(number)
+
+    removed = sorted(set(stored) - set(current))
+    for number in removed:
+        (directory / shard_name(number)).unlink(missing_ok=True)
+        del stored[number]
+    SitemapShard.objects.filter(number__in=removed).delete()
+
+    if written or removed or force or not (directory / INDEX_NAME).exists():
+        write_index(directory, [stored[number] for number in sorted(stored)])
+    return {
+        'shards': len(stored),
+        'written': len(written),
+        'removed': len(removed),
+        'urls': sum(shard.urls for shard in stored.values()),
+    }
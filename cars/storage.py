@@ -0,0 +1,124 @@
+# cars/storage.py
+import fcntl
+import hashlib
+import logging
+import os
+import posixpath
+import re
+from contextlib import contextmanager, nullcontext
+from functools import partial
+
+from django.apps import apps
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+HASHED_NAME_RE = re.compile(r'(^|/)[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}(\.[\w]+)?$')
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранилище медиафайлов с именами по SHA-256 содержимого.
+
+    Файл ``car_images/photo.jpg`` сохраняется как
+    ``car_images/ab/cd/abcd...ef.jpg``: каталог из ``upload_to`` сохраняется,
+    а два уровня шардирования ограничивают число файлов в одной директории.
+    Повторная загрузка того же содержимого возвращает уже существующее имя.
+
+    Запись и удаление (``release``) идут под общей файловой блокировкой.
+    Строка со ссылкой на файл фиксируется позже записи, и удаление последней
+    старой ссылки на то же содержимое может успеть между ними. Поэтому после
+    фиксации ``ensure`` ещё раз проверяет файл под блокировкой и при
+    необходимости записывает его заново; ``save`` внутри транзакции делает
+    это сам, а код, который сохраняет файл до транзакции, вызывает ``ensure``
+    через ``on_commit`` своей транзакции.
+    """
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.hashed_name(name, self.digest(content))
+        with self.lock():
+            if not self.exists(name):
+                self._save(name, content)
+        if transaction.get_connection().in_atomic_block:
+            transaction.on_commit(partial(self.ensure, name, content))
+        return name
+
+    def ensure(self, name, content):
+        """Записать файл заново, если его удалили до фиксации ссылки на него"""
+        with self.lock():
+            if self.exists(name):
+                return
+            try:
+                content.seek(0)
+                self._save(name, content)
+            except (OSError, ValueError):
+                # Содержимое уже перенесено или закрыто
+                logger.exception('Файл %s удалён до фиксации ссылки и не восстановлен', name)
+
+    @contextmanager
+    def lock(self):
+        os.makedirs(self.location, exist_ok=True)
+        with open(os.path.join(self.location, '.storage.lock'), 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            yield
+
+    @staticmethod
+    def digest(content):
+        sha = hashlib.sha256()
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        for chunk in content.chunks():
+            sha.update(chunk)
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        return sha.hexdigest()
+
+    @staticmethod
+    def hashed_name(name, digest):
+        directory, filename = posixpath.split(name.replace('\\', '/'))
+        ext = posixpath.splitext(filename)[1].lower()
+        return posixpath.join(directory, digest[:2], digest[2:4], digest + ext)
+
+    @staticmethod
+    def is_hashed(name):
+        return bool(HASHED_NAME_RE.search(name))
+
+
+# Поля разных моделей, которые ссылаются на одни и те же файлы
+SHARED_FILE_FIELDS = [
+    ('cars.CarImage.image', 'cars.ArchivedCarImage.image'),
+]
+
+
+def _sharing(model, field_name):
+    label = f'{model._meta.label}.{field_name}'
+    for group in SHARED_FILE_FIELDS:
+        if label in group:
+            return [
+                (apps.get_model(path.rsplit('.', 1)[0]), path.rsplit('.', 1)[1])
+                for path in group
+            ]
+    return [(model, field_name)]
+
+
+def release(model, field_name, name):
+    """Удалить файл, если на него больше не ссылается ни одна строка модели.
+
+    Одинаковые загрузки делят один файл, поэтому удаление строки не должно
+    удалять файл, пока он нужен другим строкам. Проверка и удаление идут под
+    блокировкой хранилища, см. ``ContentAddressedStorage.ensure``.
+    """
+    if not name:
+        return False
+    storage = model._meta.get_field(field_name).storage
+    with storage.lock() if hasattr(storage, 'lock') else nullcontext():
+        for other, other_field in _sharing(model, field_name):
+            if other._default_manager.filter(**{other_field: name}).exists():
+                return False
+        storage.delete(name)
+    return True
@@ -0,0 +1,91 @@
+# cars/synthetic.py
+"""Синтетические объявления для бенчмарков и нагрузочных тестов.
+
+Строки вставляются пачками через bulk_create без сигналов, файлы фото не
+создаются — у CarImage только имена. Вызывать внутри транзакции, которую
+потом можно откатить, либо на отдельной базе.
+"""
+import random
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+
+from . import ranking
+from .features import mask_for
+from .models import Car, CarFeature, CarFeatureRelation, CarImage, CarModel, CarPriceHistory, Locality
+
+COLORS = ['Белый', 'Чёрный', 'Серый', 'Серебристый', 'Синий', 'Красный', 'Зелёный']
+WORDS = (
+    'один владелец обслуживание у дилера не бит не крашен полный комплект ключей '
+    'зимняя резина в подарок торг у капота сервисная книжка свежее масло новые тормоза'
+).split()
+
+
+def owner(username='synthetic'):
+    User = get_user_model()
+    user = User.objects.filter(username=username).first()
+    if user is None:
+        user = User.objects.create_user(username, f'{username}@example.com', None)
+    return user
+
+
+def generate_cars(count, user=None, seed=0, images=1, features=3, batch_size=1000):
+    """Создать ``count`` активных объявлений; вернуть их id"""
+    rng = random.Random(seed)
+    user = user or owner()
+    models = list(CarModel.objects.filter(is_active=True).values_list('pk', 'brand_id'))
+    localities = list(Locality.objects.values_list('pk', 'name'))
+    feature_ids = list(CarFeature.objects.filter(is_active=True).values_list('pk', flat=True))
+    bits = dict(CarFeature.objects.filter(is_active=True, bit__isnull=False).values_list('pk', 'bit'))
+    if not models:
+        raise ValueError('Справочник моделей пуст, сначала выполните sync_catalog')
+
+    ids = []
+    for start in range(0, count, batch_size):
+        cars, chosen = [], []
+        for _ in range(min(batch_size, count - start)):
+            car_features = rng.sample(feature_ids, min(features, len(feature_ids))) if features else []
+            chosen.append(car_features)
+            model_id, brand_id = rng.choice(models)
+            locality_id, location = rng.choice(localities) if localities else (None, 'Москва')
+            cars.append(Car(
+                owner=user,
+                brand_id=brand_id,
+                model_id=model_id,
+                year=rng.randint(1995, 2024),
+                body_type=rng.choice(Car.BODY_TYPE_CHOICES)[0],
+                fuel_type=rng.choice(Car.FUEL_TYPE_CHOICES)[0],
+                engine_volume=Decimal(rng.randint(10, 50)) / 10,
+                engine_power=rng.randint(70, 400),
+                transmission=rng.choice(Car.TRANSMISSION_CHOICES)[0],
+                drive_type=rng.choice(Car.DRIVE_TYPE_CHOICES)[0],
+                mileage=rng.randint(0, 300000),
+                condition=rng.choice(Car.CONDITION_CHOICES)[0],
+                price=Decimal(rng.randint(100, 10000) * 1000),
+                color=rng.choice(COLORS),
+                description=' '.join(rng.choices(WORDS, k=30)),
+                location=location,
+                locality_id=locality_id,
+                contact_phone='+7999' + ''.join(rng.choices('0123456789', k=7)),
+                # Связи вставляются без сигналов, маску опций считаем сразу
+                feature_mask=mask_for(bits[pk] for pk in car_features if pk in bits),
+                features_changed_at=timezone.now() if car_features else None,
+            ))
+        created = Car.objects.bulk_create(cars)
+        batch_ids = [car.pk for car in created]
+        CarImage.objects.bulk_create([
+            CarImage(car_id=pk, image=f'car_images/synthetic/{pk}-{n}.jpg', is_main=n == 0)
+            for pk in batch_ids for n in range(images)
+        ])
+        CarPriceHistory.objects.bulk_create([
+            CarPriceHistory(car_id=car.pk, price=car.price) for car in created
+        ])
+        CarFeatureRelation.objects.bulk_create([
+            CarFeatureRelation(car_id=pk, feature_id=feature_id)
+            for pk, car_features in zip(batch_ids, chosen)
+            for feature_id in car_features
+        ])
+        ids.extend(batch_ids)
+    ranking.recompute(ids)
+    return ids
@@ -0,0 +1,85 @@
+# cars/tasks.py
+"""Фоновые задачи приложения cars, см. main.jobs"""
+import logging
+from datetime import timedelta
+
+from django.utils import timezone
+
+from main.jobs import job
+
+from .archive import archive_listings
+from .duplicates import check_listing
+from .features import assign_bits
+from .landing import mark_all, render_dirty
+from .lifecycle import expire_listings
+from .models import ImageUpload
+from .ranking import rebase, recompute
+from .sitemaps import build as build_sitemaps
+from .typeahead import purge_visitors
+from .uploads import abort_upload
+
+logger = logging.getLogger(__name__)
+
+
+@job('cars.check_listing')
+def check_listing_job(car_id):
+    check_listing(car_id)
+
+
+@job('cars.purge_uploads', every=3600)
+def purge_uploads(older_than_hours=24):
+    cutoff = timezone.now() - timedelta(hours=older_than_hours)
+    for upload in ImageUpload.objects.filter(updated_at__lt=cutoff).iterator():
+        abort_upload(upload)
+
+
+@job('cars.purge_search_queries', every=24 * 3600)
+def purge_search_queries():
+    purge_visitors()
+
+
+@job('cars.rebuild_feature_bits', every=24 * 3600, max_attempts=2)
+def rebuild_feature_bits():
+    assign_bits()
+
+
+@job('cars.archive_listings', every=6 * 3600)
+def archive_listings_job():
+    archive_listings()
+
+
+@job('cars.expire_listings', every=3600)
+def expire_listings_job():
+    stats = expire_listings()
+    logger.info(
+        'Expired %(expired)d listing(s) in %(batches)d batch(es), %(per_second).0f/s, '
+        'lock max %(lock_max_ms).1fms median %(lock_median_ms).1fms', stats
+    )
+
+
+@job('cars.recompute_ranking', max_attempts=2)
+def recompute_ranking():
+    recompute()
+
+
+@job('cars.rebase_ranking', every=24 * 3600)
+def rebase_ranking():
+    rebase()
+
+
+@job('cars.build_sitemaps', every=3600)
+def build_sitemaps_job():
+    stats = build_sitemaps()
+    logger.info('Sitemaps: wrote %(written)d of %(shards)d shard(s), removed %(removed)d, %(urls)d URL(s)', stats)
+
+
+@job('cars.render_landing_pages', every=60)
+def render_landing_pages():
+    render_dirty()
+
+
+@job('cars.refresh_landing_pages', every=24 * 3600)
+def refresh_landing_pages():
+    # Порядок популярных объявлений меняется от просмотров, которые страницы не помечают
+    mark_all()
+    render_dirty()
@@ -1,3 +1,806 @@
-from django.test import TestCase
+# cars/tests.py
+"""Регрессия планов запросов, синхронизации справочника, подсказок и популярности.
 
-# Create your tests here.
+Канонические запросы выдачи, списков и админки прогоняются через
+EXPLAIN QUERY PLAN; тест падает, если какой-то из них читает большую
+таблицу целиком, а не по индексу. Полный просмотр маленьких справочников
+(марки, модели, опции, города) допустим.
+"""
+import hashlib
+import io
+import os
+import re
+import tempfile
+from datetime import timedelta
+
+from PIL import Image, ImageDraw
+
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.forms.models import model_to_dict
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from . import (
+    archive, catalog, compare, dashboard, duplicates, features, landing, lifecycle, ranking, search_cache, sitemaps,
+    tasks, typeahead, uploads,
+)
+from .forms import CarForm, CarImageFormSet, CarSearchForm
+from .models import (
+    ArchivedCar, Car, CarBrand, CarFeature, CarFeatureRelation, CarImage, CarModel, CarPriceHistory, CarView,
+    CatalogRevision,
+    DuplicateCandidate, ImageUpload, LandingPage, ListingStatusChange, Locality, RankingParameters, SearchQueryStat,
+)
+from .serializers import CarListValuesSerializer
+from .services import save_listing
+from .storage import ContentAddressedStorage
+from .synthetic import generate_cars
+
+SMALL_TABLES = {
+    'cars_carbrand', 'cars_carmodel', 'cars_carfeature', 'cars_locality', 'cars_sitemapshard',
+    'django_content_type', 'django_migrations',
+}
+
+_SCAN = re.compile(r'^SCAN (?:TABLE )?(\S+)(?: AS \S+)?(?: USING (COVERING )?INDEX \S+)?$')
+
+
+def explain(sql, params):
+    """Строки плана (id, parent, detail)"""
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+        return [(row[0], row[1], row[-1]) for row in cursor.fetchall()]
+
+
+def _rowid_order(sql, table):
+    """Запрос упорядочен только по первичному ключу таблицы — SCAN без индекса идёт по rowid"""
+    return re.search(rf'ORDER BY "{table}"\."id"(?: ASC| DESC)? LIMIT\b', sql) is not None
+
+
+def outer_loop(plan):
+    """id строки внешнего цикла: первая SCAN/SEARCH верхнего уровня"""
+    return next((id_ for id_, parent, detail in plan if parent == 0 and detail.startswith(('SCAN', 'SEARCH'))), None)
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    LANDING_DIR=tempfile.mkdtemp(), SITEMAP_DIR=tempfile.mkdtemp(),
+    STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage',
+)
+class PlanTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.user = User.objects.create_user('plans', 'plans@example.com', 'plans-password')
+        cls.admin = User.objects.create_superuser('plans-admin', 'plans-admin@example.com', 'plans-password')
+        cls.brand = CarBrand.objects.create(name='Plantest', code='plantest')
+        cls.model = CarModel.objects.create(brand=cls.brand, name='One', code='one')
+        cls.locality = Locality.objects.create(name='Планск', region='Тестовая', latitude=55.0, longitude=37.0)
+        cls.feature = CarFeature.objects.create(name='Люк', category='comfort', code='plan-sunroof')
+        cls.ids = generate_cars(5, user=cls.user, seed=49)
+        Car.objects.filter(pk__in=cls.ids).update(brand=cls.brand, model=cls.model)
+        CarView.objects.create(car_id=cls.ids[0], ip_address='10.0.0.1')
+
+    def setUp(self):
+        cache.clear()
+        # Индекс опций строится полным чтением связей, и не на каждом запросе
+        features._index.build()
+
+    def assertNoFullScan(self, sql, params=()):
+        rows = explain(sql, params)
+        plan = [detail for _, _, detail in rows]
+        # Обход внешней таблицы по индексу (или по rowid при ORDER BY id) в его порядке
+        # без сортировки, который обрывает LIMIT, — это страница, а не полный просмотр;
+        # SCAN остальных таблиц плана так не оправдать. COUNT(*) по покрывающему
+        # индексу дешевле не сделать
+        paged = re.search(r'\bLIMIT\b', sql, re.IGNORECASE) and not any('TEMP B-TREE' in d for d in plan)
+        outer = outer_loop(rows) if paged else None
+        counting = re.match(r'\s*SELECT COUNT\(\*\)', sql, re.IGNORECASE)
+        for id_, _, detail in rows:
+            match = _SCAN.match(detail)
+            if match is None or match.group(1) in SMALL_TABLES:
+                continue
+            if id_ == outer and (' USING ' in detail or _rowid_order(sql, match.group(1))):
+                continue
+            if counting and match.group(2):
+                continue
+            self.fail(f'Полный просмотр {match.group(1)}:\n{sql}\n' + '\n'.join(plan))
+        return plan
+
+    def assertQueriesUseIndexes(self, func):
+        with CaptureQueriesContext(connection) as queries:
+            result = func()
+        if hasattr(result, 'status_code'):
+            self.assertEqual(result.status_code, 200)
+        selects = [q['sql'] for q in queries.captured_queries if q['sql'].lstrip().upper().startswith('SELECT')]
+        self.assertTrue(selects, 'Не выполнено ни одного SELECT')
+        for sql in selects:
+            # Параметры уже подставлены в captured_queries — план от этого не меняется
+            self.assertNoFullScan(sql)
+
+
+class SearchPlanTests(PlanTestCase):
+    def searches(self):
+        return {
+            'all': {},
+            'brand': {'brand': self.brand.pk},
+            'model': {'brand': self.brand.pk, 'model': self.model.pk},
+            'full': {
+                'brand': self.brand.pk, 'model': self.model.pk, 'year_from': 2005, 'year_to': 2020,
+                'price_from': 100000, 'price_to': 5000000,
+            },
+            'year': {'year_from': 2010, 'year_to': 2015},
+            'price': {'price_from': 300000, 'price_to': 900000},
+            'body_type': {'body_type': 'sedan'},
+            'fuel_type': {'fuel_type': 'diesel'},
+            'transmission': {'transmission': 'automatic'},
+            'condition': {'condition': 'used'},
+            'locality': {'locality': self.locality.pk},
+            'radius': {'locality': self.locality.pk, 'radius': 50},
+            'features': {'features': [self.feature.pk]},
+            'price_dropped': {'price_dropped_days': 7},
+            'text': {'search': 'plantest'},
+        }
+
+    def test_search_queries_use_indexes(self):
+        for name, data in self.searches().items():
+            for ordering in search_cache.ORDERINGS:
+                with self.subTest(search=name, ordering=ordering):
+                    form = CarSearchForm(dict(data, ordering=ordering))
+                    self.assertTrue(form.is_valid(), form.errors)
+                    queryset = form.filter_queryset(search_cache.active_listings()) \
+                        .order_by(*search_cache.ordering(form.cleaned_data))
+                    self.assertNoFullScan(*queryset.values_list('pk', 'price')[:1001].query.sql_with_params())
+                    self.assertNoFullScan(*queryset.order_by().values('pk').query.sql_with_params())
+
+    def test_orderings_read_index_in_order(self):
+        for ordering in search_cache.ORDERINGS:
+            with self.subTest(ordering=ordering):
+                queryset = search_cache.active_listings().order_by(*search_cache.ORDERINGS[ordering])
+                plan = self.assertNoFullScan(*queryset.values_list('pk')[:20].query.sql_with_params())
+                self.assertFalse([d for d in plan if 'TEMP B-TREE' in d], '\n'.join(plan))
+
+    def test_search_api(self):
+        for name, data in self.searches().items():
+            with self.subTest(search=name):
+                self.assertQueriesUseIndexes(lambda: self.client.get('/api/v1/cars/', data))
+
+
+    def test_search_key_folds_ascii_only(self):
+        # icontains в SQLite не различает регистр только у латиницы
+        self.assertEqual(search_cache.canonical({'search': ' BMW  X5 '})[0], {'search': 'bmw x5'})
+        self.assertEqual(search_cache.canonical({'search': 'Лада'})[0], {'search': 'Лада'})
+        self.assertNotEqual(search_cache.canonical({'search': 'Лада'}), search_cache.canonical({'search': 'лада'}))
+
+
+class ListPlanTests(PlanTestCase):
+    def test_listing_cards(self):
+        self.assertQueriesUseIndexes(lambda: CarListValuesSerializer.for_ids(self.ids).data)
+
+    def test_listing_page(self):
+        self.assertQueriesUseIndexes(lambda: self.client.get('/cars/', {'brand': self.brand.pk}))
+
+    def test_dashboard(self):
+        self.client.force_login(self.user)
+        self.assertQueriesUseIndexes(lambda: self.client.get('/api/v1/dashboard/'))
+        self.assertQueriesUseIndexes(lambda: dashboard.listings(self.user, after=self.ids[-1]))
+
+    def test_compare(self):
+        self.assertQueriesUseIndexes(lambda: compare.build(self.ids[:3]))
+
+    def test_price_history(self):
+        self.assertQueriesUseIndexes(lambda: self.client.get(f'/api/v1/cars/{self.ids[0]}/prices/'))
+
+    def test_landing_pages(self):
+        self.assertQueriesUseIndexes(lambda: landing.context(self.brand))
+        self.assertQueriesUseIndexes(lambda: landing.context(self.brand, self.model))
+
+    def test_sitemaps(self):
+        self.assertQueriesUseIndexes(sitemaps.build)
+
+    def test_maintenance(self):
+        self.assertQueriesUseIndexes(lambda: list(lifecycle.stale(lifecycle.expiry_cutoff())[:200]))
+        self.assertQueriesUseIndexes(lambda: list(archive.archivable()[:500]))
+
+
+class NumberParamTests(PlanTestCase):
+    def test_compare_ids(self):
+        self.assertEqual(compare.parse_ids('3, 1,3'), [3, 1])
+        for value in ('١٢', '²', '9' * 19, '-1', '1e3'):
+            with self.subTest(value=value):
+                with self.assertRaises(compare.CompareError):
+                    compare.parse_ids(value)
+        self.assertEqual(self.client.get('/api/v1/compare/', {'ids': '9' * 30}).status_code, 400)
+
+    def test_page_params(self):
+        self.client.force_login(self.user)
+        for params in ({'after': '9' * 30}, {'after': '١'}, {'limit': '9' * 30}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get('/api/v1/dashboard/', params).status_code, 400)
+        for params in ({'page': '9' * 10}, {'page_size': '9' * 30}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get('/api/v1/cars/', params).status_code, 400)
+        self.assertEqual(self.client.get('/cars/', {'page': '9' * 30}).status_code, 200)
+
+
+class CarViewTests(PlanTestCase):
+    def test_views_are_throttled_per_visitor(self):
+        pk = self.ids[1]
+        for _ in range(3):
+            self.assertEqual(self.client.get(f'/cars/{pk}/', REMOTE_ADDR='10.0.0.7').status_code, 200)
+        self.client.get(f'/cars/{pk}/', REMOTE_ADDR='10.0.0.8')
+        self.assertEqual(CarView.objects.filter(car_id=pk).count(), 2)
+        self.assertEqual(Car.objects.get(pk=pk).views_count, 2)
+        self.client.force_login(self.user)
+        self.client.get(f'/cars/{pk}/', REMOTE_ADDR='10.0.0.9')
+        self.assertEqual(CarView.objects.filter(car_id=pk).count(), 2)
+        rows, _ = dashboard.listings(self.user, after=pk + 1, limit=1)
+        self.assertEqual(rows[0]['unique_visitors'], 2)
+
+    def test_detail_page(self):
+        self.assertQueriesUseIndexes(lambda: self.client.get(f'/cars/{self.ids[0]}/'))
+
+
+def png_bytes(color, size=8):
+    buffer = io.BytesIO()
+    Image.new('RGB', (size, size), color).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def png(color):
+    return SimpleUploadedFile(f'{color}.png', png_bytes(color), content_type='image/png')
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ListingSaveTests(PlanTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.extra_features = [
+            CarFeature.objects.create(name=f'Опция {i}', category='comfort', code=f'plan-extra-{i}')
+            for i in range(2)
+        ]
+
+    def listing(self, chosen, colors):
+        data = model_to_dict(Car.objects.get(pk=self.ids[0]), fields=CarForm.Meta.fields)
+        data = {key: value for key, value in data.items() if value is not None}
+        data['features'] = [feature.pk for feature in chosen]
+        form = CarForm(data)
+        prefix = CarImageFormSet.get_default_prefix()
+        formset = CarImageFormSet(
+            {f'{prefix}-TOTAL_FORMS': str(len(colors)), f'{prefix}-INITIAL_FORMS': '0'},
+            {f'{prefix}-{i}-image': png(color) for i, color in enumerate(colors)},
+        )
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertTrue(formset.is_valid(), formset.errors)
+        return form, formset
+
+    def save(self, chosen, colors):
+        form, formset = self.listing(chosen, colors)
+        with CaptureQueriesContext(connection) as queries:
+            car = save_listing(form, formset, owner=self.user)
+        self.assertEqual(car.images.count(), len(colors))
+        self.assertEqual(bin(car.feature_mask).count('1'), len(chosen))
+        return len(queries.captured_queries)
+
+    def test_statements_do_not_grow_with_features_and_images(self):
+        # Параметры ранжирования читаются один раз на процесс
+        ranking.parameters()
+        few = self.save([self.feature], ['red'])
+        many = self.save([self.feature, *self.extra_features], ['green', 'blue', 'white'])
+        self.assertEqual(few, many)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class StorageTests(PlanTestCase):
+    def setUp(self):
+        super().setUp()
+        self.storage = CarImage._meta.get_field('image').storage
+
+    def add(self, pk, color):
+        return CarImage.objects.create(car_id=pk, image=png(color))
+
+    def test_same_bytes_share_one_file(self):
+        first, second = self.add(self.ids[0], 'red'), self.add(self.ids[1], 'red')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertTrue(ContentAddressedStorage.is_hashed(first.image.name))
+        self.assertNotEqual(self.add(self.ids[1], 'green').image.name, first.image.name)
+        directory = os.path.dirname(self.storage.path(first.image.name))
+        self.assertEqual(os.listdir(directory), [os.path.basename(first.image.name)])
+
+    def test_file_lives_until_last_image_is_deleted(self):
+        first, second = self.add(self.ids[0], 'blue'), self.add(self.ids[1], 'blue')
+        name = first.image.name
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertTrue(self.storage.exists(name))
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(self.storage.exists(name))
+
+    def test_ensure_restores_file_released_before_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            image = self.add(self.ids[2], 'white')
+            # Параллельный release ещё не видит строку этой транзакции и удаляет файл
+            self.storage.delete(image.image.name)
+        self.assertTrue(self.storage.exists(image.image.name))
+        with self.storage.open(image.image.name, 'rb') as f:
+            self.assertEqual(f.read(), png_bytes('white'))
+
+
+class FeatureIndexTests(PlanTestCase):
+    def test_option_added_after_build_is_found(self):
+        feature = CarFeature.objects.get(pk=self.feature.pk)
+        CarFeatureRelation.objects.filter(feature=feature).delete()
+        features._index.build()
+        pk = self.ids[1]
+        updated_at = Car.objects.get(pk=pk).updated_at
+        CarFeatureRelation.objects.create(car_id=pk, feature=feature)
+        car = Car.objects.get(pk=pk)
+        # Срок публикации и lastmod карты сайта от опций не сдвигаются
+        self.assertEqual(car.updated_at, updated_at)
+        self.assertIsNotNone(car.features_changed_at)
+        found = features.filter_by_features(Car.objects.all(), [feature])
+        self.assertEqual(list(found.values_list('pk', flat=True)), [pk])
+
+
+class PriceDropTests(PlanTestCase):
+    def reprice(self, pk, delta):
+        car = Car.objects.get(pk=pk)
+        car.price += delta
+        car.save()
+        return Car.objects.get(pk=pk)
+
+    def test_drop_records_history_and_moment(self):
+        pk = self.ids[0]
+        before = CarPriceHistory.objects.filter(car_id=pk).count()
+        car = self.reprice(pk, -10000)
+        self.assertIsNotNone(car.last_price_drop_at)
+        self.assertEqual(CarPriceHistory.objects.filter(car_id=pk).count(), before + 1)
+        self.assertEqual(CarPriceHistory.objects.filter(car_id=pk).latest('changed_at').price, car.price)
+
+    def test_rise_keeps_drop_moment(self):
+        pk = self.ids[0]
+        dropped_at = timezone.now() - timedelta(days=3)
+        Car.objects.filter(pk=pk).update(last_price_drop_at=dropped_at)
+        before = CarPriceHistory.objects.filter(car_id=pk).count()
+        car = self.reprice(pk, 10000)
+        self.assertEqual(car.last_price_drop_at, dropped_at)
+        self.assertEqual(CarPriceHistory.objects.filter(car_id=pk).count(), before + 1)
+
+    def test_price_drop_ordering(self):
+        older, newer = self.ids[3], self.ids[1]
+        now = timezone.now()
+        Car.objects.filter(pk=older).update(last_price_drop_at=now - timedelta(days=2))
+        Car.objects.filter(pk=newer).update(last_price_drop_at=now - timedelta(hours=1))
+        form = CarSearchForm({'brand': self.brand.pk, 'ordering': 'price_drop'})
+        self.assertTrue(form.is_valid(), form.errors)
+        ids, total = search_cache.search(form)
+        self.assertEqual(total, len(self.ids))
+        self.assertEqual(ids[:2], [newer, older])
+        form = CarSearchForm({'brand': self.brand.pk, 'ordering': 'price_drop', 'price_dropped_days': 1})
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(search_cache.search(form), ([newer], 1))
+
+
+class LifecycleTests(PlanTestCase):
+    def age(self, pk, days, **fields):
+        Car.objects.filter(pk=pk).update(updated_at=timezone.now() - timedelta(days=days), **fields)
+
+    def test_expire_only_stale_listings(self):
+        stale, fresh = self.ids[:2]
+        self.age(stale, 40)
+        self.age(fresh, 20)
+        stats = lifecycle.expire_listings(older_than_days=30, pause=0)
+        self.assertEqual(stats['expired'], 1)
+        self.assertEqual(Car.objects.get(pk=stale).status, 'inactive')
+        self.assertEqual(Car.objects.get(pk=fresh).status, 'active')
+        self.assertEqual(
+            list(ListingStatusChange.objects.values_list('car_id', 'old_status', 'new_status', 'reason')),
+            [(stale, 'active', 'inactive', 'expired')],
+        )
+        # updated_at не сдвигается: срок архивации идёт от последней правки
+        self.assertLess(Car.objects.get(pk=stale).updated_at, timezone.now() - timedelta(days=39))
+
+    def test_archive_only_old_closed_listings(self):
+        old_sold, fresh_sold, old_active = self.ids[:3]
+        self.age(old_sold, 100, status='sold')
+        self.age(fresh_sold, 10, status='sold')
+        self.age(old_active, 100)
+        self.assertEqual(archive.archive_listings(older_than_days=90), 1)
+        self.assertEqual(set(ArchivedCar.objects.values_list('pk', flat=True)), {old_sold})
+        self.assertEqual(
+            set(Car.objects.filter(pk__in=self.ids[:3]).values_list('pk', flat=True)), {fresh_sold, old_active}
+        )
+
+    def test_renew_refuses_other_users(self):
+        pk = self.ids[0]
+        self.age(pk, 40, status='inactive')
+        stranger = get_user_model().objects.create_user('stranger', 'stranger@example.com', 'stranger-password')
+        self.assertFalse(lifecycle.renew(pk, owner=stranger))
+        self.assertEqual(Car.objects.get(pk=pk).status, 'inactive')
+        self.client.force_login(stranger)
+        self.client.post(f'/cars/{pk}/renew/')
+        self.assertEqual(Car.objects.get(pk=pk).status, 'inactive')
+        self.assertTrue(lifecycle.renew(pk, owner=self.user))
+        car = Car.objects.get(pk=pk)
+        self.assertEqual(car.status, 'active')
+        self.assertGreater(car.updated_at, timezone.now() - timedelta(minutes=1))
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ArchiveTests(PlanTestCase):
+    def search(self):
+        form = CarSearchForm({'brand': self.brand.pk})
+        self.assertTrue(form.is_valid(), form.errors)
+        return search_cache.search(form)[0]
+
+    def test_restore_round_trip(self):
+        pk = self.ids[2]
+        CarFeatureRelation.objects.get_or_create(car_id=pk, feature=self.feature)
+        CarImage.objects.create(car_id=pk, image='car_images/restore.png', is_main=True)
+        Car.objects.filter(pk=pk).update(status='inactive', created_at=timezone.now() - timedelta(days=400))
+        car = Car.objects.get(pk=pk)
+        images = list(car.images.values_list('image', 'is_main', 'created_at'))
+        options = sorted(car.car_features.values_list('feature_id', flat=True))
+        self.assertEqual(archive.archive_batch([pk]), 1)
+        self.assertFalse(Car.objects.filter(pk=pk).exists())
+        self.assertFalse(lifecycle.renew(pk, self.user))
+        self.assertNotIn(pk, self.search())
+        LandingPage.objects.update(dirty=False)
+        key = search_cache.cache_key({'brand': self.brand.pk, 'model': self.model.pk})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            archive.restore(ArchivedCar.objects.get(pk=pk))
+        self.assertNotEqual(search_cache.cache_key({'brand': self.brand.pk, 'model': self.model.pk}), key)
+        restored = Car.objects.get(pk=pk)
+        self.assertEqual(restored.created_at, car.created_at)
+        self.assertEqual(restored.feature_mask, car.feature_mask)
+        self.assertEqual(sorted(restored.car_features.values_list('feature_id', flat=True)), options)
+        self.assertEqual(list(restored.images.values_list('image', 'is_main', 'created_at')), images)
+        self.assertFalse(ArchivedCar.objects.filter(pk=pk).exists())
+        self.assertTrue(LandingPage.objects.get(kind='model', object_id=self.model.pk).dirty)
+
+        self.assertNotIn(pk, self.search())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(lifecycle.renew(pk, self.user))
+        self.assertIn(pk, self.search())
+
+
+@override_settings(
+    MEDIA_ROOT=tempfile.mkdtemp(), CHUNKED_UPLOAD_DIR=tempfile.mkdtemp(), CHUNKED_UPLOAD_CHUNK_SIZE=32,
+)
+class ChunkedUploadTests(PlanTestCase):
+    def setUp(self):
+        super().setUp()
+        self.data = png_bytes('red')
+        self.car = Car.objects.get(pk=self.ids[4])
+        self.upload = uploads.start_upload(
+            self.car, self.user, 'red.png', len(self.data), hashlib.sha256(self.data).hexdigest()
+        )
+
+    def chunk(self, index):
+        return self.data[index * 32:(index + 1) * 32]
+
+    def send(self, upload, index):
+        data = self.chunk(index)
+        return uploads.append_chunk(upload, index, data, hashlib.sha256(data).hexdigest())
+
+    def send_all(self, upload):
+        while not upload.is_complete:
+            upload = self.send(upload, upload.next_chunk)
+        return upload
+
+    def test_resume_from_stored_offset(self):
+        self.send(self.upload, 0)
+        # Новый запрос знает только id загрузки
+        upload = ImageUpload.objects.get(pk=self.upload.pk)
+        self.assertEqual((upload.received, upload.next_chunk), (32, 1))
+        self.assertEqual(self.send(upload, 0).received, 32)
+        with self.assertRaises(uploads.ChunkOutOfOrder):
+            self.send(upload, 2)
+        upload = self.send_all(upload)
+        with open(uploads.upload_path(upload), 'rb') as f:
+            self.assertEqual(f.read(), self.data)
+
+    def test_bad_chunk_checksum_is_rejected(self):
+        with self.assertRaises(uploads.ChecksumMismatch):
+            uploads.append_chunk(self.upload, 0, self.chunk(0), hashlib.sha256(b'other').hexdigest())
+        self.assertEqual(ImageUpload.objects.get(pk=self.upload.pk).received, 0)
+        self.assertEqual(os.path.getsize(uploads.upload_path(self.upload)), 0)
+
+    def test_repeated_finish_returns_same_image(self):
+        upload = self.send_all(self.upload)
+        image = uploads.finish_upload(upload)
+        self.assertEqual(uploads.finish_upload(upload), image)
+        # Повтор из другого запроса: .part уже перенесён
+        self.assertEqual(uploads.finish_upload(ImageUpload.objects.get(pk=upload.pk)), image)
+        self.assertEqual(self.car.images.filter(image=image.image.name).count(), 1)
+        self.assertFalse(os.path.exists(uploads.upload_path(upload)))
+
+    def test_purge_removes_only_idle_uploads(self):
+        idle = uploads.start_upload(self.car, self.user, 'idle.png', len(self.data))
+        old = timezone.now() - timedelta(hours=25)
+        ImageUpload.objects.update(updated_at=old)
+        # Принятая часть продлевает загрузку
+        self.send(self.upload, 0)
+        tasks.purge_uploads()
+        self.assertEqual(list(ImageUpload.objects.values_list('pk', flat=True)), [self.upload.pk])
+        self.assertFalse(os.path.exists(uploads.upload_path(idle)))
+        self.assertTrue(os.path.exists(uploads.upload_path(self.upload)))
+
+
+DESCRIPTION = (
+    'Продаю надёжный семейный автомобиль в отличном состоянии, один владелец, полная история '
+    'обслуживания у официального дилера, зимняя резина в подарок, все ключи и документы на месте, '
+    'без вложений, торг у капота'
+)
+
+
+def gradient(flip=False, mark=False):
+    """PNG с горизонтальным градиентом; mark — маленькая метка в углу"""
+    image = Image.linear_gradient('L').rotate(90)
+    if flip:
+        image = image.transpose(Image.Transpose.FLIP_LEFT_RIGHT)
+    if mark:
+        ImageDraw.Draw(image).rectangle((0, 0, 12, 12), fill=0)
+    buffer = io.BytesIO()
+    image.save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class DuplicateTests(PlanTestCase):
+    def setUp(self):
+        super().setUp()
+        self.original, self.copy, self.other = self.ids[:3]
+        self.listing(self.original, DESCRIPTION, gradient())
+        self.listing(self.copy, DESCRIPTION.replace('капота', 'машины'), gradient(mark=True))
+        self.listing(
+            self.other,
+            'Срочно отдам кроссовер после аварии на запчасти, двигатель не заводится, кузов гнилой',
+            gradient(flip=True),
+        )
+
+    def listing(self, pk, description, cover):
+        CarImage.objects.filter(car_id=pk).delete()
+        Car.objects.filter(pk=pk).update(
+            description=description, vin='', vin_normalized='', license_plate='', plate_normalized='',
+        )
+        CarImage.objects.create(car_id=pk, image=SimpleUploadedFile('cover.png', cover), is_main=True)
+
+    def pairs(self):
+        return set(DuplicateCandidate.objects.values_list('car_id', 'duplicate_of_id', 'reason'))
+
+    def test_minhash_and_dhash_distance(self):
+        cars = {car.pk: car for car in Car.objects.filter(pk__in=self.ids[:3])}
+        signatures = {pk: duplicates.minhash(car.description) for pk, car in cars.items()}
+        self.assertGreaterEqual(
+            duplicates.similarity(signatures[self.original], signatures[self.copy]), duplicates.TEXT_THRESHOLD
+        )
+        self.assertLess(
+            duplicates.similarity(signatures[self.original], signatures[self.other]), duplicates.TEXT_THRESHOLD
+        )
+        hashes = {}
+        for pk, car in cars.items():
+            with car.get_main_image().image.open('rb') as f:
+                hashes[pk] = duplicates.image_dhash(f)
+        self.assertLessEqual(duplicates.hamming(hashes[self.original], hashes[self.copy]), duplicates.IMAGE_MAX_DISTANCE)
+        self.assertGreater(duplicates.hamming(hashes[self.original], hashes[self.other]), duplicates.IMAGE_MAX_DISTANCE)
+
+    def test_check_listing_finds_near_duplicate(self):
+        duplicates.check_listing(self.original)
+        duplicates.check_listing(self.other)
+        found = {(pk, reason) for pk, reason, _ in duplicates.check_listing(self.copy)}
+        self.assertEqual(found, {(self.original, 'text'), (self.original, 'image')})
+
+    def test_command_pairs_in_batches(self):
+        call_command('detect_duplicates', batch_size=2, stdout=io.StringIO())
+        self.assertEqual(self.pairs(), {(self.copy, self.original, 'text'), (self.copy, self.original, 'image')})
+
+
+class AdminPlanTests(PlanTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        # Больше одной страницы, иначе список в админке читается без LIMIT
+        generate_cars(admin.ModelAdmin.list_per_page, user=cls.user, seed=50)
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.admin)
+
+    def test_car_changelist(self):
+        for params in ({}, {'status__exact': 'active'}, {'status__exact': 'sold'}, {'brand__id__exact': self.brand.pk}):
+            with self.subTest(params=params):
+                self.assertQueriesUseIndexes(lambda: self.client.get('/admin/cars/car/', params))
+
+    def test_car_change_form(self):
+        self.assertQueriesUseIndexes(lambda: self.client.get(f'/admin/cars/car/{self.ids[0]}/change/'))
+
+    def test_image_changelist(self):
+        self.assertQueriesUseIndexes(lambda: self.client.get('/admin/cars/carimage/'))
+
+
+class CatalogSyncTests(TestCase):
+    def sync(self, brands=(), features=()):
+        return catalog.sync_catalog({'version': 'test', 'brands': list(brands), 'features': list(features)})
+
+    def feature(self, code, name, category='Комфорт'):
+        return {'code': code, 'name': name, 'category': category}
+
+    def test_repeated_sync_writes_nothing(self):
+        brands = [{'code': 'lada', 'name': 'Lada', 'models': [{'code': 'vesta', 'name': 'Vesta'}]}]
+        self.sync(brands, [self.feature('abs', 'ABS')])
+        revisions = CatalogRevision.objects.count()
+        self.assertFalse(any(self.sync(brands, [self.feature('abs', 'ABS')]).values()))
+        self.assertEqual(CatalogRevision.objects.count(), revisions)
+
+    def test_code_change_keeps_name(self):
+        self.sync(features=[self.feature('abs', 'ABS')])
+        feature = CarFeature.objects.get(code='abs')
+        stats = self.sync(features=[self.feature('abs-system', 'ABS')])
+        feature.refresh_from_db()
+        self.assertEqual((feature.code, feature.name, feature.is_active), ('abs-system', 'ABS', True))
+        self.assertEqual(stats['features_adopted'], 1)
+        self.assertEqual(stats['features_created'], 0)
+
+    def test_swap_model_names(self):
+        self.sync([{'code': 'lada', 'name': 'Lada', 'models': [
+            {'code': 'vesta', 'name': 'Vesta'}, {'code': 'granta', 'name': 'Granta'},
+        ]}])
+        self.sync([{'code': 'lada', 'name': 'Lada', 'models': [
+            {'code': 'vesta', 'name': 'Granta'}, {'code': 'granta', 'name': 'Vesta'},
+        ]}])
+        self.assertEqual(
+            dict(CarModel.objects.filter(brand__code='lada').values_list('code', 'name')),
+            {'vesta': 'Granta', 'granta': 'Vesta'},
+        )
+
+    def test_swap_feature_codes(self):
+        self.sync(features=[self.feature('abs', 'ABS'), self.feature('esp', 'ESP')])
+        abs_id = CarFeature.objects.get(code='abs').pk
+        self.sync(features=[self.feature('esp', 'ABS'), self.feature('abs', 'ESP')])
+        self.assertEqual(CarFeature.objects.get(pk=abs_id).name, 'ESP')
+
+    def test_readded_entry_with_new_code(self):
+        self.sync(features=[self.feature('abs', 'ABS'), self.feature('esp', 'ESP')])
+        self.sync(features=[self.feature('esp', 'ESP')])
+        old = CarFeature.objects.get(name='ABS')
+        self.assertFalse(old.is_active)
+        self.sync(features=[self.feature('esp', 'ESP'), self.feature('abs-2', 'ABS')])
+        old.refresh_from_db()
+        self.assertEqual((old.code, old.is_active), ('abs-2', True))
+
+    def test_readded_model_with_new_code(self):
+        brand = {'code': 'lada', 'name': 'Lada'}
+        self.sync([dict(brand, models=[{'code': 'vesta', 'name': 'Vesta'}, {'code': 'niva', 'name': 'Niva'}])])
+        self.sync([dict(brand, models=[{'code': 'vesta', 'name': 'Vesta'}])])
+        self.sync([dict(brand, models=[{'code': 'vesta', 'name': 'Vesta'}, {'code': 'niva-legend', 'name': 'Niva'}])])
+        model = CarModel.objects.get(brand__code='lada', name='Niva')
+        self.assertEqual((model.code, model.is_active), ('niva-legend', True))
+
+    def test_rows_without_code_are_adopted_by_name(self):
+        brand = CarBrand.objects.create(name='Moskvich')
+        stats = self.sync([{'code': 'moskvich', 'name': 'Moskvich', 'models': []}])
+        brand.refresh_from_db()
+        self.assertEqual(brand.code, 'moskvich')
+        self.assertEqual(stats['brands_adopted'], 1)
+
+
+class QueryLogTests(TestCase):
+    def setUp(self):
+        brand = CarBrand.objects.create(name='Lada', code='lada')
+        CarModel.objects.create(brand=brand, name='Vesta', code='vesta')
+        self.log = typeahead.QueryLog()
+
+    def record(self, query, visitors):
+        for visitor in visitors:
+            self.log.record(query, visitor)
+        self.log.flush()
+
+    def suggestions(self, prefix):
+        index = typeahead.Typeahead()
+        return [row['label'] for row in index.suggest(prefix)]
+
+    def test_repeats_from_one_visitor_count_once(self):
+        self.record('Lada Vesta SW', ['a'] * 10)
+        self.record('lada vesta sw', ['a'])
+        self.assertEqual(SearchQueryStat.objects.get(query='lada vesta sw').count, 1)
+        self.assertNotIn('lada vesta sw', self.suggestions('lada vesta'))
+
+    def test_distinct_visitors_make_suggestion(self):
+        self.record('vesta lada', ['a', 'b', 'c'])
+        self.assertEqual(SearchQueryStat.objects.get(query='vesta lada').count, 3)
+        self.assertIn('vesta lada', self.suggestions('vesta'))
+
+    def test_text_outside_vocabulary_is_not_suggested(self):
+        self.record('lada 89001234567', ['a', 'b', 'c'])
+        self.assertNotIn('lada 89001234567', self.suggestions('lada'))
+
+    def test_purge_forgets_old_visitors(self):
+        self.record('lada', ['a', 'b'])
+        typeahead.SearchQueryVisitor.objects.filter(visitor='a').update(seen_at=timezone.now() - timedelta(days=60))
+        self.record('vesta', ['c'])
+        typeahead.SearchQueryVisitor.objects.filter(visitor='c').update(seen_at=timezone.now() - timedelta(days=60))
+        self.assertEqual(typeahead.purge_visitors(), 2)
+        self.assertEqual(SearchQueryStat.objects.get(query='lada').count, 1)
+        self.assertFalse(SearchQueryStat.objects.filter(query='vesta').exists())
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class RankingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        user = get_user_model().objects.create_user('ranking', 'ranking@example.com', 'ranking-password')
+        brand = CarBrand.objects.create(name='Ranktest', code='ranktest')
+        CarModel.objects.create(brand=brand, name='One', code='one')
+        self.ids = generate_cars(7, user=user, seed=40)
+        self.params = ranking.parameters()
+
+    def scores(self):
+        return dict(Car.objects.filter(pk__in=self.ids).values_list('pk', 'rank_score'))
+
+    def shift_epoch_back(self, half_lives):
+        RankingParameters.objects.filter(pk=1).update(
+            epoch=self.params.epoch - timedelta(hours=self.params.half_life_hours * half_lives)
+        )
+        # Строки посчитаны от прежней точки, как будто их давно не переводили
+        Car.objects.filter(pk__in=self.ids).update(rank_epoch=None)
+        ranking.forget_parameters()
+
+    def test_rebase_in_batches(self):
+        before = self.scores()
+        self.shift_epoch_back(3)
+        self.assertEqual(ranking.rebase(force=True, batch_size=2), 3)
+        after = self.scores()
+        for pk in self.ids:
+            self.assertAlmostEqual(before[pk] / after[pk], 8)
+        params = RankingParameters.objects.get(pk=1)
+        self.assertIsNone(params.rebase_epoch)
+        self.assertEqual(set(Car.objects.filter(pk__in=self.ids).values_list('rank_epoch', flat=True)), {params.epoch})
+
+    def test_view_during_rebase_uses_row_scale(self):
+        self.shift_epoch_back(3)
+        params = RankingParameters.objects.get(pk=1)
+        params.rebase_epoch = params.epoch + timedelta(hours=params.half_life_hours * 3)
+        params.save(update_fields=['rebase_epoch', 'updated_at'])
+        ranking.forget_parameters()
+        ranking._rescale(params, 0, self.ids[0])
+        before = self.scores()
+        for pk in (self.ids[0], self.ids[1]):
+            Car.objects.get(pk=pk).increment_views()
+        after = self.scores()
+        moved = after[self.ids[0]] - before[self.ids[0]]
+        behind = after[self.ids[1]] - before[self.ids[1]]
+        self.assertAlmostEqual(behind / moved, 8, places=3)
+        ranking.rebase()
+        self.assertIsNone(RankingParameters.objects.get(pk=1).rebase_epoch)
+
+    def test_only_owner_edit_adds_weight(self):
+        car = Car.objects.get(pk=self.ids[0])
+        score = car.rank_score
+        car.color = 'Синий'
+        car.save()
+        self.assertEqual(Car.objects.get(pk=car.pk).rank_score, score)
+        car.save(owner_edit=True)
+        self.assertGreater(Car.objects.get(pk=car.pk).rank_score, score)
+
+
+class FullScanCheckTests(PlanTestCase):
+    def test_page_exemption_covers_only_outer_table(self):
+        self.assertNoFullScan('SELECT "id" FROM "cars_car" ORDER BY "cars_car"."id" DESC LIMIT 20')
+        self.assertNoFullScan('SELECT "id" FROM "cars_car" WHERE "status" = %s ORDER BY "rank_score" DESC LIMIT 20',
+                              ['active'])
+        # Внутренний полный просмотр под LIMIT — всё равно полный просмотр
+        with self.assertRaises(AssertionError):
+            self.assertNoFullScan(
+                'SELECT "id", (SELECT COUNT(*) FROM "cars_carview" V WHERE V."ip_address" = "cars_car"."location") '
+                'FROM "cars_car" ORDER BY "cars_car"."id" DESC LIMIT 20'
+            )
+        with self.assertRaises(AssertionError):
+            self.assertNoFullScan('SELECT "id" FROM "cars_car" ORDER BY "mileage" LIMIT 20')
@@ -0,0 +1,325 @@
+# cars/typeahead.py
+"""Подсказки для строки поиска по префиксу.
+
+Индекс — отсортированный массив ключей с параллельным массивом записей,
+поиск диапазона по префиксу делается двумя bisect. Ключи записи: её
+нормализованное название и транслитерация в другую раскладку алфавита
+(«toyota» и «тойота»), у моделей ещё и «марка модель». Для коротких
+префиксов, где диапазон большой, лучшие записи посчитаны заранее.
+
+Вес записи — число активных объявлений плюс частота запроса из
+SearchQueryStat. Частота — это число разных посетителей (пользователь или
+IP, в БД только солёный хэш), искавших запрос за QUERY_VISITOR_DAYS, так что
+один клиент, повторяя запрос, подсказку не создаст. Записываются только
+запросы, по которым что-то нашлось, а в подсказки попадают лишь те, все
+слова которых есть в названиях марок и моделей: произвольный текст вроде
+телефона или имени туда не выйдет. Пары (запрос, посетитель) копятся в
+памяти процесса и сбрасываются в БД не чаще раза в FLUSH_INTERVAL секунд.
+
+Индекс перестраивается в фоновом потоке, когда меняется справочник
+(версия в кэше) или истекает REBUILD_INTERVAL; до готовности нового
+ответы идут из старого.
+"""
+import hashlib
+import heapq
+import re
+import threading
+import time
+from bisect import bisect_left
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import OperationalError, connection, connections, transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from main.middleware import client_ip
+
+from .models import CarBrand, CarModel, SearchQueryStat, SearchQueryVisitor
+
+MAX_SUGGESTIONS = 10
+PRECOMPUTED_PREFIX = 3
+MIN_QUERY_COUNT = 3
+MAX_QUERIES = 5000
+REBUILD_INTERVAL = 600
+VERSION_CHECK_INTERVAL = 5
+FLUSH_INTERVAL = 30
+QUERY_VISITOR_DAYS = 30
+
+_VERSION_KEY = 'typeahead:version'
+_NON_WORD_RE = re.compile(r'[^\w]+')
+
+_CYRILLIC_TO_LATIN = {
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ж': 'zh',
+    'з': 'z', 'и': 'i', 'й': 'y', 'к': 'k', 'л': 'l', 'м': 'm', 'н': 'n',
+    'о': 'o', 'п': 'p', 'р': 'r', 'с': 's', 'т': 't', 'у': 'u', 'ф': 'f',
+    'х': 'kh', 'ц': 'ts', 'ч': 'ch', 'ш': 'sh', 'щ': 'sch', 'ъ': '', 'ы': 'y',
+    'ь': '', 'э': 'e', 'ю': 'yu', 'я': 'ya',
+}
+_LATIN_TO_CYRILLIC = [
+    ('sch', 'щ'), ('sh', 'ш'), ('ch', 'ч'), ('zh', 'ж'), ('kh', 'х'), ('ts', 'ц'),
+    ('yu', 'ю'), ('ya', 'я'), ('ph', 'ф'), ('a', 'а'), ('b', 'б'),
+    ('c', 'к'), ('d', 'д'), ('e', 'е'), ('f', 'ф'), ('g', 'г'), ('h', 'х'),
+    ('i', 'и'), ('j', 'дж'), ('k', 'к'), ('l', 'л'), ('m', 'м'), ('n', 'н'),
+    ('o', 'о'), ('p', 'п'), ('q', 'к'), ('r', 'р'), ('s', 'с'), ('t', 'т'),
+    ('u', 'у'), ('v', 'в'), ('w', 'в'), ('x', 'кс'), ('y', 'й'), ('z', 'з'),
+]
+_LATIN_RE = re.compile('|'.join(latin for latin, _ in _LATIN_TO_CYRILLIC))
+_LATIN_MAP = dict(_LATIN_TO_CYRILLIC)
+
+# Набор в неправильной раскладке: «ещнщеф» → «toyota»
+_LAYOUT = str.maketrans(
+    'йцукенгшщзхъфывапролджэячсмитьбю' 'qwertyuiop[]asdfghjkl;\'zxcvbnm,.',
+    'qwertyuiop[]asdfghjkl;\'zxcvbnm,.' 'йцукенгшщзхъфывапролджэячсмитьбю',
+)
+
+
+def normalize(text):
+    return ' '.join(_NON_WORD_RE.sub(' ', text.lower().replace('ё', 'е')).split())
+
+
+def transliterate(text):
+    """Перевести нормализованный текст в другой алфавит"""
+    if re.search('[а-я]', text):
+        return ''.join(_CYRILLIC_TO_LATIN.get(char, char) for char in text)
+    return _LATIN_RE.sub(lambda m: _LATIN_MAP[m.group()], text)
+
+
+def swap_layout(text):
+    return text.translate(_LAYOUT)
+
+
+class PrefixIndex:
+    """Отсортированные ключи и записи (вес, подпись, данные)"""
+
+    def __init__(self, entries):
+        pairs = []
+        for number, (keys, _, _, _) in enumerate(entries):
+            for key in keys:
+                pairs.append((key, number))
+        pairs.sort()
+        self.keys = [key for key, _ in pairs]
+        self.numbers = [number for _, number in pairs]
+        self.entries = entries
+        self.top = {}
+        for length in range(1, PRECOMPUTED_PREFIX + 1):
+            prefixes = {key[:length] for key in self.keys if len(key) >= length}
+            for prefix in prefixes:
+                self.top[prefix] = self._scan(prefix)
+
+    def _scan(self, prefix):
+        start = bisect_left(self.keys, prefix)
+        end = bisect_left(self.keys, prefix + '\uffff', start)
+        numbers = set(self.numbers[start:end])
+        best = heapq.nlargest(MAX_SUGGESTIONS, numbers, key=lambda n: (self.entries[n][1], -n))
+        return [self.entries[n] for n in best]
+
+    def lookup(self, prefix, limit=MAX_SUGGESTIONS):
+        found = self.top.get(prefix)
+        if found is None:
+            found = self._scan(prefix)
+        return found[:limit]
+
+
+def _entries():
+    brand_weight = dict(
+        CarBrand.objects.filter(is_active=True)
+        .annotate(n=Count('car', filter=Q(car__status='active')))
+        .values_list('pk', 'n')
+    )
+    model_weight = dict(
+        CarModel.objects.filter(is_active=True)
+        .annotate(n=Count('car', filter=Q(car__status='active')))
+        .values_list('pk', 'n')
+    )
+    entries = []
+    by_name = {}
+    brands = {}
+    vocabulary = set()
+    for pk, name in CarBrand.objects.filter(is_active=True).values_list('pk', 'name'):
+        key = normalize(name)
+        brands[pk] = (name, key)
+        by_name[key] = len(entries)
+        vocabulary.update(key.split(), transliterate(key).split())
+        entries.append([
+            {key, transliterate(key)}, brand_weight.get(pk, 0), name,
+            {'kind': 'brand', 'brand': pk},
+        ])
+    for pk, brand_id, name in CarModel.objects.filter(is_active=True, brand__is_active=True) \
+            .values_list('pk', 'brand_id', 'name'):
+        brand_name, brand_key = brands[brand_id]
+        key = normalize(name)
+        full = f'{brand_key} {key}'
+        by_name[full] = len(entries)
+        vocabulary.update(key.split(), transliterate(key).split())
+        entries.append([
+            {key, transliterate(key), full, transliterate(full)}, model_weight.get(pk, 0),
+            f'{brand_name} {name}', {'kind': 'model', 'brand': brand_id, 'model': pk},
+        ])
+    queries = (
+        SearchQueryStat.objects.filter(count__gte=MIN_QUERY_COUNT)
+        .order_by('-count').values_list('query', 'count')[:MAX_QUERIES]
+    )
+    for query, count in queries:
+        # Запрос, совпадающий с маркой или моделью, поднимает её вес
+        number = by_name.get(query)
+        if number is not None:
+            entries[number][1] += count
+        elif vocabulary.issuperset(query.split()):
+            entries.append([{query, transliterate(query)}, count, query, {'kind': 'query'}])
+    return entries
+
+
+class Typeahead:
+    def __init__(self):
+        self.index = None
+        self.version = None
+        self.built_at = 0.0
+        self.checked_at = 0.0
+        self.lock = threading.Lock()
+        self.building = False
+
+    def build(self):
+        version = cache.get(_VERSION_KEY)
+        index = PrefixIndex(_entries())
+        self.index, self.version, self.built_at = index, version, time.monotonic()
+
+    def _rebuild_in_background(self):
+        def run():
+            try:
+                self.build()
+            finally:
+                connections.close_all()
+                self.building = False
+        with self.lock:
+            if self.building:
+                return
+            self.building = True
+        threading.Thread(target=run, daemon=True).start()
+
+    def _refresh(self):
+        now = time.monotonic()
+        if self.index is None:
+            with self.lock:
+                if self.index is None:
+                    self.build()
+            return
+        if now - self.checked_at < VERSION_CHECK_INTERVAL:
+            return
+        self.checked_at = now
+        if cache.get(_VERSION_KEY) != self.version or now - self.built_at > REBUILD_INTERVAL:
+            self._rebuild_in_background()
+
+    def suggest(self, text, limit=MAX_SUGGESTIONS):
+        prefix = normalize(text)
+        if not prefix:
+            return []
+        self._refresh()
+        found = self.index.lookup(prefix, limit)
+        if not found:
+            swapped = normalize(swap_layout(text))
+            if swapped != prefix:
+                found = self.index.lookup(swapped, limit)
+        return [dict(data, label=label) for _, _, label, data in found]
+
+
+_typeahead = Typeahead()
+suggest = _typeahead.suggest
+
+
+def mark_stale():
+    """Справочник изменился — индексы всех процессов перестроятся"""
+    cache.set(_VERSION_KEY, time.time_ns(), None)
+
+
+def visitor_key(request):
+    """Солёный хэш пользователя или IP, чтобы не хранить адреса в таблице запросов"""
+    if request.user.is_authenticated:
+        visitor = f'user:{request.user.pk}'
+    else:
+        visitor = f'ip:{client_ip(request)}'
+    return hashlib.sha256(f'{settings.SECRET_KEY}:{visitor}'.encode()).hexdigest()
+
+
+class QueryLog:
+    """Пары (запрос, посетитель) процесса, сбрасываемые в SearchQueryVisitor пачкой"""
+
+    def __init__(self):
+        self.seen = set()
+        self.flushed_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def record(self, text, visitor):
+        query = normalize(text)[:100]
+        if not query:
+            return
+        with self.lock:
+            self.seen.add((query, visitor))
+            due = time.monotonic() - self.flushed_at >= FLUSH_INTERVAL
+        if due:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            seen, self.seen = self.seen, set()
+            self.flushed_at = time.monotonic()
+        if not seen:
+            return 0
+        qn = connection.ops.quote_name
+        now = connection.ops.adapt_datetimefield_value(timezone.now())
+        visitors = (
+            'INSERT INTO {table} ({query}, {visitor}, {seen_at}) VALUES (%s, %s, %s) '
+            'ON CONFLICT ({query}, {visitor}) DO UPDATE SET {seen_at} = excluded.{seen_at}'
+        ).format(
+            table=qn(SearchQueryVisitor._meta.db_table),
+            query=qn('query'), visitor=qn('visitor'), seen_at=qn('seen_at'),
+        )
+        queries = sorted({query for query, _ in seen})
+        try:
+            with transaction.atomic():
+                with connection.cursor() as cursor:
+                    cursor.executemany(visitors, [(query, visitor, now) for query, visitor in seen])
+                _recount(queries)
+        except OperationalError:
+            # База занята — вернём пары и попробуем при следующем сбросе
+            with self.lock:
+                self.seen.update(seen)
+            return 0
+        return len(queries)
+
+
+def _recount(queries):
+    """Пересчитать SearchQueryStat.count как число разных посетителей запроса"""
+    qn = connection.ops.quote_name
+    sql = (
+        'INSERT INTO {stat} ({query}, {count}, {last_seen}) '
+        'SELECT {query}, COUNT(*), MAX({seen_at}) FROM {visitors} WHERE {query} IN ({marks}) GROUP BY {query} '
+        'ON CONFLICT ({query}) DO UPDATE SET {count} = excluded.{count}, {last_seen} = excluded.{last_seen}'
+    ).format(
+        stat=qn(SearchQueryStat._meta.db_table), visitors=qn(SearchQueryVisitor._meta.db_table),
+        query=qn('query'), count=qn('count'), last_seen=qn('last_seen'), seen_at=qn('seen_at'), marks=', '.join(['%s'] * len(queries)),
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, queries)
+
+
+def purge_visitors(days=QUERY_VISITOR_DAYS):
+    """Забыть посетителей старше ``days`` дней и пересчитать частоты"""
+    cutoff = timezone.now() - timedelta(days=days)
+    with transaction.atomic():
+        queries = sorted(set(
+            SearchQueryVisitor.objects.filter(seen_at__lt=cutoff).values_list('query', flat=True)
+        ))
+        if not queries:
+            return 0
+        SearchQueryVisitor.objects.filter(seen_at__lt=cutoff).delete()
+        SearchQueryStat.objects.filter(query__in=queries).exclude(
+            query__in=SearchQueryVisitor.objects.values('query')
+        ).delete()
+        for start in range(0, len(queries), 500):
+            _recount(queries[start:start + 500])
+    return len(queries)
+
+
+query_log = QueryLog()
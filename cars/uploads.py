@@ -0,0 +1,186 @@
+# cars/uploads.py
+"""Загрузка фото автомобиля по частям с возобновлением.
+
+Части пишутся сразу в конец временного файла, в БД хранится только число
+принятых байт. Строка ``CarImage`` создаётся при завершении загрузки и
+запоминается в загрузке, поэтому повторное завершение возвращает её же.
+Загрузки удаляет purge_uploads.
+"""
+import hashlib
+import os
+from functools import partial
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image
+
+from .models import CarImage, ImageUpload
+from .storage import release
+
+MAX_IMAGES_PER_CAR = 10
+
+# Форматы, которые Pillow распознал в содержимом, и расширения для них
+IMAGE_FORMATS = {'JPEG': '.jpg', 'PNG': '.png', 'WEBP': '.webp'}
+
+
+class ChunkedUploadError(Exception):
+    """Ошибка загрузки по частям"""
+
+
+class ChunkOutOfOrder(ChunkedUploadError):
+    """Пришла часть не с ожидаемым номером"""
+
+
+class ChecksumMismatch(ChunkedUploadError):
+    """Контрольная сумма части или файла не совпала"""
+
+
+class _PartialFile(File):
+    """Собранный файл: FileSystemStorage перенесёт его переименованием, без копирования"""
+
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def upload_path(upload):
+    return os.path.join(settings.CHUNKED_UPLOAD_DIR, f'{upload.pk}.part')
+
+
+def start_upload(car, owner, filename, size, sha256='', is_main=False):
+    if size > settings.CHUNKED_UPLOAD_MAX_SIZE:
+        raise ChunkedUploadError('Файл слишком большой.')
+    if car.images.count() >= MAX_IMAGES_PER_CAR:
+        raise ChunkedUploadError('Достигнуто максимальное число фото.')
+    upload = ImageUpload.objects.create(
+        car=car,
+        owner=owner,
+        filename=os.path.basename(filename),
+        size=size,
+        chunk_size=settings.CHUNKED_UPLOAD_CHUNK_SIZE,
+        sha256=sha256.lower(),
+        is_main=is_main,
+    )
+    os.makedirs(settings.CHUNKED_UPLOAD_DIR, exist_ok=True)
+    open(upload_path(upload), 'wb').close()
+    return upload
+
+
+def append_chunk(upload, index, data, checksum):
+    """Дописать часть ``index``. Повторная отправка уже принятой части игнорируется."""
+    if index < upload.next_chunk or upload.is_complete:
+        return upload
+    if index > upload.next_chunk:
+        raise ChunkOutOfOrder(f'Ожидается часть {upload.next_chunk}.')
+    expected_length = min(upload.chunk_size, upload.size - upload.received)
+    if len(data) != expected_length:
+        raise ChunkedUploadError(f'Ожидается {expected_length} байт.')
+    if hashlib.sha256(data).hexdigest() != checksum.lower():
+        raise ChecksumMismatch('Контрольная сумма части не совпадает.')
+
+    offset = upload.received
+    with open(upload_path(upload), 'r+b') as f:
+        # Хвост от записи, которая не успела отметиться в БД, перезаписывается
+        f.truncate(offset)
+        f.seek(offset)
+        f.write(data)
+
+    received = offset + len(data)
+    # update() не трогает auto_now, а по updated_at purge_uploads отличает брошенные загрузки
+    updated = ImageUpload.objects.filter(pk=upload.pk, received=offset).update(
+        received=received, updated_at=timezone.now()
+    )
+    if not updated:
+        raise ChunkOutOfOrder('Часть уже принята параллельным запросом.')
+    upload.received = received
+    return upload
+
+
+def _image_extension(f):
+    """Проверить, что файл — изображение разрешённого формата, и вернуть расширение.
+
+    Расширение из имени файла клиента не используется: по нему nginx выбирает
+    Content-Type, и ``x.html`` отдавался бы из /media/ как страница.
+    """
+    try:
+        with Image.open(f) as image:
+            image_format = image.format
+            image.verify()
+    except Exception:
+        raise ChunkedUploadError('Файл не является изображением.')
+    finally:
+        f.seek(0)
+    if image_format not in IMAGE_FORMATS:
+        raise ChunkedUploadError('Допустимы только JPEG, PNG и WebP.')
+    return IMAGE_FORMATS[image_format]
+
+
+class _AlreadyFinished(Exception):
+    pass
+
+
+def _finished_image(upload):
+    """Фото, созданное параллельным завершением той же загрузки"""
+    upload = ImageUpload.objects.select_related('image').filter(pk=upload.pk).first()
+    if upload is None or upload.image is None:
+        raise ChunkedUploadError('Загрузка прервана, начните её заново.')
+    return upload.image
+
+
+def finish_upload(upload):
+    """Собрать файл в хранилище и создать CarImage.
+
+    Повторное завершение той же загрузки возвращает уже созданное фото.
+    """
+    if upload.image_id:
+        return upload.image
+    if not upload.is_complete:
+        raise ChunkOutOfOrder(f'Ожидается часть {upload.next_chunk}.')
+    path = upload_path(upload)
+    field = CarImage._meta.get_field('image')
+    try:
+        f = open(path, 'rb')
+    except FileNotFoundError:
+        # Файл уже перенёс параллельный запрос завершения
+        return _finished_image(upload)
+    with f:
+        content = _PartialFile(f, name=upload.filename)
+        if upload.sha256 and field.storage.digest(content) != upload.sha256:
+            raise ChecksumMismatch('Контрольная сумма файла не совпадает.')
+        extension = _image_extension(f)
+        # Все проверки до переноса: после него .part уже нет и повторить завершение нельзя
+        if upload.car.images.count() >= MAX_IMAGES_PER_CAR:
+            raise ChunkedUploadError('Достигнуто максимальное число фото.')
+        # Файл переносится до транзакции, чтобы не держать блокировку записи на I/O
+        name = field.storage.save(
+            field.generate_filename(None, f'{upload.pk}{extension}'), content
+        )
+        try:
+            with transaction.atomic():
+                if upload.car.images.count() >= MAX_IMAGES_PER_CAR:
+                    raise ChunkedUploadError('Достигнуто максимальное число фото.')
+                image = CarImage.objects.create(car=upload.car, image=name, is_main=upload.is_main)
+                if not ImageUpload.objects.filter(pk=upload.pk, image__isnull=True).update(
+                    image=image, updated_at=timezone.now()
+                ):
+                    raise _AlreadyFinished
+                transaction.on_commit(partial(field.storage.ensure, name, content))
+        except _AlreadyFinished:
+            return _finished_image(upload)
+        except ChunkedUploadError:
+            # Лимит занял параллельный запрос, а файл уже перенесён: загрузку не возобновить
+            abort_upload(upload)
+            release(CarImage, 'image', name)
+            raise
+    if os.path.exists(path):
+        os.remove(path)
+    upload.image = image
+    return image
+
+
+def abort_upload(upload):
+    path = upload_path(upload)
+    upload.delete()
+    if os.path.exists(path):
+        os.remove(path)
@@ -0,0 +1,26 @@
+# cars/urls.py
+from django.urls import path
+from . import api, views
+
+app_name = 'cars'
+
+urlpatterns = [
+    path('cars/', views.car_list_view, name='car_list'),
+    path('cars/add/', views.car_create_view, name='car_create'),
+    path('cars/compare/', views.car_compare_view, name='car_compare'),
+    path('cars/<int:pk>/', views.car_detail_view, name='car_detail'),
+    path('cars/<int:pk>/edit/', views.car_edit_view, name='car_edit'),
+    path('cars/<int:pk>/renew/', views.car_renew_view, name='car_renew'),
+    path('cars/<int:pk>/restore/', views.car_restore_view, name='car_restore'),
+    path('catalog/<slug:brand>/', views.landing_brand_view, name='landing_brand'),
+    path('catalog/<slug:brand>/<slug:model>/', views.landing_model_view, name='landing_model'),
+    path('api/v1/cars/', api.CarSearchView.as_view(), name='api_car_search'),
+    path('api/v1/cars/<int:pk>/prices/', api.CarPriceHistoryView.as_view(), name='api_car_prices'),
+    path('api/v1/dashboard/', api.DashboardView.as_view(), name='api_dashboard'),
+    path('api/v1/compare/', api.CompareView.as_view(), name='api_compare'),
+    path('api/v1/suggest/', views.suggest_view, name='suggest'),
+    path('api/v1/cars/<int:car_id>/uploads/', api.ImageUploadCreateView.as_view(), name='upload_create'),
+    path('api/v1/uploads/<uuid:upload_id>/', api.ImageUploadView.as_view(), name='upload_detail'),
+    path('api/v1/uploads/<uuid:upload_id>/chunks/<int:index>/', api.ImageUploadChunkView.as_view(), name='upload_chunk'),
+    path('api/v1/uploads/<uuid:upload_id>/complete/', api.ImageUploadCompleteView.as_view(), name='upload_complete'),
+]
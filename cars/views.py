@@ -1,3 +1,167 @@
-from django.shortcuts import render
+import re
 
-# Create your views here.
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.core.cache import cache
+from django.http import Http404, HttpResponse, JsonResponse
+from django.shortcuts import get_object_or_404, redirect, render
+from django.views.decorators.http import require_POST
+
+from main.middleware import client_ip
+
+from . import compare, landing, search_cache, typeahead
+from .archive import get_listing, restore
+from .forms import CarForm, CarImageFormSet, CarSearchForm
+from .lifecycle import renew
+from .models import ArchivedCar, Car, CarBrand, CarFeature, CarModel, CarView
+from .services import save_listing
+
+
+PAGE_SIZE = 20
+# Номер страницы, смещение по которому помещается в INTEGER SQLite
+_PAGE_RE = re.compile(r'[0-9]{1,9}')
+
+
+def car_list_view(request):
+    form = CarSearchForm(request.GET)
+    cars, total, page = [], 0, 1
+    if form.is_valid():
+        page_text = request.GET.get('page', '1')
+        page = max(int(page_text), 1) if _PAGE_RE.fullmatch(page_text) else 1
+        ids, total = search_cache.search(form, (page - 1) * PAGE_SIZE, PAGE_SIZE)
+        if total and form.cleaned_data.get('search'):
+            typeahead.query_log.record(form.cleaned_data['search'], typeahead.visitor_key(request))
+        cars = search_cache.fetch_page(ids)
+    query = request.GET.copy()
+    query.pop('page', None)
+    return render(request, 'cars/car_list.html', {
+        'form': form,
+        'cars': cars,
+        'total': total,
+        'page': page,
+        'has_next': page * PAGE_SIZE < total,
+        'query': query.urlencode(),
+    })
+
+
+def suggest_view(request):
+    """Подсказки для строки поиска; без DRF, чтобы ответ занимал доли миллисекунды"""
+    try:
+        limit = min(max(int(request.GET.get('limit', typeahead.MAX_SUGGESTIONS)), 1), typeahead.MAX_SUGGESTIONS)
+    except ValueError:
+        limit = typeahead.MAX_SUGGESTIONS
+    response = JsonResponse(typeahead.suggest(request.GET.get('q', ''), limit), safe=False)
+    response['Cache-Control'] = 'public, max-age=60'
+    return response
+
+
+def _landing_response(kind, object_id):
+    # Сюда запрос попадает только при промахе nginx: страница рисуется и ложится в файл
+    html = landing.render_page(kind, object_id)
+    if html is None:
+        raise Http404
+    return HttpResponse(html)
+
+
+def landing_brand_view(request, brand):
+    brand = get_object_or_404(CarBrand, code=brand, is_active=True)
+    return _landing_response('brand', brand.pk)
+
+
+def landing_model_view(request, brand, model):
+    model = get_object_or_404(CarModel, brand__code=brand, brand__is_active=True, code=model, is_active=True)
+    return _landing_response('model', model.pk)
+
+
+def car_compare_view(request):
+    try:
+        ids = compare.parse_ids(request.GET.get('ids'))
+    except compare.CompareError as exc:
+        return render(request, 'cars/compare.html', {'error': str(exc)}, status=400)
+    return render(request, 'cars/compare.html', {'comparison': compare.compare(ids)})
+
+
+def _record_view(request, car):
+    """Засчитать просмотр: один на посетителя за CAR_VIEW_THROTTLE, владелец не считается"""
+    user = request.user if request.user.is_authenticated else None
+    if user is not None and user.pk == car.owner_id:
+        return
+    ip = client_ip(request)
+    if ip is None:
+        return
+    # cache.add атомарен: из параллельных запросов посетителя засчитается один
+    if not cache.add(f'car:view:{car.pk}:{ip}', 1, settings.CAR_VIEW_THROTTLE):
+        return
+    car.increment_views()
+    CarView.objects.create(car=car, user=user, ip_address=ip)
+
+
+def car_detail_view(request, pk):
+    car, archived = get_listing(pk, request.user)
+    if car is None:
+        raise Http404
+    if archived is None:
+        _record_view(request, car)
+        images = car.images.all()
+        features = CarFeature.objects.filter(carfeaturerelation__car=car)
+    else:
+        images = archived.images.all()
+        features = CarFeature.objects.filter(pk__in=archived.feature_ids)
+    return render(request, 'cars/car_detail.html', {
+        'car': car, 'archived': archived, 'images': images, 'features': features,
+    })
+
+
+@login_required
+@require_POST
+def car_renew_view(request, pk):
+    if renew(pk, owner=request.user):
+        messages.success(request, 'Публикация объявления продлена')
+    else:
+        messages.error(request, 'Это объявление нельзя продлить')
+    return redirect('cars:car_detail', pk=pk)
+
+
+@login_required
+@require_POST
+def car_restore_view(request, pk):
+    archived = get_object_or_404(ArchivedCar, pk=pk, owner=request.user)
+    car = restore(archived)
+    messages.success(request, 'Объявление восстановлено из архива')
+    return redirect(car)
+
+
+@login_required
+def car_create_view(request):
+    if request.method == 'POST':
+        form = CarForm(request.POST)
+        formset = CarImageFormSet(request.POST, request.FILES)
+        if form.is_valid() and formset.is_valid():
+            car = save_listing(form, formset, owner=request.user)
+            messages.success(request, 'Объявление опубликовано!')
+            return redirect(car)
+    else:
+        form = CarForm()
+        formset = CarImageFormSet()
+
+    return render(request, 'cars/car_form.html', {'form': form, 'formset': formset})
+
+
+@login_required
+def car_edit_view(request, pk):
+    car = get_object_or_404(Car, pk=pk, owner=request.user)
+    if request.method == 'POST':
+        form = CarForm(request.POST, instance=car)
+        formset = CarImageFormSet(request.POST, request.FILES, instance=car)
+        if form.is_valid() and formset.is_valid():
+            save_listing(form, formset)
+            messages.success(request, 'Объявление обновлено!')
+            return redirect(car)
+    else:
+        form = CarForm(instance=car, initial={
+            'features': car.car_features.values_list('feature_id', flat=True),
+        })
+        formset = CarImageFormSet(instance=car)
+
+    return render(request, 'cars/car_form.html', {'form': form, 'formset': formset, 'car': car})
@@ -0,0 +1,92 @@
+# gunicorn.conf.py
+"""Боевой профиль gunicorn.
+
+Приложение загружается в мастере (preload_app) и прогревается там же, см.
+main/warmup.py, после чего сборщик мусора замораживает кучу: воркеры
+получают Django, DRF и прогретые индексы общими страницами copy-on-write
+и не импортируют их заново. Число воркеров считается от CPU и памяти,
+доступных контейнеру, воркеры перезапускаются после max_requests запросов
+со случайным разбросом, чтобы не уходить на перезапуск все сразу.
+
+Основные параметры переопределяются переменными окружения GUNICORN_*.
+"""
+import gc
+import os
+
+import decouple
+
+WORKER_MEMORY_MB = decouple.config('GUNICORN_WORKER_MEMORY_MB', default=160, cast=int)
+MEMORY_SHARE = 0.75  # остальное — мастеру, кэшу страниц и соседним процессам
+
+
+def _cgroup_cpus():
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            quota, period = f.read().split()
+        if quota != 'max':
+            return max(int(quota) // int(period), 1)
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def cpu_count():
+    try:
+        available = len(os.sched_getaffinity(0))
+    except AttributeError:
+        available = os.cpu_count() or 1
+    limit = _cgroup_cpus()
+    return min(available, limit) if limit else available
+
+
+def memory_mb():
+    """Память контейнера по cgroup, иначе физическая память машины"""
+    for path in ('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory/memory.limit_in_bytes'):
+        try:
+            with open(path) as f:
+                value = f.read().strip()
+        except OSError:
+            continue
+        if value.isdigit() and int(value) < 1 << 60:
+            return int(value) // (1 << 20)
+    return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') // (1 << 20)
+
+
+def default_workers():
+    by_cpu = cpu_count() * 2 + 1
+    by_memory = int(memory_mb() * MEMORY_SHARE) // WORKER_MEMORY_MB
+    return max(min(by_cpu, by_memory), 2)
+
+
+bind = decouple.config('GUNICORN_BIND', default='0.0.0.0:8000')
+workers = decouple.config('GUNICORN_WORKERS', default=default_workers(), cast=int)
+# Потоки закрывают ожидание на SQLite и файлах, не увеличивая память
+threads = decouple.config('GUNICORN_THREADS', default=2, cast=int)
+worker_class = 'gthread' if threads > 1 else 'sync'
+preload_app = True
+
+max_requests = decouple.config('GUNICORN_MAX_REQUESTS', default=2000, cast=int)
+max_requests_jitter = decouple.config('GUNICORN_MAX_REQUESTS_JITTER', default=max_requests // 10, cast=int)
+timeout = decouple.config('GUNICORN_TIMEOUT', default=30, cast=int)
+graceful_timeout = 30
+keepalive = 5
+
+# Пульс воркеров в памяти, а не на диске overlayfs
+worker_tmp_dir = '/dev/shm' if os.path.isdir('/dev/shm') else None
+accesslog = decouple.config('GUNICORN_ACCESS_LOG', default='-')
+errorlog = '-'
+loglevel = decouple.config('GUNICORN_LOG_LEVEL', default='info')
+
+
+def when_ready(server):
+    from main.warmup import warm
+    warm()
+    # Объекты мастера больше не обходятся сборщиком, их страницы не копируются в воркерах
+    gc.collect()
+    gc.freeze()
+    server.log.info('Warmed up, %s workers x %s threads', workers, threads)
+
+
+def post_fork(server, worker):
+    from main.warmup import after_fork
+    after_fork()
@@ -1,3 +1,130 @@
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
 from django.contrib import admin
+from django.db.models import Avg, Count, DurationField, ExpressionWrapper, F, Min, Q
+from django.http import FileResponse, Http404
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils import timezone
+from django.utils.html import format_html, format_html_join
+
+from .models import Job, RequestProfile
+from .profiling import remove_file
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'status', 'run_at', 'attempts', 'max_attempts', 'interval', 'locked_by', 'finished_at')
+    list_filter = ('status', 'name')
+    search_fields = ('name', 'unique_key', 'last_error')
+    readonly_fields = ('attempts', 'locked_by', 'locked_until', 'last_error', 'created_at', 'started_at', 'finished_at')
+    actions = ['retry']
+
+    @admin.action(description='Повторить выбранные задачи')
+    def retry(self, request, queryset):
+        updated = queryset.exclude(status='running').update(
+            status='queued', run_at=timezone.now(), attempts=0, locked_by='', locked_until=None
+        )
+        self.message_user(request, f'Поставлено в очередь: {updated}')
+
+    def changelist_view(self, request, extra_context=None):
+        extra_context = extra_context or {}
+        extra_context['queue_stats'] = self.queue_stats()
+        return super().changelist_view(request, extra_context=extra_context)
+
+    def queue_stats(self):
+        """Глубина очереди и задержка запуска задач"""
+        now = timezone.now()
+        counts = Job.objects.aggregate(
+            due=Count('pk', filter=Q(status='queued', run_at__lte=now)),
+            scheduled=Count('pk', filter=Q(status='queued', run_at__gt=now)),
+            running=Count('pk', filter=Q(status='running')),
+            expired=Count('pk', filter=Q(status='running', locked_until__lt=now)),
+            failed=Count('pk', filter=Q(status='failed')),
+            oldest_due=Min('run_at', filter=Q(status='queued', run_at__lte=now)),
+        )
+        # После повтора или у периодической задачи run_at уже сдвинут вперёд
+        latency = Job.objects.filter(
+            started_at__gte=now - timedelta(hours=1), run_at__lte=F('started_at')
+        ).aggregate(avg=Avg(ExpressionWrapper(F('started_at') - F('run_at'), output_field=DurationField())))
+        oldest_due = counts.pop('oldest_due')
+        counts['lag'] = now - oldest_due if oldest_due else None
+        counts['latency'] = latency['avg']
+        return counts
+
+
+class SlowFilter(admin.SimpleListFilter):
+    title = 'Медленные'
+    parameter_name = 'slow'
+
+    def lookups(self, request, model_admin):
+        return [('1', f'Дольше {settings.PROFILING_SLOW_MS} мс')]
+
+    def queryset(self, request, queryset):
+        if self.value() == '1':
+            return queryset.filter(duration_ms__gte=settings.PROFILING_SLOW_MS)
+        return queryset
+
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    list_display = ('created_at', 'method', 'path', 'status_code', 'duration_ms', 'sql_count', 'sql_ms',
+                    'trigger', 'folded_link')
+    list_filter = (SlowFilter, 'trigger', 'view')
+    search_fields = ('path', 'view')
+    exclude = ('queries',)
+    readonly_fields = ('method', 'path', 'view', 'status_code', 'trigger', 'duration_ms', 'sql_count',
+                       'sql_ms', 'samples', 'folded_link', 'created_at', 'timeline')
+    actions = ['delete_with_files']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_actions(self, request):
+        actions = super().get_actions(request)
+        actions.pop('delete_selected', None)
+        return actions
+
+    def get_urls(self):
+        return [
+            path('<int:pk>/folded/', self.admin_site.admin_view(self.folded_view),
+                 name='main_requestprofile_folded'),
+        ] + super().get_urls()
+
+    def folded_view(self, request, pk):
+        profile = get_object_or_404(RequestProfile, pk=pk)
+        file = Path(settings.PROFILING_DIR) / profile.file
+        if not file.is_file():
+            raise Http404
+        return FileResponse(file.open('rb'), as_attachment=True, filename=file.name)
+
+    @admin.display(description='Стеки')
+    def folded_link(self, obj):
+        url = reverse('admin:main_requestprofile_folded', args=[obj.pk])
+        return format_html('<a href="{}">{}</a>', url, Path(obj.file).name)
+
+    @admin.display(description='Хронология SQL')
+    def timeline(self, obj):
+        rows = format_html_join(
+            '', '<tr><td>{}</td><td>{}</td><td><code>{}</code></td></tr>',
+            ((query['start_ms'], query['duration_ms'], query['sql']) for query in obj.queries),
+        )
+        return format_html(
+            '<table><tr><th>Начало, мс</th><th>Длительность, мс</th><th>SQL</th></tr>{}</table>', rows
+        )
+
+    def delete_model(self, request, obj):
+        remove_file(obj.file)
+        super().delete_model(request, obj)
 
-# Register your models here.
+    @admin.action(description='Удалить выбранные профили вместе с файлами')
+    def delete_with_files(self, request, queryset):
+        for name in queryset.values_list('file', flat=True):
+            remove_file(name)
+        deleted, _ = queryset.delete()
+        self.message_user(request, f'Удалено: {deleted}')
@@ -0,0 +1,277 @@
+# main/backup.py
+"""Онлайн-копии базы SQLite.
+
+Копия снимается штатным backup API SQLite по BACKUP_PAGES страниц за шаг
+с паузой BACKUP_SLEEP между шагами. База в режиме журнала отката (delete),
+не WAL, поэтому на время шага источник держит разделяемую блокировку:
+фиксация записи ждёт её снятия до конца шага, а пока фиксирующий запрос
+ждёт, его блокировка PENDING не пускает и новых читателей. Значит, и запись,
+и чтение могут ждать до одного шага — отсюда маленькие шаги с паузами. Если
+другое соединение меняет базу во время копирования, SQLite начинает копию
+заново; после BACKUP_MAX_RESTARTS перезапусков копия снимается одним шагом —
+это гарантированно завершается, но задерживает запись на всё время
+копирования, и отчёт это покажет.
+
+Готовая копия проверяется PRAGMA integrity_check, сжимается в
+``db-<время>.sqlite3.gz`` и получает рядом JSON с контрольной суммой и
+отчётом. По флагу ``probe`` (backup_database --probe; периодическая задача
+его не включает) отдельный поток раз в PROBE_INTERVAL делает настоящую
+маленькую запись — BEGIN IMMEDIATE, UPDATE строки BackupProbe, COMMIT — и
+замеряет её время: столько же ждёт запись приложения. Сам замер при этом
+нагружает базу как ещё один пишущий клиент.
+
+Восстановление идёт тем же backup API в обратную сторону одним шагом, так
+что открытые соединения приложения видят новую базу, а не удалённый файл.
+"""
+import gzip
+import hashlib
+import json
+import os
+import sqlite3
+import statistics
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.utils import timezone
+
+PROBE_INTERVAL = 0.1
+BASELINE_PROBES = 25
+_PREFIX = 'db-'
+_SUFFIX = '.sqlite3.gz'
+
+
+class BackupError(Exception):
+    pass
+
+
+class _TooManyRestarts(Exception):
+    pass
+
+
+def database_path():
+    return Path(settings.DATABASES['default']['NAME'])
+
+
+def _connect(path):
+    timeout = settings.DATABASES['default'].get('OPTIONS', {}).get('timeout', 20)
+    return sqlite3.connect(path, timeout=timeout, isolation_level=None, check_same_thread=False)
+
+
+def _summary(timings):
+    if not timings:
+        return None
+    ordered = sorted(timings)
+    return {
+        'count': len(ordered),
+        'p50_ms': round(statistics.median(ordered) * 1000, 2),
+        'p95_ms': round(ordered[int(len(ordered) * 0.95)] * 1000, 2),
+        'max_ms': round(ordered[-1] * 1000, 2),
+    }
+
+
+class WriteProbe:
+    """Сколько длится маленькая запись, пока идёт копирование"""
+
+    def __init__(self, path):
+        from .models import BackupProbe
+
+        self.connection = _connect(path)
+        self.table = BackupProbe._meta.db_table
+        self.connection.execute(
+            f'INSERT OR IGNORE INTO "{self.table}" (id, touched_at) VALUES (1, ?)', (timezone.now().isoformat(),)
+        )
+        self.timings = []
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def sample(self):
+        started = time.perf_counter()
+        try:
+            self.connection.execute('BEGIN IMMEDIATE')
+            self.connection.execute(
+                f'UPDATE "{self.table}" SET touched_at = ? WHERE id = 1', (timezone.now().isoformat(),)
+            )
+            self.connection.execute('COMMIT')
+        finally:
+            if self.connection.in_transaction:
+                self.connection.execute('ROLLBACK')
+        return time.perf_counter() - started
+
+    def baseline(self, count=BASELINE_PROBES):
+        timings = []
+        for _ in range(count):
+            timings.append(self.sample())
+            time.sleep(PROBE_INTERVAL)
+        return _summary(timings)
+
+    def _run(self):
+        while not self.stopped.wait(PROBE_INTERVAL):
+            try:
+                self.timings.append(self.sample())
+            except sqlite3.OperationalError:
+                # Блокировку не дали за весь таймаут — это и есть задержка
+                self.timings.append(self.connection.execute('PRAGMA busy_timeout').fetchone()[0] / 1000)
+
+    def __enter__(self):
+        self.thread = threading.Thread(target=self._run, name='backup-probe', daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        self.thread.join()
+        self.connection.close()
+
+
+def _copy(source, target, pages, sleep, max_restarts):
+    """Скопировать базу по шагам; вернуть (статистику шагов, был ли откат на один шаг)"""
+    stats = {'steps': 0, 'restarts': 0, 'remaining': None, 'step_timings': []}
+    last = [time.perf_counter()]
+
+    def progress(status, remaining, total):
+        stats['step_timings'].append(time.perf_counter() - last[0])
+        stats['steps'] += 1
+        if stats['remaining'] is not None and remaining >= stats['remaining']:
+            stats['restarts'] += 1
+            if stats['restarts'] > max_restarts:
+                raise _TooManyRestarts
+        stats['remaining'] = remaining
+        # sqlite3 сам спит только при SQLITE_BUSY, паузу между шагами делаем здесь,
+        # когда блокировка источника уже снята
+        if remaining:
+            time.sleep(sleep)
+        last[0] = time.perf_counter()
+
+    try:
+        source.backup(target, pages=pages, progress=progress, sleep=sleep)
+        fallback = False
+    except _TooManyRestarts:
+        started = time.perf_counter()
+        source.backup(target, pages=-1)
+        stats['step_timings'].append(time.perf_counter() - started)
+        fallback = True
+    return stats, fallback
+
+
+def _gzip(path, target):
+    digest = hashlib.sha256()
+    tmp = target.with_name(f'.{target.name}.tmp')
+    with open(path, 'rb') as src, gzip.open(tmp, 'wb', compresslevel=6) as dst:
+        for chunk in iter(lambda: src.read(1 << 20), b''):
+            digest.update(chunk)
+            dst.write(chunk)
+    os.replace(tmp, target)
+    return digest.hexdigest()
+
+
+def integrity(path):
+    connection = sqlite3.connect(path)
+    try:
+        rows = [row[0] for row in connection.execute('PRAGMA integrity_check')]
+    finally:
+        connection.close()
+    return rows == ['ok'], rows[:10]
+
+
+def snapshot(directory=None, pages=None, sleep=None, probe=False):
+    """Снять, проверить и сжать копию; вернуть отчёт"""
+    directory = Path(directory or settings.BACKUP_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    pages = pages or settings.BACKUP_PAGES
+    sleep = settings.BACKUP_SLEEP if sleep is None else sleep
+    name = f'{_PREFIX}{timezone.now():%Y%m%d-%H%M%S}{_SUFFIX}'
+    raw = directory / f'.{name}.raw'
+
+    source = _connect(database_path())
+    target = sqlite3.connect(raw)
+    probe_ctx = WriteProbe(database_path()) if probe else None
+    try:
+        baseline = probe_ctx.baseline() if probe_ctx else None
+        started = time.perf_counter()
+        if probe_ctx:
+            with probe_ctx:
+                stats, fallback = _copy(source, target, pages, sleep, settings.BACKUP_MAX_RESTARTS)
+        else:
+            stats, fallback = _copy(source, target, pages, sleep, settings.BACKUP_MAX_RESTARTS)
+        copy_seconds = time.perf_counter() - started
+    finally:
+        target.close()
+        source.close()
+
+    try:
+        ok, problems = integrity(raw)
+        if not ok:
+            raise BackupError(f'Копия не прошла integrity_check: {problems}')
+        size = raw.stat().st_size
+        sha256 = _gzip(raw, directory / name)
+    finally:
+        raw.unlink(missing_ok=True)
+
+    report = {
+        'file': name,
+        'created_at': timezone.now().isoformat(),
+        'database_bytes': size,
+        'compressed_bytes': (directory / name).stat().st_size,
+        'sha256': sha256,
+        'integrity': 'ok',
+        'copy_seconds': round(copy_seconds, 3),
+        'pages_per_step': pages,
+        'steps': stats['steps'],
+        'restarts': stats['restarts'],
+        'single_step_fallback': fallback,
+        'lock_hold': _summary(stats['step_timings']),
+        'write_wait_baseline': baseline,
+        'write_wait_during_backup': _summary(probe_ctx.timings) if probe_ctx else None,
+    }
+    (directory / name).with_suffix('.json').write_text(json.dumps(report, indent=2))
+    report['removed'] = prune(directory)
+    return report
+
+
+def snapshots(directory=None):
+    """Копии от новых к старым"""
+    directory = Path(directory or settings.BACKUP_DIR)
+    return sorted(directory.glob(f'{_PREFIX}*{_SUFFIX}'), reverse=True)
+
+
+def prune(directory=None, keep=None):
+    keep = settings.BACKUP_KEEP if keep is None else keep
+    removed = []
+    for path in snapshots(directory)[keep:]:
+        path.unlink(missing_ok=True)
+        path.with_suffix('.json').unlink(missing_ok=True)
+        removed.append(path.name)
+    return removed
+
+
+def restore(path):
+    """Заменить содержимое рабочей базы копией ``path``; вернуть отчёт"""
+    path = Path(path)
+    manifest = path.with_suffix('.json')
+    expected = json.loads(manifest.read_text()).get('sha256') if manifest.exists() else None
+    raw = database_path().with_name(f'.restore-{os.getpid()}.sqlite3')
+    digest = hashlib.sha256()
+    try:
+        with gzip.open(path, 'rb') as src, open(raw, 'wb') as dst:
+            for chunk in iter(lambda: src.read(1 << 20), b''):
+                digest.update(chunk)
+                dst.write(chunk)
+        if expected and digest.hexdigest() != expected:
+            raise BackupError('Контрольная сумма копии не совпадает с манифестом')
+        ok, problems = integrity(raw)
+        if not ok:
+            raise BackupError(f'Копия не прошла integrity_check: {problems}')
+        source = sqlite3.connect(raw)
+        target = _connect(database_path())
+        try:
+            started = time.perf_counter()
+            source.backup(target, pages=-1)
+            seconds = time.perf_counter() - started
+        finally:
+            target.close()
+            source.close()
+    finally:
+        raw.unlink(missing_ok=True)
+    return {'file': path.name, 'database_bytes': os.path.getsize(database_path()), 'seconds': round(seconds, 3)}
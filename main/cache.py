@@ -0,0 +1,37 @@
+# main/cache.py
+import os
+import tempfile
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.core.cache.backends.filebased import FileBasedCache
+
+
+class AtomicFileBasedCache(FileBasedCache):
+    """Файловый кэш, в котором add атомарен между процессами.
+
+    Штатный add проверяет наличие ключа и затем пишет файл, поэтому два
+    процесса могут одновременно «взять» одну блокировку. Здесь файл
+    создаётся через os.link, который не перезаписывает существующий.
+    """
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._createdir()
+        # Как в set: иначе каталог блокировок растёт без MAX_ENTRIES
+        self._cull()
+        fname = self._key_to_file(key, version)
+        fd, tmp_path = tempfile.mkstemp(dir=self._dir)
+        try:
+            with open(fd, 'wb') as f:
+                self._write_content(f, timeout, value)
+            for _ in range(2):
+                try:
+                    os.link(tmp_path, fname)
+                    return True
+                except FileExistsError:
+                    if self.has_key(key, version):
+                        return False
+                    # Просроченная запись: удаляем и пробуем ещё раз
+                    self._delete(fname)
+            return False
+        finally:
+            os.remove(tmp_path)
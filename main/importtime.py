@@ -0,0 +1,92 @@
+# main/importtime.py
+"""Отчёт о времени импорта при запуске воркера.
+
+Чистый интерпретатор с ``-X importtime`` загружает autoru.wsgi, как это
+делает gunicorn, а вывод разбирается здесь. importlib.import_module, через
+который Django грузит приложения, модели и admin, importtime не видит,
+поэтому в замерах он подменяется обычным __import__. Собственное время модуля
+приписывается самому длинному совпадающему префиксу из INSTALLED_APPS,
+поэтому django.contrib.admin и остальной django считаются отдельно, а
+прочее — пакету верхнего уровня.
+"""
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+
+_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$')
+
+BOOT = """
+import importlib, importlib.util, os, sys
+
+def import_module(name, package=None):
+    if name.startswith('.'):
+        name = importlib.util.resolve_name(name, package)
+    __import__(name)
+    return sys.modules[name]
+
+importlib.import_module = import_module
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', {settings!r})
+import autoru.wsgi
+"""
+
+
+def measure():
+    """Строки (модуль, собственное мкс, накопленное мкс, глубина)"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', BOOT.format(settings=os.environ['DJANGO_SETTINGS_MODULE'])],
+        capture_output=True, text=True, cwd=settings.BASE_DIR,
+    )
+    if result.returncode:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else 'import failed')
+    return parse(result.stderr)
+
+
+def parse(output):
+    rows = []
+    for line in output.splitlines():
+        match = _LINE.match(line)
+        if match:
+            own, cumulative, indent, name = match.groups()
+            rows.append((name, int(own), int(cumulative), (len(indent) - 1) // 2))
+    return rows
+
+
+def owner(module, apps):
+    """Приложение из ``apps`` с самым длинным префиксом, иначе пакет верхнего уровня"""
+    best = None
+    for app in apps:
+        if (module == app or module.startswith(app + '.')) and (best is None or len(app) > len(best)):
+            best = app
+    return best or module.split('.')[0]
+
+
+def report(rows, limit=15):
+    apps = [app.split('.apps.')[0] for app in settings.INSTALLED_APPS]
+    groups = defaultdict(lambda: [0, 0])
+    for name, own, _, _ in rows:
+        group = groups[owner(name, apps)]
+        group[0] += own
+        group[1] += 1
+    total = sum(own for _, own, _, _ in rows)
+    top = sorted(rows, key=lambda row: row[2], reverse=True)
+    return {
+        'total_ms': total / 1000,
+        'modules': len(rows),
+        'apps': [
+            {'app': app, 'ms': groups[app][0] / 1000, 'modules': groups[app][1]}
+            for app in sorted(apps, key=lambda app: groups[app][0], reverse=True)
+        ],
+        'packages': [
+            {'package': name, 'ms': own / 1000, 'modules': count}
+            for name, (own, count) in sorted(groups.items(), key=lambda item: item[1][0], reverse=True)
+            if name not in apps
+        ][:limit],
+        'slowest': [
+            {'module': name, 'ms': cumulative / 1000, 'self_ms': own / 1000}
+            for name, own, cumulative, _ in top[:limit]
+        ],
+    }
@@ -0,0 +1,208 @@
+# main/jobs.py
+"""Очередь фоновых задач в БД.
+
+Задачи регистрируются декоратором ``@job`` в модулях ``tasks.py``
+приложений и ставятся в очередь через ``enqueue``. Воркер захватывает
+задачу условным UPDATE: строка переходит в ``running`` только если она всё
+ещё свободна, поэтому два процесса не возьмут одну задачу даже в SQLite,
+где нет SELECT ... FOR UPDATE. Захват — это аренда до ``locked_until``:
+если воркер упал, задачу после истечения аренды заберёт другой. Пока задача
+выполняется, поток-пульс продлевает аренду каждую треть её срока, поэтому
+долгая задача не достаётся второму воркеру. Итог записывается только если
+задача всё ещё числится за этим воркером.
+
+``unique_key`` у разовой задачи не даёт поставить вторую такую же, пока
+первая ждёт в очереди; при захвате ключ снимается, и изменения, пришедшие
+во время выполнения, поставят задачу заново.
+"""
+import logging
+import random
+import threading
+import traceback
+from datetime import timedelta
+
+from django.db import IntegrityError, OperationalError, connection, transaction
+from django.db.models import Case, F, Q, When
+from django.utils import timezone
+from django.utils.module_loading import autodiscover_modules
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+registry = {}
+
+DEFAULT_LEASE = 300
+BACKOFF_BASE = 10
+BACKOFF_MAX = 3600
+
+
+def job(name, max_attempts=5, every=None):
+    """Зарегистрировать функцию как задачу; ``every`` — период в секундах"""
+    def decorator(func):
+        registry[name] = {'func': func, 'max_attempts': max_attempts, 'every': every}
+        func.job_name = name
+        return func
+    return decorator
+
+
+def autodiscover():
+    autodiscover_modules('tasks')
+
+
+def enqueue(name, *args, run_at=None, delay=None, unique_key=None, **kwargs):
+    """Поставить задачу; с ``unique_key`` вернуть уже ждущую в очереди, если она есть"""
+    if name not in registry:
+        raise KeyError(f'Unknown job: {name}')
+    if run_at is None:
+        run_at = timezone.now()
+        if delay:
+            run_at += timedelta(seconds=delay)
+    while True:
+        if unique_key is not None:
+            queued = Job.objects.filter(unique_key=unique_key).first()
+            if queued is not None:
+                return queued
+        try:
+            with transaction.atomic():
+                return Job.objects.create(
+                    name=name,
+                    args=list(args),
+                    kwargs=kwargs,
+                    run_at=run_at,
+                    unique_key=unique_key,
+                    max_attempts=registry[name]['max_attempts'],
+                )
+        except IntegrityError:
+            # Ту же задачу параллельно поставил другой процесс; она либо
+            # найдётся, либо уже захвачена и ключ свободен
+            if unique_key is None:
+                raise
+
+
+def schedule_recurring():
+    """Создать строки для периодических задач, не сдвигая уже запланированные"""
+    scheduled = 0
+    for name, spec in registry.items():
+        if not spec['every']:
+            continue
+        _, created = Job.objects.update_or_create(
+            unique_key=name,
+            defaults={'name': name, 'interval': spec['every'], 'max_attempts': spec['max_attempts']},
+        )
+        scheduled += created
+    stale = Job.objects.filter(unique_key__isnull=False, interval__isnull=False).exclude(
+        unique_key__in=[name for name, spec in registry.items() if spec['every']]
+    )
+    stale.delete()
+    return scheduled
+
+
+def _claimable(now):
+    return (
+        Q(status='queued', run_at__lte=now) |
+        Q(status='running', locked_until__lt=now)
+    )
+
+
+def claim(worker_id, lease=DEFAULT_LEASE, names=None):
+    """Захватить одну готовую задачу или вернуть None"""
+    now = timezone.now()
+    candidates = Job.objects.filter(_claimable(now))
+    if names:
+        candidates = candidates.filter(name__in=names)
+    for pk in candidates.order_by('run_at').values_list('pk', flat=True)[:10]:
+        claimed = Job.objects.filter(_claimable(now), pk=pk).update(
+            status='running',
+            locked_by=worker_id,
+            locked_until=now + timedelta(seconds=lease),
+            started_at=now,
+            attempts=F('attempts') + 1,
+            # Ключ разовой задачи освобождается: новые изменения поставят её заново
+            unique_key=Case(When(interval__isnull=True, then=None), default=F('unique_key')),
+        )
+        if claimed:
+            return Job.objects.get(pk=pk)
+    return None
+
+
+def backoff(attempts):
+    """Экспоненциальная задержка перед повтором с разбросом ±25%"""
+    delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempts - 1))
+    return delay * random.uniform(0.75, 1.25)
+
+
+class _Heartbeat(threading.Thread):
+    """Продлевает аренду задачи, пока она выполняется"""
+
+    def __init__(self, mine, job_row, lease):
+        super().__init__(name=f'job-heartbeat-{job_row.pk}', daemon=True)
+        self.mine = mine
+        self.job_row = job_row
+        self.lease = lease
+        self.stopped = threading.Event()
+
+    def run(self):
+        try:
+            while not self.stopped.wait(self.lease / 3):
+                try:
+                    extended = self.mine.update(locked_until=timezone.now() + timedelta(seconds=self.lease))
+                except OperationalError:
+                    # Базу держит сама задача; до конца аренды будет ещё попытка
+                    continue
+                if not extended:
+                    logger.warning('Job %s lost its lease', self.job_row)
+                    return
+        finally:
+            connection.close()
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+def _finish(mine, job_row, **fields):
+    if not mine.update(**fields):
+        logger.warning('Job %s is no longer held by %s, result discarded', job_row, job_row.locked_by)
+
+
+def run(job_row, lease=DEFAULT_LEASE):
+    """Выполнить захваченную задачу и записать результат"""
+    spec = registry.get(job_row.name)
+    mine = Job.objects.filter(pk=job_row.pk, locked_by=job_row.locked_by, status='running')
+    now = timezone.now
+    heartbeat = _Heartbeat(mine, job_row, lease)
+    heartbeat.start()
+    try:
+        if spec is None:
+            raise KeyError(f'Unknown job: {job_row.name}')
+        spec['func'](*job_row.args, **job_row.kwargs)
+    except Exception:
+        heartbeat.stop()
+        error = traceback.format_exc()
+        logger.warning('Job %s failed (attempt %s)', job_row, job_row.attempts)
+        if job_row.attempts >= job_row.max_attempts:
+            if job_row.interval:
+                _finish(mine, job_row, status='queued', run_at=now() + timedelta(seconds=job_row.interval),
+                        attempts=0, locked_by='', locked_until=None, last_error=error)
+            else:
+                _finish(mine, job_row, status='failed', finished_at=now(), locked_until=None, last_error=error)
+        else:
+            _finish(mine, job_row, status='queued', run_at=now() + timedelta(seconds=backoff(job_row.attempts)),
+                    locked_by='', locked_until=None, last_error=error)
+        return False
+
+    heartbeat.stop()
+    if job_row.interval:
+        _finish(mine, job_row, status='queued', run_at=now() + timedelta(seconds=job_row.interval),
+                attempts=0, locked_by='', locked_until=None, finished_at=now())
+    else:
+        _finish(mine, job_row, status='done', finished_at=now(), locked_until=None)
+    return True
+
+
+@job('main.purge_jobs', every=24 * 3600)
+def purge_jobs(days=7):
+    """Удалить выполненные задачи старше ``days`` дней"""
+    cutoff = timezone.now() - timedelta(days=days)
+    Job.objects.filter(status='done', finished_at__lt=cutoff).delete()
@@ -0,0 +1,395 @@
+# main/loadtest.py
+"""Нагрузочный прогон смеси типичных запросов сайта.
+
+Сценарий — одна операция пользователя: страница выдачи, поиск по
+случайному набору параметров CarSearchForm, карточка объявления, вход или
+загрузка фото по частям (начало, части, отмена — чтобы прогон не копил
+фото). Запросы идут через django.test.Client в этом же процессе или по
+HTTP на запущенный сервер; параметры поиска и id объявлений берутся из
+локальной БД, поэтому сервер должен смотреть в неё же.
+
+Перед замером каждый сценарий один раз проверяется: если он отвечает
+ошибкой (нет шаблона, неверный пароль, 500), прогон не начинается. Ответы с
+ошибкой считаются отдельно и в перцентили задержки не входят — быстрая
+страница ошибки не должна выглядеть быстрой страницей.
+
+Режимы: фиксированное число параллельных пользователей (каждый сразу
+начинает следующий сценарий) или фиксированная интенсивность прихода
+(пуассоновский поток). Во втором случае задержка считается от
+запланированного момента, поэтому очередь к перегруженному приложению
+входит в перцентили, а не прячется.
+"""
+import hashlib
+import http.cookiejar
+import json
+import math
+import queue
+import random
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import connections
+
+from cars.models import Car, CarBrand, CarModel
+
+DEFAULT_MIX = {'browse': 40, 'search': 35, 'detail': 15, 'login': 5, 'upload': 5}
+UPLOAD_SIZE = 64 * 1024
+SEARCH_WORDS = ['автомат', 'один владелец', 'не бит', 'дилер', 'торг']
+
+
+def parse_mix(text):
+    """«browse=40,search=35» → {'browse': 40, 'search': 35}"""
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in DEFAULT_MIX:
+            raise ValueError(f'Неизвестный сценарий: {name}')
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def percentile(values, share):
+    """Перцентиль по ближайшему рангу по отсортированному списку"""
+    if not values:
+        return None
+    rank = max(math.ceil(share * len(values)), 1)
+    return values[rank - 1]
+
+
+class InProcessClient:
+    def __init__(self):
+        from django.test import Client
+
+        host = next((h for h in settings.ALLOWED_HOSTS if h and h != '*' and not h.startswith('.')), 'localhost')
+        self.client = Client(raise_request_exception=False, HTTP_HOST=host)
+
+    def request(self, method, path, data=None, body=None, headers=None):
+        kwargs = {'headers': headers or {}}
+        if body is not None:
+            kwargs.update(data=body, content_type='application/octet-stream')
+        elif data is not None:
+            kwargs['data'] = data
+        response = getattr(self.client, method.lower())(path, **kwargs)
+        content = b'' if response.streaming else response.content
+        return response.status_code, content
+
+    def close(self):
+        connections.close_all()
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HttpClient:
+    """Клиент с собственными cookie; редиректы не выполняет, как браузер после POST они — отдельный запрос"""
+
+    def __init__(self, base_url, timeout=30):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.cookies = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(self.cookies), _NoRedirect,
+        )
+
+    def _csrf_token(self):
+        return next((cookie.value for cookie in self.cookies if cookie.name == 'csrftoken'), '')
+
+    def request(self, method, path, data=None, body=None, headers=None):
+        headers = dict(headers or {})
+        if method != 'GET':
+            headers.setdefault('X-CSRFToken', self._csrf_token())
+            headers.setdefault('Referer', self.base_url + '/')
+        url = self.base_url + path
+        payload = None
+        if body is not None:
+            payload = body
+            headers['Content-Type'] = 'application/octet-stream'
+        elif data is not None and method == 'GET':
+            url += '?' + urllib.parse.urlencode(data, doseq=True)
+        elif data is not None:
+            payload = urllib.parse.urlencode(data, doseq=True).encode()
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        request = urllib.request.Request(url, data=payload, headers=headers, method=method)
+        try:
+            with self.opener.open(request, timeout=self.timeout) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as exc:
+            return exc.code, exc.read()
+
+    def close(self):
+        pass
+
+
+class Catalog:
+    """Данные из локальной БД для построения запросов"""
+
+    def __init__(self, user=None):
+        self.models = list(
+            CarModel.objects.filter(is_active=True, car__status='active')
+            .values_list('pk', 'brand_id').distinct()
+        )
+        self.brands = sorted({brand_id for _, brand_id in self.models}) or \
+            list(CarBrand.objects.filter(is_active=True).values_list('pk', flat=True))
+        self.brand_names = list(CarBrand.objects.filter(pk__in=self.brands).values_list('name', flat=True))
+        self.car_ids = list(Car.objects.filter(status='active').values_list('pk', flat=True)[:50000])
+        self.own_car_ids = list(Car.objects.filter(owner=user).values_list('pk', flat=True)) if user else []
+
+    def search_params(self, rng):
+        params = {}
+        if self.models and rng.random() < 0.6:
+            model_id, brand_id = rng.choice(self.models)
+            params['brand'] = brand_id
+            if rng.random() < 0.5:
+                params['model'] = model_id
+        elif rng.random() < 0.4:
+            params['search'] = rng.choice(self.brand_names + SEARCH_WORDS) if self.brand_names else rng.choice(SEARCH_WORDS)
+        if rng.random() < 0.4:
+            low = rng.randint(2, 40) * 50000
+            params['price_from'] = low
+            params['price_to'] = low + rng.randint(4, 40) * 50000
+        if rng.random() < 0.3:
+            params['year_from'] = rng.randint(2000, 2020)
+        for name, choices in (('body_type', Car.BODY_TYPE_CHOICES), ('fuel_type', Car.FUEL_TYPE_CHOICES),
+                              ('transmission', Car.TRANSMISSION_CHOICES)):
+            if rng.random() < 0.15:
+                params[name] = rng.choice(choices)[0]
+        if rng.random() < 0.3:
+            params['ordering'] = rng.choice(['popular', 'price', '-price'])
+        if rng.random() < 0.2:
+            params['page'] = rng.randint(2, 5)
+        return params
+
+
+class LoadTestError(Exception):
+    pass
+
+
+class ScenarioError(Exception):
+    def __init__(self, status):
+        super().__init__(status)
+        self.status = status
+
+
+class Session:
+    """Один виртуальный пользователь со своим клиентом и cookie"""
+
+    def __init__(self, client, catalog, credentials, rng):
+        self.client = client
+        self.catalog = catalog
+        self.credentials = credentials
+        self.rng = rng
+        self.logged_in = False
+
+    def check(self, status, expected=None):
+        if expected is not None and status not in expected:
+            raise ScenarioError(status)
+        if status >= 400:
+            raise ScenarioError(status)
+        return status
+
+    def browse(self):
+        params = {'page': self.rng.choice([1, 1, 1, 2, 3])}
+        if self.rng.random() < 0.3:
+            params['ordering'] = 'popular'
+        return self.check(self.client.request('GET', '/api/v1/cars/', data=params)[0])
+
+    def search(self):
+        return self.check(self.client.request('GET', '/api/v1/cars/', data=self.catalog.search_params(self.rng))[0])
+
+    def detail(self):
+        if not self.catalog.car_ids:
+            raise ScenarioError(0)
+        return self.check(self.client.request('GET', f'/cars/{self.rng.choice(self.catalog.car_ids)}/')[0])
+
+    def login(self):
+        email, password = self.credentials
+        # Форма ставит cookie csrftoken, без неё POST на сервер получит 403
+        self.check(self.client.request('GET', '/login/')[0], expected={200})
+        status, _ = self.client.request('POST', '/login/', data={'email': email, 'password': password})
+        # Успешный вход — редирект в профиль, неуспешный — форма с кодом 200
+        self.check(status, expected={302})
+        self.logged_in = True
+        return status
+
+    def upload(self):
+        if not self.logged_in:
+            self.login()
+        car_id = self.rng.choice(self.catalog.own_car_ids)
+        data = self.rng.randbytes(UPLOAD_SIZE)
+        status, content = self.client.request('POST', f'/api/v1/cars/{car_id}/uploads/', data={
+            'filename': 'loadtest.jpg', 'size': len(data), 'sha256': hashlib.sha256(data).hexdigest(),
+        })
+        self.check(status, expected={201})
+        upload = json.loads(content)
+        for index, offset in enumerate(range(0, len(data), upload['chunk_size'])):
+            chunk = data[offset:offset + upload['chunk_size']]
+            self.check(self.client.request(
+                'PUT', f'/api/v1/uploads/{upload["id"]}/chunks/{index}/', body=chunk,
+                headers={'X-Chunk-Sha256': hashlib.sha256(chunk).hexdigest()},
+            )[0])
+        return self.check(self.client.request('DELETE', f'/api/v1/uploads/{upload["id"]}/')[0])
+
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+        self.errors = Counter()
+
+    def add(self, name, latency, status, error):
+        with self.lock:
+            self.statuses[name][status] += 1
+            if error:
+                self.errors[name] += 1
+            else:
+                self.latencies[name].append(latency)
+
+    def report(self, elapsed):
+        def summary(latencies, errors, statuses=None):
+            latencies = sorted(latencies)
+            requests = len(latencies) + errors
+            result = {
+                'requests': requests,
+                'errors': errors,
+                'error_rate': round(errors / requests, 4) if requests else 0.0,
+                # Задержка и пропускная способность — только по успешным ответам
+                'throughput': round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+                'mean_ms': round(sum(latencies) / len(latencies) * 1000, 2) if latencies else None,
+            }
+            for name, share in (('p50_ms', 0.5), ('p95_ms', 0.95), ('p99_ms', 0.99), ('max_ms', 1.0)):
+                value = percentile(latencies, share)
+                result[name] = round(value * 1000, 2) if value is not None else None
+            if statuses is not None:
+                result['status'] = {str(code): count for code, count in sorted(statuses.items())}
+            return result
+
+        endpoints = {
+            name: summary(self.latencies[name], self.errors[name], self.statuses[name])
+            for name in sorted(self.statuses)
+        }
+        everything = [latency for latencies in self.latencies.values() for latency in latencies]
+        return {'total': summary(everything, sum(self.errors.values())), 'endpoints': endpoints}
+
+
+class LoadTest:
+    def __init__(self, make_client, catalog, mix, credentials=None, concurrency=10, rate=None,
+                 duration=30.0, warmup=0.0, seed=0):
+        self.make_client = make_client
+        self.catalog = catalog
+        self.mix = dict(mix)
+        if not credentials:
+            self.mix.pop('login', None)
+            self.mix.pop('upload', None)
+        if not catalog.own_car_ids:
+            self.mix.pop('upload', None)
+        if not self.mix:
+            raise ValueError('Не осталось сценариев для прогона')
+        self.credentials = credentials
+        self.concurrency = concurrency
+        self.rate = rate
+        self.duration = duration
+        self.warmup = warmup
+        self.seed = seed
+        self.recorder = Recorder()
+        self.names = list(self.mix)
+        self.weights = [self.mix[name] for name in self.names]
+
+    def run_scenario(self, session, name, scheduled, measure_from):
+        status, error = 200, False
+        try:
+            status = getattr(session, name)()
+        except ScenarioError as exc:
+            status, error = exc.status, True
+        except Exception:
+            status, error = 0, True
+        finished = time.perf_counter()
+        if scheduled >= measure_from:
+            self.recorder.add(name, finished - scheduled, status, error)
+
+    def _session(self, number):
+        return Session(self.make_client(), self.catalog, self.credentials, random.Random(self.seed * 1000 + number))
+
+    def preflight(self):
+        """Один проход каждого сценария; ошибка — повод не начинать прогон"""
+        session = self._session(-1)
+        try:
+            for name in self.names:
+                try:
+                    getattr(session, name)()
+                except ScenarioError as exc:
+                    raise LoadTestError(f'Сценарий {name} отвечает ошибкой (HTTP {exc.status}), прогон не начат')
+        finally:
+            session.client.close()
+
+    def run(self):
+        self.preflight()
+        start = time.perf_counter()
+        measure_from = start + self.warmup
+        deadline = measure_from + self.duration
+        threads = []
+        if self.rate:
+            arrivals = queue.Queue()
+            threads.append(threading.Thread(target=self._arrivals, args=(arrivals, deadline)))
+            target = lambda number: self._open_worker(number, arrivals, measure_from)  # noqa: E731
+        else:
+            target = lambda number: self._closed_worker(number, deadline, measure_from)  # noqa: E731
+        threads += [threading.Thread(target=target, args=(number,)) for number in range(self.concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = min(time.perf_counter(), deadline) - measure_from
+        report = self.recorder.report(max(elapsed, 0.0) or self.duration)
+        report['config'] = {
+            'mode': 'rate' if self.rate else 'concurrency',
+            'concurrency': self.concurrency,
+            'rate': self.rate,
+            'duration': self.duration,
+            'warmup': self.warmup,
+            'mix': self.mix,
+        }
+        return report
+
+    def _closed_worker(self, number, deadline, measure_from):
+        session = self._session(number)
+        try:
+            while time.perf_counter() < deadline:
+                name = session.rng.choices(self.names, self.weights)[0]
+                self.run_scenario(session, name, time.perf_counter(), measure_from)
+        finally:
+            session.client.close()
+
+    def _arrivals(self, arrivals, deadline):
+        rng = random.Random(self.seed)
+        moment = time.perf_counter()
+        while True:
+            moment += rng.expovariate(self.rate)
+            if moment >= deadline:
+                break
+            delay = moment - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            arrivals.put((moment, rng.choices(self.names, self.weights)[0]))
+        for _ in range(self.concurrency):
+            arrivals.put(None)
+
+    def _open_worker(self, number, arrivals, measure_from):
+        session = self._session(number)
+        try:
+            while True:
+                item = arrivals.get()
+                if item is None:
+                    break
+                scheduled, name = item
+                self.run_scenario(session, name, scheduled, measure_from)
+        finally:
+            session.client.close()
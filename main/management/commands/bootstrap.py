@@ -0,0 +1,112 @@
+# main/management/commands/bootstrap.py
+import hashlib
+import os
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.staticfiles import finders
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.migrations.executor import MigrationExecutor
+
+STATIC_STAMP_NAME = '.collectstatic.sha256'
+
+
+class Command(BaseCommand):
+    help = 'Подготовка контейнера к запуску: миграции, суперпользователь, справочники, статика'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+        parser.add_argument('--skip-static', action='store_true',
+                            help='Не собирать статику')
+
+    def handle(self, *args, **options):
+        self.database = options['database']
+        phases = [
+            ('migrate', self.migrate),
+            ('superuser', self.create_superuser),
+            ('seed', self.seed),
+        ]
+        if not options['skip_static']:
+            phases.append(('collectstatic', self.collectstatic))
+
+        total_started = time.perf_counter()
+        for name, phase in phases:
+            started = time.perf_counter()
+            result = phase()
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f'[{name}] {result} ({elapsed:.2f}s)')
+        total = time.perf_counter() - total_started
+        self.stdout.write(self.style.SUCCESS(f'Bootstrap finished in {total:.2f}s'))
+
+    def migrate(self):
+        """Применить миграции, только если план не пустой"""
+        connection = connections[self.database]
+        executor = MigrationExecutor(connection)
+        plan = executor.migration_plan(executor.loader.graph.leaf_nodes())
+        if not plan:
+            return 'skipped, no unapplied migrations'
+        call_command('migrate', database=self.database, interactive=False, verbosity=0)
+        return f'applied {len(plan)} migration(s)'
+
+    def create_superuser(self):
+        User = get_user_model()
+        if User.objects.using(self.database).filter(is_superuser=True).exists():
+            return 'skipped, superuser already exists'
+        username = os.getenv('DJANGO_SUPERUSER_USERNAME', 'admin')
+        User.objects.db_manager(self.database).create_superuser(
+            username,
+            os.getenv('DJANGO_SUPERUSER_EMAIL', 'admin@example.com'),
+            os.getenv('DJANGO_SUPERUSER_PASSWORD', 'admin123'),
+        )
+        return f'created {username}'
+
+    def seed(self):
+        """Синхронизировать справочники марок, моделей, опций и населённых пунктов"""
+        from cars.catalog import load_catalog, sync_catalog
+        from cars.features import assign_free_bits
+        from cars.geo import load_gazetteer
+
+        catalog, checksum = load_catalog()
+        stats = sync_catalog(catalog, checksum, using=self.database)
+        # Опциям, оставшимся без бита, не ждать ежедневного assign_bits
+        assign_free_bits()
+        localities = load_gazetteer()
+        changes = sum(stats.values())
+        if not changes:
+            return f'catalog {catalog["version"]} up to date, {localities} localities'
+        return f'catalog {catalog["version"]}: {changes} change(s), {localities} localities'
+
+    def collectstatic(self):
+        """Собрать статику, только если изменился набор исходных файлов"""
+        digest = self.static_sources_digest()
+        stamp = os.path.join(settings.STATIC_ROOT, STATIC_STAMP_NAME)
+        try:
+            with open(stamp) as f:
+                previous = f.read().strip()
+        except FileNotFoundError:
+            previous = None
+        if previous == digest:
+            return 'skipped, static sources unchanged'
+
+        call_command('collectstatic', interactive=False, verbosity=0)
+        with open(stamp, 'w') as f:
+            f.write(digest)
+        return 'collected'
+
+    def static_sources_digest(self):
+        """Хэш по путям, размерам и времени изменения исходных файлов статики"""
+        entries = []
+        for finder in finders.get_finders():
+            for path, storage in finder.list([]):
+                stat = os.stat(storage.path(path))
+                entries.append(f'{path}\0{stat.st_size}\0{stat.st_mtime_ns}')
+        entries.sort()
+        sha = hashlib.sha256()
+        sha.update(settings.STATICFILES_STORAGE.encode())
+        for entry in entries:
+            sha.update(entry.encode())
+            sha.update(b'\n')
+        return sha.hexdigest()
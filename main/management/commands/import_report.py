@@ -0,0 +1,35 @@
+# main/management/commands/import_report.py
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from main import importtime
+
+
+class Command(BaseCommand):
+    help = 'Показать, какие приложения и модули дольше всего импортируются при старте воркера'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=15)
+        parser.add_argument('--json', action='store_true', help='Вывести отчёт в JSON')
+
+    def handle(self, *args, **options):
+        try:
+            data = importtime.report(importtime.measure(), options['limit'])
+        except RuntimeError as exc:
+            raise CommandError(f'Не удалось загрузить приложение: {exc}')
+        if options['json']:
+            self.stdout.write(json.dumps(data, ensure_ascii=False, indent=2))
+            return
+
+        self.stdout.write(f'Startup imports: {data["total_ms"]:.1f}ms across {data["modules"]} modules\n')
+        self.stdout.write('INSTALLED_APPS (self time of the app package):')
+        for row in data['apps']:
+            self.stdout.write(f'  {row["app"]:<32} {row["ms"]:>8.1f}ms  {row["modules"]:>4} modules')
+        self.stdout.write('\nOther packages:')
+        for row in data['packages']:
+            self.stdout.write(f'  {row["package"]:<32} {row["ms"]:>8.1f}ms  {row["modules"]:>4} modules')
+        self.stdout.write('\nSlowest modules (cumulative):')
+        for row in data['slowest']:
+            self.stdout.write(f'  {row["module"]:<48} {row["ms"]:>8.1f}ms  self {row["self_ms"]:.1f}ms')
+        self.stdout.write(self.style.SUCCESS('Import report finished'))
@@ -0,0 +1,86 @@
+# main/management/commands/loadtest.py
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from cars.synthetic import generate_cars
+from main.loadtest import DEFAULT_MIX, Catalog, HttpClient, InProcessClient, LoadTest, LoadTestError, parse_mix
+
+LOADTEST_USER = 'loadtest'
+LOADTEST_PASSWORD = 'loadtest-password'
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочный прогон смеси запросов в процессе или на сервер (--url). '
+            'Пишет в БД: запускать на стенде, не на проде')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', help='Адрес сервера, например http://127.0.0.1:8000; '
+                                          'без него запросы идут через test Client в этом процессе')
+        parser.add_argument('--mix', default=','.join(f'{k}={v}' for k, v in DEFAULT_MIX.items()),
+                            help='Веса сценариев browse, search, detail, login, upload')
+        parser.add_argument('--concurrency', type=int, default=10,
+                            help='Число параллельных пользователей')
+        parser.add_argument('--rate', type=float,
+                            help='Интенсивность прихода, сценариев в секунду (открытая модель)')
+        parser.add_argument('--duration', type=float, default=30.0)
+        parser.add_argument('--warmup', type=float, default=2.0,
+                            help='Секунды в начале, не входящие в отчёт')
+        parser.add_argument('--email', help='Пользователь для входа и загрузки фото')
+        parser.add_argument('--password')
+        parser.add_argument('--populate', type=int, default=0,
+                            help='Сначала создать столько синтетических объявлений пользователя loadtest')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Записать отчёт JSON в файл, а не в stdout')
+
+    def handle(self, *args, **options):
+        try:
+            mix = parse_mix(options['mix'])
+        except ValueError as exc:
+            raise CommandError(exc)
+
+        user, credentials = None, None
+        if options['email']:
+            user = get_user_model().objects.filter(email=options['email']).first()
+            credentials = (options['email'], options['password'] or '')
+        elif options['url'] is None or options['populate']:
+            user = self.loadtest_user()
+            credentials = (user.email, LOADTEST_PASSWORD)
+        if options['populate']:
+            generate_cars(options['populate'], user=user, seed=options['seed'])
+
+        if options['url']:
+            make_client = lambda: HttpClient(options['url'])  # noqa: E731
+        else:
+            make_client = InProcessClient
+        try:
+            test = LoadTest(
+                make_client, Catalog(user), mix, credentials,
+                concurrency=options['concurrency'], rate=options['rate'],
+                duration=options['duration'], warmup=options['warmup'], seed=options['seed'],
+            )
+        except ValueError as exc:
+            raise CommandError(exc)
+        skipped = set(mix) - set(test.mix)
+        if skipped:
+            self.stderr.write(f'Пропущены сценарии без пользователя или его объявлений: {", ".join(sorted(skipped))}')
+
+        try:
+            report = test.run()
+        except LoadTestError as exc:
+            raise CommandError(exc)
+        report['config']['target'] = options['url'] or 'in-process'
+        output = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                f.write(output)
+        else:
+            self.stdout.write(output)
+
+    def loadtest_user(self):
+        User = get_user_model()
+        user = User.objects.filter(username=LOADTEST_USER).first()
+        if user is None:
+            user = User.objects.create_user(LOADTEST_USER, f'{LOADTEST_USER}@example.com', LOADTEST_PASSWORD)
+        return user
@@ -0,0 +1,15 @@
+# main/management/commands/profile_token.py
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from main.middleware import PROFILE_HEADER
+from main.profiling import make_token
+
+
+class Command(BaseCommand):
+    help = 'Выдать подписанный заголовок для профилирования запроса на проде'
+
+    def handle(self, *args, **options):
+        token = make_token()
+        self.stdout.write(f'{PROFILE_HEADER}: {token}')
+        self.stderr.write(f'Действует {settings.PROFILING_TOKEN_MAX_AGE} с')
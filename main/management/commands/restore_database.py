@@ -0,0 +1,33 @@
+# main/management/commands/restore_database.py
+from django.core.management.base import BaseCommand, CommandError
+
+from main import backup
+
+
+class Command(BaseCommand):
+    help = 'Заменить содержимое рабочей БД сжатой копией из backup_database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('snapshot', help='Путь к db-*.sqlite3.gz или latest')
+        parser.add_argument('--noinput', '--no-input', action='store_false', dest='interactive',
+                            help='Не спрашивать подтверждения')
+
+    def handle(self, *args, **options):
+        if options['snapshot'] == 'latest':
+            found = backup.snapshots()
+            if not found:
+                raise CommandError('Копий нет')
+            path = found[0]
+        else:
+            path = options['snapshot']
+        if options['interactive']:
+            answer = input(f'Все данные в {backup.database_path()} будут заменены копией {path}. Продолжить? [y/N] ')
+            if answer.strip().lower() not in ('y', 'yes'):
+                raise CommandError('Отменено')
+        try:
+            report = backup.restore(path)
+        except (backup.BackupError, OSError) as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(self.style.SUCCESS(
+            f'Restored {report["file"]} ({report["database_bytes"]} bytes) in {report["seconds"]:.2f}s'
+        ))
@@ -0,0 +1,89 @@
+# main/management/commands/run_worker.py
+import multiprocessing
+import os
+import signal
+import socket
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, close_old_connections, connections
+
+from main import jobs
+
+
+class Command(BaseCommand):
+    help = 'Выполнять фоновые задачи из очереди в нескольких процессах'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=2)
+        parser.add_argument('--lease', type=int, default=jobs.DEFAULT_LEASE,
+                            help='Срок аренды задачи в секундах')
+        parser.add_argument('--poll', type=float, default=1.0,
+                            help='Пауза между опросами пустой очереди')
+        parser.add_argument('--queue', action='append', dest='names',
+                            help='Брать только задачи с этим именем (можно несколько)')
+        parser.add_argument('--once', action='store_true',
+                            help='Выполнить готовые задачи и завершиться')
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.stopping = False
+        jobs.schedule_recurring()
+        # Дочерние процессы не должны наследовать открытые соединения
+        connections.close_all()
+
+        context = multiprocessing.get_context('fork')
+        workers = {}
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        for slot in range(options['processes']):
+            workers[slot] = self.spawn(context, slot)
+        self.stdout.write(f'Started {len(workers)} worker process(es)')
+
+        while workers:
+            time.sleep(0.5)
+            for slot, process in list(workers.items()):
+                if process.is_alive():
+                    continue
+                process.join()
+                if self.stopping or options['once']:
+                    del workers[slot]
+                else:
+                    self.stderr.write(f'Worker {slot} exited with {process.exitcode}, restarting')
+                    workers[slot] = self.spawn(context, slot)
+            if self.stopping:
+                for process in workers.values():
+                    if process.is_alive():
+                        os.kill(process.pid, signal.SIGTERM)
+        self.stdout.write('Workers stopped')
+
+    def stop(self, signum, frame):
+        self.stopping = True
+
+    def spawn(self, context, slot):
+        process = context.Process(target=self.work, args=(slot,), daemon=False)
+        process.start()
+        return process
+
+    def work(self, slot):
+        """Цикл дочернего процесса: захватить задачу, выполнить, повторить"""
+        stopping = []
+        signal.signal(signal.SIGTERM, lambda *args: stopping.append(True))
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        worker_id = f'{socket.gethostname()}:{os.getpid()}'
+        options = self.options
+        while not stopping:
+            close_old_connections()
+            try:
+                job_row = jobs.claim(worker_id, lease=options['lease'], names=options['names'])
+            except OperationalError:
+                # База занята другим писателем — попробуем позже
+                time.sleep(options['poll'])
+                continue
+            if job_row is None:
+                if options['once']:
+                    break
+                time.sleep(options['poll'])
+                continue
+            jobs.run(job_row, lease=options['lease'])
+        connections.close_all()
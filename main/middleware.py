@@ -0,0 +1,70 @@
+# main/middleware.py
+import ipaddress
+import logging
+import random
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from .profiling import Profile, check_token
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = 'X-Profile'
+PROFILE_PARAM = '_profile'
+
+
+def client_ip(request):
+    """Адрес посетителя; None, если он не похож на IP"""
+    address = request.META.get('REMOTE_ADDR', '')
+    if settings.TRUST_X_REAL_IP:
+        address = request.headers.get('X-Real-IP', address)
+    try:
+        return str(ipaddress.ip_address(address.strip()))
+    except ValueError:
+        return None
+
+
+class ProfilingMiddleware:
+    """Профилирование запроса по подписанному заголовку, флагу сотрудника или выборке.
+
+    Без триггера запрос проходит через одну проверку заголовка и, если
+    включена выборка, один random(). Профили выборки сохраняются, только
+    если запрос медленнее PROFILING_SLOW_MS.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = settings.PROFILING_SAMPLE_RATE
+        self.slow_ms = settings.PROFILING_SLOW_MS
+
+    def trigger(self, request):
+        token = request.headers.get(PROFILE_HEADER)
+        if token and check_token(token):
+            return 'header'
+        if PROFILE_PARAM in request.GET and request.user.is_staff:
+            return 'staff'
+        if self.sample_rate and random.random() < self.sample_rate:
+            return 'sample'
+        return None
+
+    def __call__(self, request):
+        trigger = self.trigger(request)
+        if trigger is None:
+            return self.get_response(request)
+
+        with Profile(trigger) as profile:
+            response = self.get_response(request)
+        if trigger == 'sample' and profile.duration * 1000 < self.slow_ms:
+            return response
+        try:
+            saved = profile.save(request, response)
+        except Exception:
+            # Профилировщик не должен ломать ответ
+            logger.exception('Не удалось сохранить профиль %s', request.path)
+            return response
+        if trigger != 'sample':
+            response['X-Profile-Id'] = str(saved.pk)
+        return response
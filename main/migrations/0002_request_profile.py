@@ -0,0 +1,36 @@
+# Generated by Django 4.2.7 on 2026-10-19 18:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0001_job_queue'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('method', models.CharField(max_length=10)),
+                ('path', models.CharField(max_length=500, verbose_name='Адрес')),
+                ('view', models.CharField(blank=True, max_length=200, verbose_name='Представление')),
+                ('status_code', models.PositiveSmallIntegerField(verbose_name='Код ответа')),
+                ('trigger', models.CharField(choices=[('header', 'Подписанный заголовок'), ('staff', 'Сотрудник'), ('sample', 'Выборка')], max_length=10, verbose_name='Причина')),
+                ('duration_ms', models.FloatField(verbose_name='Время (мс)')),
+                ('sql_count', models.PositiveIntegerField(verbose_name='SQL-запросов')),
+                ('sql_ms', models.FloatField(verbose_name='Время SQL (мс)')),
+                ('samples', models.PositiveIntegerField(verbose_name='Срезов стека')),
+                ('file', models.CharField(max_length=200, verbose_name='Файл стеков')),
+                ('queries', models.JSONField(blank=True, default=list, verbose_name='Хронология SQL')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                'verbose_name': 'Профиль запроса',
+                'verbose_name_plural': 'Профили запросов',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
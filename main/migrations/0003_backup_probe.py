@@ -0,0 +1,24 @@
+# Generated by Django 4.2.7 on 2026-10-19 18:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0002_request_profile'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BackupProbe',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('touched_at', models.DateTimeField(verbose_name='Последний замер')),
+            ],
+            options={
+                'verbose_name': 'Замер записи при копировании',
+                'verbose_name_plural': 'Замеры записи при копировании',
+            },
+        ),
+    ]
@@ -0,0 +1,154 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Job(models.Model):
+    """Фоновая задача в очереди на базе БД"""
+
+    STATUS_CHOICES = [
+        ('queued', 'В очереди'),
+        ('running', 'Выполняется'),
+        ('done', 'Выполнена'),
+        ('failed', 'Ошибка'),
+    ]
+
+    name = models.CharField(
+        max_length=100,
+        verbose_name='Задача'
+    )
+    args = models.JSONField(
+        default=list,
+        blank=True,
+        verbose_name='Аргументы'
+    )
+    kwargs = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name='Именованные аргументы'
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default='queued',
+        verbose_name='Статус'
+    )
+    run_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='Запустить после'
+    )
+    interval = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        verbose_name='Период повтора (сек)'
+    )
+    unique_key = models.CharField(
+        max_length=100,
+        null=True,
+        blank=True,
+        unique=True,
+        verbose_name='Ключ периодической задачи'
+    )
+    attempts = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name='Попыток'
+    )
+    max_attempts = models.PositiveSmallIntegerField(
+        default=5,
+        verbose_name='Максимум попыток'
+    )
+    locked_by = models.CharField(
+        max_length=100,
+        blank=True,
+        verbose_name='Воркер'
+    )
+    locked_until = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Аренда до'
+    )
+    last_error = models.TextField(
+        blank=True,
+        verbose_name='Последняя ошибка'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Начата'
+    )
+    finished_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Завершена'
+    )
+
+    class Meta:
+        verbose_name = 'Фоновая задача'
+        verbose_name_plural = 'Фоновые задачи'
+        ordering = ['run_at']
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='job_claim_idx'),
+            models.Index(fields=['status', 'locked_until'], name='job_lease_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.name} #{self.pk}'
+
+
+class RequestProfile(models.Model):
+    """Профиль запроса: свёрнутые стеки на диске и хронология SQL"""
+
+    TRIGGER_CHOICES = [
+        ('header', 'Подписанный заголовок'),
+        ('staff', 'Сотрудник'),
+        ('sample', 'Выборка'),
+    ]
+
+    method = models.CharField(max_length=10)
+    path = models.CharField(
+        max_length=500,
+        verbose_name='Адрес'
+    )
+    view = models.CharField(
+        max_length=200,
+        blank=True,
+        verbose_name='Представление'
+    )
+    status_code = models.PositiveSmallIntegerField(verbose_name='Код ответа')
+    trigger = models.CharField(
+        max_length=10,
+        choices=TRIGGER_CHOICES,
+        verbose_name='Причина'
+    )
+    duration_ms = models.FloatField(verbose_name='Время (мс)')
+    sql_count = models.PositiveIntegerField(verbose_name='SQL-запросов')
+    sql_ms = models.FloatField(verbose_name='Время SQL (мс)')
+    samples = models.PositiveIntegerField(verbose_name='Срезов стека')
+    file = models.CharField(
+        max_length=200,
+        verbose_name='Файл стеков'
+    )
+    queries = models.JSONField(
+        default=list,
+        blank=True,
+        verbose_name='Хронология SQL'
+    )
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        verbose_name = 'Профиль запроса'
+        verbose_name_plural = 'Профили запросов'
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f'{self.method} {self.path} ({self.duration_ms:.0f} мс)'
+
+
+class BackupProbe(models.Model):
+    """Одна строка, которую замер задержки записи переписывает во время копирования"""
+
+    touched_at = models.DateTimeField(verbose_name='Последний замер')
+
+    class Meta:
+        verbose_name = 'Замер записи при копировании'
+        verbose_name_plural = 'Замеры записи при копировании'
@@ -0,0 +1,213 @@
+# main/profiling.py
+"""Профилирование отдельных запросов на проде.
+
+Один фоновый поток на процесс раз в PROFILING_INTERVAL секунд снимает
+стеки потоков, которые сейчас профилируются, через sys._current_frames и
+считает одинаковые стеки. Пока таких потоков нет, поток спит на Event и
+ничего не стоит. Результат сохраняется в формате «свёрнутых стеков»
+(``func (file:line);func (file:line) count``), который читают
+flamegraph.pl, speedscope и inferno.
+
+SQL-запросы за время запроса собираются через connection.execute_wrapper
+в хронологию: смещение от начала запроса, длительность и текст.
+"""
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.core import signing
+from django.db import connection
+from django.utils import timezone
+
+from .models import RequestProfile
+
+MAX_QUERIES = 500
+MAX_SQL_LENGTH = 2000
+MAX_DEPTH = 200
+
+_SALT = 'main.profiling'
+
+
+def make_token():
+    """Подписанное значение заголовка X-Profile"""
+    return signing.TimestampSigner(salt=_SALT).sign(uuid.uuid4().hex)
+
+
+def check_token(token):
+    try:
+        signing.TimestampSigner(salt=_SALT).unsign(token, max_age=settings.PROFILING_TOKEN_MAX_AGE)
+    except signing.BadSignature:
+        return False
+    return True
+
+
+_labels = {}
+
+
+def _label(code):
+    label = _labels.get(code)
+    if label is None:
+        filename = code.co_filename
+        for root in (str(settings.BASE_DIR) + os.sep, 'site-packages' + os.sep):
+            position = filename.find(root)
+            if position != -1:
+                filename = filename[position + len(root):]
+                break
+        label = f'{code.co_name} ({filename}:{code.co_firstlineno})'.replace(';', ',')
+        _labels[code] = label
+    return label
+
+
+def _stack(frame):
+    labels = []
+    while frame is not None and len(labels) < MAX_DEPTH:
+        labels.append(_label(frame.f_code))
+        frame = frame.f_back
+    return ';'.join(reversed(labels))
+
+
+class Sampler:
+    """Общий для процесса поток, снимающий стеки зарегистрированных потоков"""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.targets = {}
+        self.lock = threading.Lock()
+        self.active = threading.Event()
+        self.thread = None
+        self.pid = None
+
+    def _ensure_thread(self):
+        # После fork поток родителя в дочернем процессе не существует
+        if self.thread is None or self.pid != os.getpid():
+            self.pid = os.getpid()
+            self.thread = threading.Thread(target=self._run, name='profiling-sampler', daemon=True)
+            self.thread.start()
+
+    def start(self, thread_id):
+        stacks = Counter()
+        with self.lock:
+            self._ensure_thread()
+            self.targets[thread_id] = stacks
+            self.active.set()
+        return stacks
+
+    def stop(self, thread_id):
+        with self.lock:
+            stacks = self.targets.pop(thread_id, Counter())
+            if not self.targets:
+                self.active.clear()
+        return stacks
+
+    def _run(self):
+        while True:
+            self.active.wait()
+            time.sleep(self.interval)
+            # Под блокировкой: после stop() счётчик потока больше не меняется
+            with self.lock:
+                if not self.targets:
+                    continue
+                frames = sys._current_frames()
+                for thread_id, stacks in self.targets.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        stacks[_stack(frame)] += 1
+                del frames
+
+
+_sampler = None
+
+
+def sampler():
+    global _sampler
+    if _sampler is None:
+        _sampler = Sampler(settings.PROFILING_INTERVAL)
+    return _sampler
+
+
+class SqlTimeline:
+    """Обёртка execute_wrapper: записывает каждый запрос к БД"""
+
+    def __init__(self, started):
+        self.started = started
+        self.queries = []
+        self.count = 0
+        self.total = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.count += 1
+            self.total += duration
+            if len(self.queries) < MAX_QUERIES:
+                self.queries.append({
+                    'start_ms': round((start - self.started) * 1000, 3),
+                    'duration_ms': round(duration * 1000, 3),
+                    'sql': sql[:MAX_SQL_LENGTH],
+                    'many': many,
+                })
+
+
+class Profile:
+    """Профиль одного запроса: стеки текущего потока и хронология SQL"""
+
+    def __init__(self, trigger):
+        self.trigger = trigger
+        self.thread_id = threading.get_ident()
+        self.started = time.perf_counter()
+        self.timeline = SqlTimeline(self.started)
+        self.stacks = None
+        self.duration = None
+        self._wrapper = None
+
+    def __enter__(self):
+        self._wrapper = connection.execute_wrapper(self.timeline)
+        self._wrapper.__enter__()
+        self.stacks = sampler().start(self.thread_id)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stacks = sampler().stop(self.thread_id)
+        self.duration = time.perf_counter() - self.started
+        self._wrapper.__exit__(*exc_info)
+        return False
+
+    def folded(self):
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+    def save(self, request, response):
+        """Записать свёрнутые стеки на диск и строку RequestProfile"""
+        now = timezone.now()
+        directory = Path(settings.PROFILING_DIR) / now.strftime('%Y-%m-%d')
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f'{now:%H%M%S}-{uuid.uuid4().hex[:8]}.folded'
+        path.write_text(self.folded(), encoding='utf-8')
+        return RequestProfile.objects.create(
+            method=request.method,
+            path=request.get_full_path()[:500],
+            view=getattr(request.resolver_match, 'view_name', '') or '',
+            status_code=response.status_code,
+            trigger=self.trigger,
+            duration_ms=self.duration * 1000,
+            sql_count=self.timeline.count,
+            sql_ms=self.timeline.total * 1000,
+            samples=sum(self.stacks.values()),
+            file=str(path.relative_to(settings.PROFILING_DIR)),
+            queries=self.timeline.queries,
+        )
+
+
+def remove_file(name):
+    path = Path(settings.PROFILING_DIR) / name
+    try:
+        path.unlink()
+    except FileNotFoundError:
+        pass
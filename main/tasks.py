@@ -0,0 +1,36 @@
+# main/tasks.py
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import backup
+from .jobs import job
+from .models import RequestProfile
+from .profiling import remove_file
+
+logger = logging.getLogger(__name__)
+
+
+@job('main.purge_profiles', every=24 * 3600)
+def purge_profiles(days=None):
+    """Удалить профили запросов старше PROFILING_KEEP_DAYS вместе с файлами"""
+    cutoff = timezone.now() - timedelta(days=days or settings.PROFILING_KEEP_DAYS)
+    old = RequestProfile.objects.filter(created_at__lt=cutoff)
+    for name in old.values_list('file', flat=True).iterator():
+        remove_file(name)
+    old.delete()
+
+
+@job('main.backup_database', every=settings.BACKUP_INTERVAL)
+def backup_database():
+    """Снять онлайн-копию БД и удалить копии сверх BACKUP_KEEP"""
+    # Без замера записи: он сам пишет в базу и держит блокировки во время копирования
+    report = backup.snapshot(probe=False)
+    hold = report['lock_hold'] or {}
+    logger.info(
+        'Backup %s: %d bytes in %.2fs, %d step(s), %d restart(s), lock per step p50 %sms max %sms',
+        report['file'], report['database_bytes'], report['copy_seconds'], report['steps'],
+        report['restarts'], hold.get('p50_ms'), hold.get('max_ms'),
+    )
@@ -1,3 +1,164 @@
-from django.test import TestCase
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.test import SimpleTestCase, TransactionTestCase
+
+from . import backup, jobs
+from .cache import AtomicFileBasedCache
+from .models import Job
+
+calls = []
+
+
+@jobs.job('main.tests.noop', max_attempts=1)
+def noop(*args):
+    calls.append(args)
+
+
+@jobs.job('main.tests.steal', max_attempts=1)
+def steal(pk):
+    # Аренду за это время забрал другой воркер
+    Job.objects.filter(pk=pk).update(locked_by='other')
+
+
+class JobQueueTests(TransactionTestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_unique_key_dedupes_queued_job(self):
+        first = jobs.enqueue('main.tests.noop', 1, unique_key='noop:1')
+        second = jobs.enqueue('main.tests.noop', 1, unique_key='noop:1')
+        self.assertEqual(first.pk, second.pk)
+        self.assertEqual(Job.objects.filter(name='main.tests.noop').count(), 1)
+
+    def test_claim_frees_unique_key(self):
+        first = jobs.enqueue('main.tests.noop', 1, unique_key='noop:1')
+        claimed = jobs.claim('w1', names=['main.tests.noop'])
+        self.assertEqual(claimed.pk, first.pk)
+        self.assertIsNone(claimed.unique_key)
+        # Изменение во время выполнения ставит новую проверку
+        second = jobs.enqueue('main.tests.noop', 1, unique_key='noop:1')
+        self.assertNotEqual(second.pk, first.pk)
+        self.assertTrue(jobs.run(claimed))
+        self.assertEqual(Job.objects.get(pk=first.pk).status, 'done')
+
+    def test_schedule_recurring_keeps_unique_jobs(self):
+        queued = jobs.enqueue('main.tests.noop', 1, unique_key='noop:1')
+        jobs.schedule_recurring()
+        self.assertTrue(Job.objects.filter(pk=queued.pk).exists())
+
+    def test_heartbeat_extends_lease(self):
+        row = jobs.enqueue('main.tests.noop')
+        claimed = jobs.claim('w1', lease=30, names=['main.tests.noop'])
+        heartbeat = jobs._Heartbeat(Job.objects.filter(pk=row.pk, locked_by='w1'), claimed, 0.3)
+        heartbeat.start()
+        try:
+            time.sleep(1)
+        finally:
+            heartbeat.stop()
+        # Пульс ставит срок now + lease, то есть раньше исходного с арендой 30с
+        self.assertLess(Job.objects.get(pk=row.pk).locked_until, claimed.locked_until)
+
+    def test_lost_lease_discards_result(self):
+        row = jobs.enqueue('main.tests.steal')
+        row.args = [row.pk]
+        row.save(update_fields=['args'])
+        claimed = jobs.claim('w1', names=['main.tests.steal'])
+        jobs.run(claimed)
+        row.refresh_from_db()
+        self.assertEqual(row.status, 'running')
+        self.assertEqual(row.locked_by, 'other')
+
+
+class AtomicFileBasedCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir, True)
+        self.cache = AtomicFileBasedCache(self.dir, {'OPTIONS': {'MAX_ENTRIES': 4, 'CULL_FREQUENCY': 1}})
+
+    def test_add_takes_key_once(self):
+        self.assertTrue(self.cache.add('lock', 'a'))
+        self.assertFalse(self.cache.add('lock', 'b'))
+        self.assertEqual(self.cache.get('lock'), 'a')
+
+    def test_expired_key_can_be_taken_again(self):
+        self.assertTrue(self.cache.add('lock', 'a'))
+        self.cache.touch('lock', 0)
+        self.assertTrue(self.cache.add('lock', 'b'))
+        self.assertEqual(self.cache.get('lock'), 'b')
+
+    def test_add_culls(self):
+        for i in range(10):
+            self.assertTrue(self.cache.add(f'lock:{i}', i))
+        self.assertLessEqual(len(self.cache._list_cache_files()), 4)
+
+
+class BackupTests(SimpleTestCase):
+    """Копия отдельной базы, в которую всё время пишет другое соединение"""
+
+    def setUp(self):
+        self.dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.dir, True)
+        self.path = self.dir / 'source.sqlite3'
+        connection = sqlite3.connect(self.path)
+        with connection:
+            connection.execute('CREATE TABLE orders (id INTEGER PRIMARY KEY, payload BLOB)')
+            connection.execute('CREATE TABLE lines (order_id INTEGER)')
+            for _ in range(2000):
+                self.insert(connection)
+        connection.close()
+
+    @staticmethod
+    def insert(connection):
+        # Заказ и его строка пишутся одной транзакцией — в целостной копии их поровну
+        cursor = connection.execute('INSERT INTO orders (payload) VALUES (randomblob(1024))')
+        connection.execute('INSERT INTO lines (order_id) VALUES (?)', (cursor.lastrowid,))
+
+    def write(self, stopped, written):
+        connection = sqlite3.connect(self.path, timeout=20)
+        try:
+            while not stopped.is_set():
+                with connection:
+                    self.insert(connection)
+                written.append(1)
+                time.sleep(0.005)
+        finally:
+            connection.close()
+
+    @staticmethod
+    def counts(path):
+        connection = sqlite3.connect(path)
+        try:
+            return tuple(
+                connection.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0] for table in ('orders', 'lines')
+            )
+        finally:
+            connection.close()
+
+    def test_snapshot_under_writes_restores_consistent_copy(self):
+        stopped, written = threading.Event(), []
+        writer = threading.Thread(target=self.write, args=(stopped, written))
+        writer.start()
+        try:
+            with mock.patch.object(backup, 'database_path', return_value=self.path):
+                report = backup.snapshot(self.dir / 'backups', pages=8, sleep=0.002)
+        finally:
+            stopped.set()
+            writer.join()
+        self.assertTrue(written)
+        self.assertEqual(report['integrity'], 'ok')
+        source = self.counts(self.path)
+
+        restored = self.dir / 'restored.sqlite3'
+        with mock.patch.object(backup, 'database_path', return_value=restored):
+            backup.restore(self.dir / 'backups' / report['file'])
+        self.assertEqual(backup.integrity(restored), (True, ['ok']))
+        orders, lines = self.counts(restored)
+        self.assertEqual(orders, lines)
+        self.assertGreaterEqual(orders, 2000)
+        self.assertLessEqual(orders, source[0])
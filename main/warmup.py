@@ -0,0 +1,66 @@
+# main/warmup.py
+"""Прогрев процесса до первого запроса.
+
+Gunicorn с preload_app вызывает ``warm()`` в мастере до fork: таблица URL,
+скомпилированные шаблоны, классы DRF и индексы подсказок и опций строятся
+один раз и достаются воркерам общими страницами copy-on-write. После
+прогрева соединения с БД закрываются — сокет SQLite не должен переехать в
+дочерние процессы. ``after_fork()`` вызывается уже в воркере.
+"""
+import logging
+import random
+
+from django.db import connections
+from django.template import TemplateDoesNotExist
+from django.template.loader import get_template
+from django.urls import get_resolver
+
+logger = logging.getLogger(__name__)
+
+TEMPLATES = ['cars/landing.html', 'cars/compare.html', 'admin/base_site.html', 'admin/change_list.html']
+
+_API_SETTINGS = (
+    'DEFAULT_RENDERER_CLASSES', 'DEFAULT_PARSER_CLASSES', 'DEFAULT_AUTHENTICATION_CLASSES',
+    'DEFAULT_PERMISSION_CLASSES', 'DEFAULT_PAGINATION_CLASS', 'DEFAULT_FILTER_BACKENDS',
+)
+
+
+def _warm_urls():
+    get_resolver().reverse_dict
+
+
+def _warm_templates():
+    for name in TEMPLATES:
+        try:
+            get_template(name)
+        except TemplateDoesNotExist:
+            pass
+
+
+def _warm_api():
+    from rest_framework.settings import api_settings
+    for name in _API_SETTINGS:
+        getattr(api_settings, name)
+
+
+def _warm_indexes():
+    from cars.features import _index
+    from cars.typeahead import _typeahead
+    _typeahead.build()
+    _index.build()
+
+
+def warm():
+    """Прогреть общие структуры; ошибка одного шага не мешает запуску"""
+    for step in (_warm_urls, _warm_templates, _warm_api, _warm_indexes):
+        try:
+            step()
+        except Exception:
+            logger.exception('Прогрев %s не удался', step.__name__)
+    connections.close_all()
+
+
+def after_fork():
+    # Соединения и состояние генератора не должны делиться с мастером
+    connections.close_all()
+    random.seed()